@@ -27,7 +27,7 @@ def get_locations_info(assessment):
 
     # Region is the region of the first geo area
     region = geo_areas[0].admin_level.region
-    region_geos = {x['key']: x for x in region.geo_options}
+    region_geos = {x['key']: x for x in region.get_geo_area_options()}
 
     for area in geo_areas:
         geo_info = region_geos.get(str(area.id))
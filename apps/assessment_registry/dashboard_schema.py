@@ -9,7 +9,7 @@ from django.db import connection as django_db_connection
 from geo.schema import ProjectGeoAreaType
 
 
-from deep.caches import CacheHelper, CacheKey
+from deep.caches import CacheHelper, CacheKey, DataVersion
 from utils.graphene.enums import EnumDescription
 from .enums import (
     AssessmentRegistryAffectedGroupTypeEnum,
@@ -36,8 +36,8 @@ from .models import (
 )
 from organization.schema import OrganizationType as OrganizationObjectType
 
-# TODO?
-NODE_CACHE_TIMEOUT = 60 * 60 * 1
+# NOTE: Cache key includes the project data version, which is bumped on assessment changes
+NODE_CACHE_TIMEOUT = 60 * 60 * 6
 
 
 def node_cache(cache_key):
@@ -47,6 +47,7 @@ def node_cache(cache_key):
         cache_key,
         timeout=NODE_CACHE_TIMEOUT,
         cache_key_gen=cache_key_gen,
+        namespace=CacheKey.AssessmentDashboard.BASE,
     )
 
 
@@ -427,6 +428,7 @@ class AssessmentDashboardStatisticsType(graphene.ObjectType):
         )
         cache_key = CacheHelper.generate_hash({
             'project': info.context.active_project.id,
+            'project_data_version': DataVersion.get(DataVersion.PROJECT, info.context.active_project.id),
             'filter': _filter.__dict__,
         })
         return AssessmentDashboardStat(
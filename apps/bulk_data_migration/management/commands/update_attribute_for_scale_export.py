@@ -1,12 +1,15 @@
 from django.core.management.base import BaseCommand
 
 from entry.models import Attribute
-from entry.utils import update_entry_attribute
+from entry.utils import AttributesDataUpdater
 
 
 class Command(BaseCommand):
     help = 'Update attributes to export scales'
 
     def handle(self, *args, **options):
-        for each in Attribute.objects.filter(widget__widget_id__in=['scaleWidget', 'conditionalWidget']):
-            update_entry_attribute(each)
+        updater = AttributesDataUpdater()
+        updater.update_queryset(
+            Attribute.objects.filter(widget__widget_id__in=['scaleWidget', 'conditionalWidget'])
+        )
+        print(f'Updated {updater.count} attributes ({updater.throughput:.2f} attributes/sec)')
@@ -12,7 +12,7 @@ from django.db.models import (
 )
 
 from entry.models import Attribute, ExportData
-from entry.utils import update_entry_attribute
+from entry.utils import AttributesDataUpdater
 from entry.widgets.store import widget_store
 from entry.widgets import conditional_widget
 from lead.models import Lead
@@ -77,10 +77,9 @@ class Command(BaseCommand):
         if total_to_process == 0:
             # Nothing to do here
             return
-        for index, attr in enumerate(attribute_qs.iterator(), start=1):
-            print(f'  - {index}/{total_to_process}', end='\r')
-            update_entry_attribute(attr)
-        print(f' - Updated {total_to_process}')
+        updater = AttributesDataUpdater()
+        updater.update_queryset(attribute_qs)
+        print(f' - Updated {updater.count} ({updater.throughput:.2f} attributes/sec)')
 
     def handle(self, *args, **options):
         old = time.time()
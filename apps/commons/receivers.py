@@ -4,9 +4,12 @@ from django.db.transaction import on_commit
 from django.dispatch import receiver
 
 from lead.models import (
+    Lead,
     LeadPreview,
     LeadPreviewAttachment,
 )
+from lead.tasks import update_organization_leads_search_text
+from organization.models import Organization
 from unified_connector.models import ConnectorLeadPreviewAttachment
 
 
@@ -26,3 +29,38 @@ def cleanup_file_on_instance_delete(sender, instance, **kwargs):
             storage, path = field_value.storage, field_value.name
             files.append([storage, path])
     on_commit(lambda: [storage.delete(path) for storage, path in files])
+
+
+# Lead search text
+@receiver(models.signals.m2m_changed, sender=Lead.authors.through)
+def update_lead_search_text_on_authors_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        # instance: Lead
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            Lead.update_search_text([instance.pk])
+        return
+    # instance: Organization, pk_set: Leads
+    if action == 'pre_clear':
+        instance._cleared_lead_ids = list(instance.lead_set.values_list('id', flat=True))
+    elif action == 'post_clear':
+        Lead.update_search_text(getattr(instance, '_cleared_lead_ids', []))
+    elif action in ('post_add', 'post_remove'):
+        Lead.update_search_text(pk_set)
+
+
+@receiver(models.signals.pre_save, sender=Organization)
+def track_organization_search_text_change(sender, instance, update_fields=None, **kwargs):
+    instance._search_text_changed = False
+    if instance.pk is None or (update_fields is not None and not {'title', 'parent'} & set(update_fields)):
+        return
+    instance._search_text_changed = not Organization.objects.filter(
+        pk=instance.pk,
+        title=instance.title,
+        parent=instance.parent_id,
+    ).exists()
+
+
+@receiver(models.signals.post_save, sender=Organization)
+def update_lead_search_text_on_organization_change(sender, instance, **kwargs):
+    if getattr(instance, '_search_text_changed', False):
+        on_commit(lambda: update_organization_leads_search_text.delay(instance.pk))
@@ -0,0 +1,49 @@
+import random
+import string
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from deduplication.utils import get_minhash_legacy, get_minhash_signatures
+
+
+class Command(BaseCommand):
+    help = 'Compare per-token MinHash computation with batched signature computation on a synthetic corpus'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--documents', type=int, default=20000)
+        parser.add_argument('--vocabulary', type=int, default=50000)
+        parser.add_argument('--max-tokens', type=int, default=500)
+        parser.add_argument('--workers', type=int, default=None)
+        parser.add_argument('--seed', type=int, default=1)
+
+    def get_corpus(self, documents, vocabulary, max_tokens, seed):
+        rand = random.Random(seed)
+        words = [
+            ''.join(rand.choices(string.ascii_lowercase, k=rand.randint(3, 10)))
+            for _ in range(vocabulary)
+        ]
+        return [
+            ' '.join(rand.choices(words, k=rand.randint(0, max_tokens)))
+            for _ in range(documents)
+        ]
+
+    def handle(self, **kwargs):
+        corpus = self.get_corpus(kwargs['documents'], kwargs['vocabulary'], kwargs['max_tokens'], kwargs['seed'])
+        self.stdout.write(f'Corpus: {len(corpus)} documents')
+
+        start_time = time.perf_counter()
+        legacy_signatures = np.array([get_minhash_legacy(text).hashvalues for text in corpus])
+        legacy_duration = time.perf_counter() - start_time
+        self.stdout.write(f'Per-token: {legacy_duration:.2f}s ({len(corpus) / legacy_duration:.0f} docs/s)')
+
+        start_time = time.perf_counter()
+        signatures = get_minhash_signatures(corpus, workers=kwargs['workers'])
+        duration = time.perf_counter() - start_time
+        self.stdout.write(f'Batched: {duration:.2f}s ({len(corpus) / duration:.0f} docs/s)')
+
+        if not np.array_equal(legacy_signatures, signatures):
+            self.stderr.write(self.style.ERROR('Signatures mismatch'))
+            return
+        self.stdout.write(self.style.SUCCESS(f'Signatures match, speedup: {legacy_duration / duration:.1f}x'))
@@ -0,0 +1,32 @@
+# Generated by Django 3.2.17 on 2026-10-18 09:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lead', '0054_auto_20231218_0552'),
+        ('deduplication', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LSHIndexBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('band', models.PositiveSmallIntegerField()),
+                ('bucket', models.BinaryField()),
+                ('index', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='buckets', to='deduplication.lshindex')),
+                ('lead', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='lead.lead')),
+            ],
+            options={
+                'unique_together': {('index', 'lead', 'band')},
+            },
+        ),
+        migrations.AddIndex(
+            model_name='lshindexbucket',
+            index=models.Index(fields=['index', 'band', 'bucket'], name='dedup_bucket_lookup_idx'),
+        ),
+    ]
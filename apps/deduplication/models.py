@@ -1,7 +1,11 @@
 import pickle
-from django.db import models
-
+import functools
 import logging
+from collections import defaultdict
+from typing import Dict, Iterable, List, Set, Tuple
+
+from django.db import models
+from datasketch import LeanMinHash, MinHashLSH
 
 from apps.user_resource.models import UserResourceCreated
 from project.models import Project
@@ -47,6 +51,9 @@ class LSHIndex(UserResourceCreated):
     pickle_version = models.CharField(max_length=10, null=True)
     index_pickle = models.BinaryField(null=True)
     """
+    NOTE: Legacy storage. The index is now persisted as LSHIndexBucket rows,
+    pickles left by older indices are converted by migrate_legacy_index().
+
     A NOTE ON index_pickle - @bewakes, Feb 02 2023
 
     The index needs to persist that's why it is pickled and stored in db.
@@ -108,3 +115,135 @@ class LSHIndex(UserResourceCreated):
         # is reloaded
         self._index_loaded = False
         super().save(*args, **kwargs)
+
+    # Bucket storage
+    # NOTE: Only the bands of the affected lead are read/written, the index is never loaded as a whole.
+    @staticmethod
+    @functools.lru_cache(maxsize=None)
+    def get_band_ranges() -> List[Tuple[int, int]]:
+        """Same band/row split as datasketch uses for THRESHOLD and NUM_PERM"""
+        return MinHashLSH(
+            threshold=LSHIndex.THRESHOLD,
+            num_perm=LSHIndex.NUM_PERM,
+        ).hashranges
+
+    @classmethod
+    def get_bucket_keys(cls, minhash: LeanMinHash) -> List[bytes]:
+        # Same as MinHashLSH._H
+        return [
+            bytes(minhash.hashvalues[start:end].byteswap().data)
+            for start, end in cls.get_band_ranges()
+        ]
+
+    def _get_buckets_query(self, minhash: LeanMinHash) -> models.Q:
+        query = models.Q()
+        for band, key in enumerate(self.get_bucket_keys(minhash)):
+            query |= models.Q(band=band, bucket=key)
+        return query
+
+    def insert_many(self, items: Iterable[Tuple[int, LeanMinHash]]) -> int:
+        """
+        Add the (lead_id, minhash) pairs to the index. Already indexed leads are ignored.
+        Returns the number of bucket rows written.
+        """
+        buckets = [
+            LSHIndexBucket(index=self, lead_id=lead_id, band=band, bucket=key)
+            for lead_id, minhash in items
+            for band, key in enumerate(self.get_bucket_keys(minhash))
+        ]
+        LSHIndexBucket.objects.bulk_create(buckets, ignore_conflicts=True)
+        return len(buckets)
+
+    def insert(self, lead_id: int, minhash: LeanMinHash) -> int:
+        return self.insert_many([(lead_id, minhash)])
+
+    def remove(self, lead_id: int) -> int:
+        deleted, _ = LSHIndexBucket.objects.filter(index=self, lead_id=lead_id).delete()
+        return deleted
+
+    def query(self, minhash: LeanMinHash) -> List[int]:
+        """Return the candidate duplicate lead ids sharing at least one band bucket with minhash"""
+        return list(
+            LSHIndexBucket.objects.filter(
+                self._get_buckets_query(minhash),
+                index=self,
+            ).values_list('lead_id', flat=True).distinct()
+        )
+
+    def get_buckets(self, band_bucket_keys: Iterable[Tuple[int, bytes]]) -> Dict[Tuple[int, bytes], Set[int]]:
+        """
+        Return {(band, bucket key): lead ids} for the existing buckets matching any of the (band, bucket key).
+        """
+        buckets = defaultdict(set)
+        band_keys = defaultdict(set)
+        for band, key in band_bucket_keys:
+            band_keys[band].add(key)
+        if not band_keys:
+            return buckets
+        # One (band, bucket IN keys) per band to use the (index, band, bucket) index
+        query = models.Q()
+        for band, keys in band_keys.items():
+            query |= models.Q(band=band, bucket__in=keys)
+        bucket_qs = LSHIndexBucket.objects.filter(
+            query,
+            index=self,
+        ).values_list('lead_id', 'band', 'bucket')
+        for lead_id, band, key in bucket_qs:
+            buckets[(band, bytes(key))].add(lead_id)
+        return buckets
+
+    def has_lead(self, lead_id: int) -> bool:
+        return LSHIndexBucket.objects.filter(index=self, lead_id=lead_id).exists()
+
+    def get_lead_ids(self) -> List[int]:
+        return list(
+            LSHIndexBucket.objects.filter(index=self).values_list('lead_id', flat=True).distinct()
+        )
+
+    def migrate_legacy_index(self) -> int:
+        """
+        Move the keys of the pickled MinHashLSH (if any) to LSHIndexBucket rows and drop the pickle.
+        Returns the number of bucket rows written.
+        """
+        from lead.models import Lead
+
+        if self.index_pickle is None:
+            return 0
+        legacy_index = self.index
+        buckets = []
+        if legacy_index is not None:
+            # Removed leads were not always dropped from the pickled index
+            existing_lead_ids = set(
+                Lead.objects.filter(
+                    pk__in=list(legacy_index.keys.keys()),
+                ).values_list('id', flat=True)
+            )
+            buckets = [
+                LSHIndexBucket(index=self, lead_id=lead_id, band=band, bucket=key)
+                for lead_id, keys in legacy_index.keys.items()
+                if lead_id in existing_lead_ids
+                for band, key in enumerate(keys)
+            ]
+            LSHIndexBucket.objects.bulk_create(buckets, ignore_conflicts=True, batch_size=5000)
+        self._index = None
+        self.index_pickle = None
+        self.save(update_fields=['index_pickle'])
+        return len(buckets)
+
+
+class LSHIndexBucket(models.Model):
+    """
+    One row per (lead, band) of a project LSHIndex.
+    Two leads are duplicate candidates when they share the bucket of any band.
+    """
+    index = models.ForeignKey(LSHIndex, on_delete=models.CASCADE, related_name='buckets')
+    lead = models.ForeignKey('lead.Lead', on_delete=models.CASCADE, related_name='+')
+    band = models.PositiveSmallIntegerField()
+    # Band hash values packed as bytes (Same as datasketch MinHashLSH hashtable keys)
+    bucket = models.BinaryField()
+
+    class Meta:
+        unique_together = ('index', 'lead', 'band')
+        indexes = [
+            models.Index(fields=['index', 'band', 'bucket'], name='dedup_bucket_lookup_idx'),
+        ]
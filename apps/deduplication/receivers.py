@@ -1,6 +1,7 @@
 from django.db import transaction, models
 from django.dispatch import receiver
 
+from deep.caches import DataVersion
 from deduplication.models import LSHIndex
 from lead.models import Lead, LeadDuplicates
 
@@ -15,14 +16,20 @@ def set_leads_as_unindexed(sender, instance, **kwargs):
 
 @transaction.atomic
 def clear_duplicates(index_obj: LSHIndex):
-    index = index_obj.index
-    if index is None:
+    # NOTE: Index buckets are already deleted by cascade, use the project's indexed leads instead
+    lead_ids = list(
+        Lead.objects.filter(
+            project_id=index_obj.project_id,
+            is_indexed=True,
+        ).values_list('id', flat=True)
+    )
+    if not lead_ids:
         return
-    lead_ids = list(index.keys)
     Lead.objects.filter(id__in=lead_ids).update(
         is_indexed=False,
         duplicate_leads_count=0,
     )
+    DataVersion.bump_many_on_commit(DataVersion.PROJECT, [index_obj.project_id])
 
     LeadDuplicates.objects.filter(
         models.Q(source_lead_id__in=lead_ids) |
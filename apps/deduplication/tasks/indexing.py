@@ -1,44 +1,116 @@
 import pickle
-from django.db import transaction
-from django.db.models import F
+import time
+from typing import Iterable, List, Tuple
+from django.db import models, transaction
 from django.utils import timezone
 from celery import shared_task
 from celery.utils.log import get_task_logger
-from datasketch import LeanMinHash, MinHashLSH
+from datasketch import LeanMinHash
 
+from deep.caches import DataVersion
 from utils.common import batched
-from lead.models import Lead
+from lead.models import Lead, LeadDuplicates
 from project.models import Project
-from deduplication.models import LSHIndex
-from deduplication.utils import get_minhash, insert_to_index
+from deduplication.models import LSHIndex, LSHIndexBucket
+from deduplication.utils import get_minhash, get_minhashes
 
 logger = get_task_logger(__name__)
 
 
-def find_and_set_duplicate_leads(index: MinHashLSH, lead: Lead, minhash: LeanMinHash):
-    duplicate_lead_ids = index.query(minhash)
-    duplicate_leads_qs = Lead.objects.filter(pk__in=duplicate_lead_ids)
-    duplicate_leads_count = duplicate_leads_qs.count()
-    if duplicate_leads_count > 0:
-        lead.duplicate_leads_count += duplicate_leads_count
-        duplicate_leads_qs\
-            .update(duplicate_leads_count=F('duplicate_leads_count') + 1)
-    lead.duplicate_leads.set(duplicate_leads_qs)
-    lead.save(update_fields=['duplicate_leads_count'])
+def get_lead_text(lead: Lead) -> str:
+    return lead.leadpreview.text_extract if hasattr(lead, 'leadpreview') else lead.text
 
 
-def process_and_index_lead(lead: Lead, index: MinHashLSH):
-    text = lead.leadpreview.text_extract if hasattr(lead, 'leadpreview') else lead.text
-    if not text:
-        return index
-    minhash = get_minhash(text)
-    find_and_set_duplicate_leads(index, lead, minhash)
+def update_duplicate_leads_count(lead_ids: Iterable[int]):
+    """
+    Recompute duplicate_leads_count from LeadDuplicates using a single UPDATE
+    """
+    def _count_subquery(field):
+        return models.functions.Coalesce(
+            models.Subquery(
+                LeadDuplicates.objects.filter(
+                    **{field: models.OuterRef('pk')},
+                ).order_by().values(field).annotate(
+                    count=models.Count('id'),
+                ).values('count')[:1],
+                output_field=models.IntegerField(),
+            ), 0,
+        )
+
+    lead_qs = Lead.objects.filter(pk__in=lead_ids)
+    lead_qs.update(
+        duplicate_leads_count=_count_subquery('source_lead') + _count_subquery('target_lead'),
+    )
+    # NOTE: Queryset update skips the model signals
+    DataVersion.bump_many_on_commit(
+        DataVersion.PROJECT,
+        lead_qs.order_by().values_list('project_id', flat=True).distinct(),
+    )
+
+
+def find_and_set_duplicate_leads(
+    index_obj: LSHIndex,
+    leads_minhashes: List[Tuple[Lead, LeanMinHash]],
+) -> int:
+    """
+    Collect the duplicate pairs of the whole batch in memory and write them using set-based queries.
+    A lead is a duplicate of the already indexed leads and of the leads before it in the batch.
+    Returns the number of index bucket rows written.
+    """
+    if not leads_minhashes:
+        return 0
+    lead_ids = {lead.id for lead, _ in leads_minhashes}
+    leads_bucket_keys = [
+        (lead, index_obj.get_bucket_keys(minhash))
+        for lead, minhash in leads_minhashes
+    ]
+    # Single query for the existing buckets of the whole batch
+    buckets = index_obj.get_buckets(
+        (band, key)
+        for _, bucket_keys in leads_bucket_keys
+        for band, key in enumerate(bucket_keys)
+    )
+    for bucket_lead_ids in buckets.values():
+        # Re-indexed leads are handled in batch order
+        bucket_lead_ids.difference_update(lead_ids)
+
+    duplicate_pairs = []
+    duplicate_lead_ids = set()
+    for lead, bucket_keys in leads_bucket_keys:
+        lead_duplicate_ids = set()
+        for band, key in enumerate(bucket_keys):
+            bucket_lead_ids = buckets[(band, key)]
+            lead_duplicate_ids.update(bucket_lead_ids)
+            bucket_lead_ids.add(lead.id)
+        lead_duplicate_ids.discard(lead.id)
+        duplicate_lead_ids.update(lead_duplicate_ids)
+        duplicate_pairs.extend(
+            LeadDuplicates(source_lead_id=lead.id, target_lead_id=duplicate_lead_id)
+            for duplicate_lead_id in lead_duplicate_ids
+        )
 
-    insert_to_index(index, lead.id, minhash)
-    lead.is_indexed = True
-    lead.indexed_at = timezone.now()
-    lead.save(update_fields=['is_indexed', 'indexed_at'])
-    return index
+    LeadDuplicates.objects.bulk_create(duplicate_pairs, ignore_conflicts=True)
+    written_rows = index_obj.insert_many(
+        (lead.id, minhash)
+        for lead, minhash in leads_minhashes
+    )
+    indexed_at = timezone.now()
+    Lead.objects.filter(pk__in=lead_ids).update(is_indexed=True, indexed_at=indexed_at)
+    update_duplicate_leads_count(lead_ids | duplicate_lead_ids)
+    for lead, _ in leads_minhashes:
+        lead.is_indexed = True
+        lead.indexed_at = indexed_at
+    return written_rows
+
+
+def process_and_index_lead(lead: Lead, index_obj: LSHIndex) -> int:
+    """
+    Returns the number of index bucket rows written
+    """
+    text = get_lead_text(lead)
+    if not text:
+        return 0
+    return find_and_set_duplicate_leads(index_obj, [(lead, get_minhash(text))])
 
 
 def process_and_index_leads(
@@ -49,17 +121,22 @@ def process_and_index_leads(
     leads_qs = Lead.objects.filter(
         project=project,
         is_indexed=False,
-    )
-    index: MinHashLSH = index_obj.index
+    ).select_related('leadpreview')
     try:
         batches = batched(leads_qs, batch_size=200)
         for batch in batches:
+            leads_with_text = [
+                (lead, text)
+                for lead in batch
+                if (text := get_lead_text(lead))
+            ]
+            # Signatures for the whole batch are computed at once
+            minhashes = get_minhashes([text for _, text in leads_with_text])
             with transaction.atomic():
-                for lead in batch:
-                    process_and_index_lead(lead, index)
-                # Update the index
-                index_obj.index = index
-                index_obj.save()
+                find_and_set_duplicate_leads(
+                    index_obj,
+                    [(lead, minhash) for (lead, _), minhash in zip(leads_with_text, minhashes)],
+                )
     except Exception:
         logger.error(
             f"Error creating index for project {project.title}({project.id})",
@@ -86,10 +163,21 @@ def create_project_index(project: Project):
     process_and_index_leads(project, index_obj)
 
 
+@shared_task
+def create_project_index_task(project_id: int):
+    project = Project.objects.filter(pk=project_id).first()
+    if project is None:
+        logger.warning(f"Cannot create index for inexistent project(id={project_id})")
+        return
+    create_project_index(project)
+
+
 @shared_task
 def create_indices():
-    for project in Project.objects.all():
-        create_project_index(project)
+    # Only projects with unindexed leads, each one as a separate task so that they are spread across workers
+    project_ids = Lead.objects.filter(is_indexed=False).order_by().values_list('project_id', flat=True).distinct()
+    for project_id in project_ids:
+        create_project_index_task.delay(project_id)
 
 
 def get_index_object_for_project(project: Project) -> LSHIndex:
@@ -101,14 +189,10 @@ def get_index_object_for_project(project: Project) -> LSHIndex:
         },
     )
 
-    if created:
-        # MinHashLSH object will not be initialized during the creation, create it
-        index = MinHashLSH(
-            threshold=LSHIndex.THRESHOLD,
-            num_perm=LSHIndex.NUM_PERM,
-        )
-        index_obj.index = index
-        index_obj.save()
+    if not created and index_obj.index_pickle is not None:
+        # Index created before bucket storage, move it once
+        written_rows = index_obj.migrate_legacy_index()
+        logger.info(f"Migrated legacy LSHIndex(id={index_obj.id}) to {written_rows} bucket rows")
     return index_obj
 
 
@@ -119,7 +203,7 @@ def index_lead_and_calculate_duplicates(lead_id: int):
         logger.error(f"Cannot index inexistent lead(id={lead_id})")
         return
 
-    text = lead.leadpreview.text_extract if hasattr(lead, 'leadpreview') else lead.text
+    text = get_lead_text(lead)
     if not text:
         return
 
@@ -129,27 +213,21 @@ def index_lead_and_calculate_duplicates(lead_id: int):
         logger.warning(f"LSHIndex object has errored. object id {index_obj.id}")
         return
 
-    index = process_and_index_lead(lead, index_obj.index)
-    index_obj.index = index
-
-    index_obj.save(update_fields=['index_pickle'])
+    start_time = time.perf_counter()
+    with transaction.atomic():
+        written_rows = process_and_index_lead(lead, index_obj)
+    duration_ms = (time.perf_counter() - start_time) * 1000
+    logger.info(
+        f"Indexed lead(id={lead.id}) in LSHIndex(id={index_obj.id}): "
+        f"{written_rows} bucket rows written in {duration_ms:.2f} ms"
+    )
 
 
 @shared_task
 def remove_lead_from_index(lead_id: int):
-    lead = Lead.objects.filter(id=lead_id).first()
-    if lead is None:
-        logger.warning(f"Cannot remove inexistent lead(id={lead_id}) from index")
-        return
-    index_obj = get_index_object_for_project(lead.project)
-
-    if index_obj.has_errored:
-        logger.warning(f"Attempt to remove lead from errored index for project {lead.project.id}")
-        return
-    index = index_obj.index
-    if index is None:
-        logger.warning(f"Attempt to remove lead from inexistent index for project {lead.project.id}")
-        return
-    index.remove(lead.id)
-    index_obj.index = index
-    index_obj.save(update_fields=['index_pickle'])
+    # NOTE: This is triggered after the lead is deleted, so lead might not exist anymore.
+    # Buckets are also removed by cascade, this cleans up leads removed from index without deletion.
+    deleted_rows, _ = LSHIndexBucket.objects.filter(lead_id=lead_id).delete()
+    if deleted_rows == 0:
+        # Expected for deleted leads (Removed by cascade)
+        logger.debug(f"Lead(id={lead_id}) not present in any index")
@@ -1,13 +1,18 @@
+import pickle
 import pytest
 from unittest.mock import patch
+from datasketch import MinHashLSH
+from django.db import connection
 from django.db.models import Q
+from django.test.utils import CaptureQueriesContext
 
 from deep.tests import TestCase
 from project.factories import ProjectFactory
 from lead.factories import LeadPreviewFactory, LeadFactory
 from lead.receivers import update_index_and_duplicates
 from lead.models import Lead, LeadDuplicates
-from deduplication.models import LSHIndex
+from deduplication.models import LSHIndex, LSHIndexBucket
+from deduplication.utils import get_minhash, get_minhash_legacy, get_minhash_signatures
 from deduplication.factories import LSHIndexFactory
 from deduplication.tasks.indexing import (
     process_and_index_lead,
@@ -72,19 +77,68 @@ class TestTasks(TestCase):
 
         # get LSHIndex object
         index_obj = LSHIndex.objects.get(project=project)
-        assert lead.id in index_obj.index, "Lead should be present in the key"
+        assert index_obj.has_lead(lead.id), "Lead should be present in the key"
 
     def test_process_and_index_lead(self):
         project = ProjectFactory.create()
         lead = LeadFactory.create(project=project)
         LeadPreviewFactory.create(lead=lead, text_extract="This is some text")
         index_obj = get_index_object_for_project(project)
-        process_and_index_lead(lead, index_obj.index)
+        written_rows = process_and_index_lead(lead, index_obj)
         assert lead.is_indexed is True
         assert lead.indexed_at is not None
 
-        assert index_obj.index is not None
-        assert lead.id in index_obj.index
+        assert written_rows == len(LSHIndex.get_band_ranges()), "One bucket row per band"
+        assert LSHIndexBucket.objects.filter(index=index_obj, lead=lead).count() == written_rows
+        assert index_obj.has_lead(lead.id)
+
+    def test_query_index(self):
+        project = ProjectFactory.create()
+        index_obj = get_index_object_for_project(project)
+        common_text = "This is a common text between two leads. The purpose is to mark them as duplicates"
+        index_obj.insert(LeadFactory.create(project=project).id, get_minhash(common_text))
+        lead = LeadFactory.create(project=project)
+        index_obj.insert(lead.id, get_minhash(common_text))
+        other_lead = LeadFactory.create(project=project)
+        index_obj.insert(other_lead.id, get_minhash("Totally unrelated content about something else entirely"))
+
+        duplicate_lead_ids = index_obj.query(get_minhash(common_text))
+        assert lead.id in duplicate_lead_ids
+        assert other_lead.id not in duplicate_lead_ids
+        assert len(duplicate_lead_ids) == 2
+        # Re-inserting is a no-op
+        index_obj.insert(lead.id, get_minhash(common_text))
+        assert LSHIndexBucket.objects.filter(index=index_obj, lead=lead).count() == len(LSHIndex.get_band_ranges())
+
+    def test_minhash_signatures(self):
+        texts = [
+            "This is a common text between two leads. The purpose is to mark them as duplicates",
+            "",
+            "Another, text! With punctuations...",
+        ]
+        signatures = get_minhash_signatures(texts)
+        assert signatures.shape == (len(texts), LSHIndex.NUM_PERM)
+        for text, signature in zip(texts, signatures):
+            legacy_minhash = get_minhash_legacy(text)
+            assert (legacy_minhash.hashvalues == signature).all(), "Should match per-token computation"
+            assert get_minhash(text) == legacy_minhash
+
+    def test_migrate_legacy_index(self):
+        project = ProjectFactory.create()
+        lead, deleted_lead = LeadFactory.create_batch(2, project=project)
+        legacy_index = MinHashLSH(threshold=LSHIndex.THRESHOLD, num_perm=LSHIndex.NUM_PERM)
+        minhash = get_minhash("This is some text")
+        legacy_index.insert(lead.id, minhash)
+        legacy_index.insert(deleted_lead.id, minhash)
+        index_obj = LSHIndexFactory.create(project=project, pickle_version=pickle.format_version)
+        index_obj.index = legacy_index
+        index_obj.save()
+        deleted_lead.delete()
+
+        index_obj = get_index_object_for_project(project)
+        assert index_obj.index_pickle is None
+        assert index_obj.get_lead_ids() == [lead.id], "Only existing leads should be migrated"
+        assert index_obj.query(minhash) == [lead.id]
 
     def test_find_and_set_duplicate_leads(self):
         project = ProjectFactory.create()
@@ -118,11 +172,11 @@ class TestTasks(TestCase):
         LeadPreviewFactory.create(lead=lead, text_extract="This is some text")
         index_lead_and_calculate_duplicates(lead.id)
         index_obj = get_index_object_for_project(project)
-        assert lead.id in index_obj.index, "The lead should be present in index"
+        assert index_obj.has_lead(lead.id), "The lead should be present in index"
         # Now remove lead
         remove_lead_from_index(lead.id)
         index_obj = get_index_object_for_project(project)
-        assert lead.id not in index_obj.index, "The lead should be removed in index"
+        assert not index_obj.has_lead(lead.id), "The lead should be removed in index"
 
     def test_remove_lead_index_object(self):
         project = ProjectFactory.create()
@@ -160,6 +214,34 @@ class TestTasks(TestCase):
         assert project_leads.filter(duplicate_leads_count__gt=0).count() == 0, "No leads should have duplicates"
         assert LeadDuplicates.objects.all().count() == 0
 
+    def test_create_project_index_queries(self):
+        project = ProjectFactory.create()
+        num_leads = 30
+        common_text = "This is a common text between two leads. The purpose is to mark them as duplicates"
+        leads = LeadFactory.create_batch(num_leads, project=project)
+        for lead in leads:
+            LeadPreviewFactory.create(lead=lead, text_extract=common_text)
+        index_obj = get_index_object_for_project(project)
+
+        with CaptureQueriesContext(connection) as queries:
+            create_project_index(project)
+        # Duplicates are written in bulk, number of queries shouldn't depend on number of leads
+        assert len(queries) < 15
+        # Existing buckets are looked up using the band too (index: index, band, bucket)
+        bucket_queries = [
+            query['sql'] for query in queries.captured_queries
+            if query['sql'].startswith('SELECT') and '"bucket" IN' in query['sql']
+        ]
+        assert bucket_queries
+        assert all('."band" = ' in sql for sql in bucket_queries)
+
+        assert LeadDuplicates.objects.count() == num_leads * (num_leads - 1) // 2
+        assert LSHIndexBucket.objects.filter(index=index_obj).values('lead').distinct().count() == num_leads
+        assert list(
+            Lead.objects.filter(project=project).values_list('duplicate_leads_count', flat=True).distinct()
+        ) == [num_leads - 1]
+        assert Lead.objects.filter(project=project, is_indexed=True, indexed_at__isnull=False).count() == num_leads
+
     def test_update_index_and_duplicates(self):
         project = ProjectFactory.create()
         num_leads = 3
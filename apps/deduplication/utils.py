@@ -1,25 +1,113 @@
 import re
+import functools
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence, Set
+
+import numpy as np
 from datasketch import MinHash, LeanMinHash
+from datasketch.hashfunc import sha1_hash32
 
 from deduplication.models import LSHIndex
 
+# Same constants as datasketch.minhash
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64((1 << 32) - 1)
+MINHASH_SEED = 1
+# Max number of (token x permutation) values computed at once (~64MB of uint64)
+SIGNATURE_CHUNK_SIZE = 8 * 1024 * 1024
+
 
 def preprocess_text(txt: str):
     # Remove punctuations and make lowercase
     return re.sub(r"[!\"#\$%&\'\(\)\*\+,-\./:;<=>\?@\[\\\]\^_`{\|}~]", "", txt).lower()
 
 
-def get_minhash(txt: str) -> LeanMinHash:
-    processed = preprocess_text(txt)
-    items = set(processed.split())
-    h = MinHash(num_perm=LSHIndex.NUM_PERM)
-    for item in items:
+def tokenize(txt: str) -> Set[str]:
+    return set(preprocess_text(txt).split())
+
+
+def get_minhash_legacy(txt: str) -> LeanMinHash:
+    """
+    Per token MinHash update, kept as reference for get_minhash_signatures (Used by benchmark/tests)
+    """
+    h = MinHash(num_perm=LSHIndex.NUM_PERM, seed=MINHASH_SEED)
+    for item in tokenize(txt):
         h.update(item.encode("utf8"))
     return LeanMinHash(h)
 
 
-def insert_to_index(index, lead_id, lead_hash: LeanMinHash):
-    try:
-        index.insert(lead_id, lead_hash)
-    except ValueError:
-        pass
+@functools.lru_cache(maxsize=None)
+def get_minhash_permutations():
+    # Same permutations as datasketch.MinHash(num_perm=LSHIndex.NUM_PERM, seed=MINHASH_SEED)
+    a, b = MinHash(num_perm=LSHIndex.NUM_PERM, seed=MINHASH_SEED).permutations
+    return a, b
+
+
+def _get_signatures(tokens_list: List[Set[str]]) -> np.ndarray:
+    a, b = get_minhash_permutations()
+    signatures = np.full((len(tokens_list), LSHIndex.NUM_PERM), MAX_HASH, dtype=np.uint64)
+    # Tokens are hashed once for the whole batch
+    token_hashes: Dict[str, int] = {}
+    rows_per_chunk = max(1, SIGNATURE_CHUNK_SIZE // LSHIndex.NUM_PERM)
+
+    chunk_docs: List[int] = []
+    chunk_hashes: List[int] = []
+
+    def _flush():
+        if not chunk_docs:
+            return
+        hv = np.array(chunk_hashes, dtype=np.uint64)
+        # NOTE: uint64 overflow is part of datasketch's permutation, keep it as is.
+        phv = np.bitwise_and((hv[:, np.newaxis] * a + b) % MERSENNE_PRIME, MAX_HASH)
+        offsets = np.zeros(len(chunk_docs), dtype=np.int64)
+        np.cumsum([len(tokens_list[doc_index]) for doc_index in chunk_docs[:-1]], out=offsets[1:])
+        signatures[chunk_docs] = np.minimum.reduceat(phv, offsets, axis=0)
+        chunk_docs.clear()
+        chunk_hashes.clear()
+
+    for doc_index, tokens in enumerate(tokens_list):
+        # Empty documents keep the initial MAX_HASH values (same as an empty MinHash)
+        if not tokens:
+            continue
+        if chunk_hashes and len(chunk_hashes) + len(tokens) > rows_per_chunk:
+            _flush()
+        for token in tokens:
+            token_hash = token_hashes.get(token)
+            if token_hash is None:
+                token_hash = token_hashes[token] = sha1_hash32(token.encode('utf8'))
+            chunk_hashes.append(token_hash)
+        chunk_docs.append(doc_index)
+    _flush()
+    return signatures
+
+
+def get_minhash_signatures(texts: Sequence[str], workers: Optional[int] = None) -> np.ndarray:
+    """
+    Compute MinHash signatures for a batch of texts.
+    Returns uint64 array of shape (len(texts), LSHIndex.NUM_PERM), rows are LeanMinHash hashvalues.
+    workers: Spread the batch across this many processes (Not usable inside celery prefork workers).
+    """
+    tokens_list = [tokenize(text) for text in texts]
+    if not workers or workers <= 1 or len(tokens_list) < workers * 2:
+        return _get_signatures(tokens_list)
+    chunk_size = -(-len(tokens_list) // workers)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return np.vstack(list(executor.map(
+            _get_signatures,
+            [tokens_list[i:i + chunk_size] for i in range(0, len(tokens_list), chunk_size)],
+        )))
+
+
+def signature_to_minhash(signature: np.ndarray) -> LeanMinHash:
+    return LeanMinHash(seed=MINHASH_SEED, hashvalues=signature)
+
+
+def get_minhashes(texts: Sequence[str], workers: Optional[int] = None) -> List[LeanMinHash]:
+    return [
+        signature_to_minhash(signature)
+        for signature in get_minhash_signatures(texts, workers=workers)
+    ]
+
+
+def get_minhash(txt: str) -> LeanMinHash:
+    return get_minhashes([txt])[0]
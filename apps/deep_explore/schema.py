@@ -41,6 +41,7 @@ def node_cache(cache_key):
         cache_key,
         timeout=NODE_CACHE_TIMEOUT,
         cache_key_gen=cache_key_gen,
+        namespace=CacheKey.ExploreDeep.BASE,
     )
 
 
@@ -322,7 +323,11 @@ class ExploreDashboardStatType(graphene.ObjectType):
         return root.entries_qs.count()
 
     @staticmethod
-    @CacheHelper.gql_cache(CacheKey.ExploreDeep.TOTAL_ENTRIES_ADDED_LAST_WEEK_COUNT, timeout=NODE_CACHE_TIMEOUT)
+    @CacheHelper.gql_cache(
+        CacheKey.ExploreDeep.TOTAL_ENTRIES_ADDED_LAST_WEEK_COUNT,
+        timeout=NODE_CACHE_TIMEOUT,
+        namespace=CacheKey.ExploreDeep.BASE,
+    )
     def resolve_total_entries_added_last_week(*_) -> int:
         return Entry.objects.filter(
             created_at__gte=timezone.now().date() - timedelta(days=7)
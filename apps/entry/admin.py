@@ -64,6 +64,7 @@ class EntryAdmin(VersionAdmin):
         'lead', 'project', 'created_by', 'modified_by', 'analysis_framework', 'tabular_field',
         'image', 'controlled_changed_by', 'verified_by', 'entry_attachment',
     )
+    exclude = Entry.FILTER_INDEX_FIELDS
     ordering = ('project', 'created_by', 'created_at')
 
     def get_queryset(self, request):
@@ -5,13 +5,14 @@ from datetime import datetime
 import graphene
 import django_filters
 from django.db import models
+from django.db.models.sql.datastructures import Join
 from django.contrib.auth.models import User
-from django.contrib.postgres.aggregates.general import ArrayAgg
 from graphene_django.filter.filterset import GrapheneFilterSetMixin
 from graphene_django.filter.utils import get_filtering_args_from_filterset
 
 from user_resource.filters import UserResourceGqlFilterSet
 from utils.common import is_valid_number
+from utils.db.functions import TrigramWordSimilarity
 from utils.graphene.fields import (
     generate_simple_object_type_from_input_type,
     generate_object_field_from_input_type,
@@ -28,7 +29,7 @@ from analysis_framework.models import Filter
 from lead.models import Lead
 from organization.models import OrganizationType
 from analysis_framework.models import Widget
-from geo.models import GeoArea
+from geo.hierarchy import GeoAreaHierarchy
 from quality_assurance.models import EntryReviewComment
 
 from lead.enums import (
@@ -38,8 +39,10 @@ from lead.enums import (
 )
 from entry.widgets.date_widget import parse_date_str
 from entry.widgets.time_widget import parse_time_str
+from entry.widgets.utils import get_filter_index_key, get_filter_index_values
 
 from .models import (
+    Attribute,
     Entry,
     EntryComment,
     ProjectEntryLabel,
@@ -47,6 +50,38 @@ from .models import (
 from .enums import EntryTagTypeEnum
 
 
+def has_multi_valued_join(qs):
+    """
+    Queryset joins a reverse foreign key or many to many relation (Can have duplicate rows)
+    """
+    return any(
+        isinstance(join, Join) and (join.join_field.one_to_many or join.join_field.many_to_many)
+        for join in qs.query.alias_map.values()
+    )
+
+
+def filter_entries_by_geo_custom_shapes(queryset, shape_types):
+    """
+    Entries having custom shapes (drawn in the geo widget) of any of the given types.
+    NOTE: Single EXISTS without joins (no duplicate rows), containment uses entry_attribute_data_value_gin
+    """
+    shape_types = sorted({shape_type.strip() for shape_type in shape_types if shape_type.strip()})
+    if not shape_types:
+        return queryset
+    attribute_qs = Attribute.objects.filter(
+        reduce(
+            lambda acc, item: acc | item,
+            [
+                models.Q(data__value__contains=[{'type': shape_type}])
+                for shape_type in shape_types
+            ],
+        ),
+        entry=models.OuterRef('pk'),
+        widget__widget_id=Widget.WidgetType.GEO,
+    )
+    return queryset.filter(models.Exists(attribute_qs))
+
+
 # TODO: Find out whether we need to call timezone.make_aware
 # from django.utils module to all datetime objects below
 
@@ -204,16 +239,7 @@ class EntryFilterMixin(django_filters.filterset.FilterSet):
 
     def geo_custom_shape_filter(self, queryset, name, value):
         if value:
-            query_params = reduce(
-                lambda acc, item: acc | item,
-                [
-                    models.Q(
-                        attribute__widget__widget_id='geoWidget',
-                        attribute__data__value__contains=[{'type': v}],
-                    ) for v in value.split(',')
-                ],
-            )
-            return queryset.filter(query_params)
+            return filter_entries_by_geo_custom_shapes(queryset, value.split(','))
         return queryset
 
     def project_entry_labels_filter(self, queryset, name, value):
@@ -247,7 +273,10 @@ class EntryFilterMixin(django_filters.filterset.FilterSet):
         # Note: Since we cannot have `.distinct()` inside a subquery
         if self.data.get('from_subquery', False):
             return Entry.objects.filter(id__in=qs)
-        return qs.distinct()
+        # AF filters (filter index), search and geo filters don't join, distinct is only required for multi-valued joins
+        if has_multi_valued_join(qs):
+            return qs.distinct()
+        return qs
 
 
 class EntryFilterSet(EntryFilterMixin, django_filters.rest_framework.FilterSet):
@@ -371,51 +400,43 @@ def get_filtered_entries_using_af_filter(
             value_gte = value_gte and parse_time_str(value_gte)['time_val']
             value_lte = value_lte and parse_time_str(value_lte)['time_val']
 
+        # NOTE: Filtering is done using the denormalized Entry.filter_index_* (No join with FilterData)
+        index_key = f'filter_index_data__{get_filter_index_key(_filter.pk)}'
         if _filter.filter_type == Filter.FilterType.NUMBER:
             if value:
                 entries = entries.filter(
-                    filterdata__filter=_filter,
-                    filterdata__number=value,
+                    filter_index_data__contains={get_filter_index_key(_filter.pk): {'number': int(value)}},
                 )
             else:
                 if value_lte:
-                    entries = entries.filter(
-                        filterdata__filter=_filter,
-                        filterdata__number__lte=value_lte,
-                    )
+                    entries = entries.filter(**{f'{index_key}__number__lte': int(value_lte)})
                 if value_gte:
-                    entries = entries.filter(
-                        filterdata__filter=_filter,
-                        filterdata__number__gte=value_gte,
-                    )
+                    entries = entries.filter(**{f'{index_key}__number__gte': int(value_gte)})
 
         elif _filter.filter_type == Filter.FilterType.TEXT:
             if value:
-                entries = entries.filter(
-                    filterdata__filter=_filter,
-                    filterdata__text__icontains=value,
-                )
+                entries = entries.filter(**{f'{index_key}__text__icontains': value})
 
         elif _filter.filter_type == Filter.FilterType.INTERSECTS:
             if value:
-                entries = entries.filter(
-                    filterdata__filter=_filter,
-                    filterdata__from_number__lte=value,
-                    filterdata__to_number__gte=value,
-                )
+                entries = entries.filter(**{
+                    f'{index_key}__from_number__lte': int(value),
+                    f'{index_key}__to_number__gte': int(value),
+                })
 
             if value_lte and value_gte:
-                q = models.Q(
-                    filterdata__from_number__lte=value_lte,
-                    filterdata__to_number__gte=value_lte,
-                ) | models.Q(
-                    filterdata__from_number__lte=value_gte,
-                    filterdata__to_number__gte=value_gte,
-                ) | models.Q(
-                    filterdata__from_number__gte=value_gte,
-                    filterdata__to_number__lte=value_lte,
-                )
-                entries = entries.filter(q, filterdata__filter=_filter)
+                value_lte, value_gte = int(value_lte), int(value_gte)
+                q = models.Q(**{
+                    f'{index_key}__from_number__lte': value_lte,
+                    f'{index_key}__to_number__gte': value_lte,
+                }) | models.Q(**{
+                    f'{index_key}__from_number__lte': value_gte,
+                    f'{index_key}__to_number__gte': value_gte,
+                }) | models.Q(**{
+                    f'{index_key}__from_number__gte': value_gte,
+                    f'{index_key}__to_number__lte': value_lte,
+                })
+                entries = entries.filter(q)
 
         elif _filter.filter_type == Filter.FilterType.LIST:
             if value_list and not isinstance(value_list, list):
@@ -424,25 +445,18 @@ def get_filtered_entries_using_af_filter(
             if value_list:
                 # Fetch sub-regions if required
                 if region_max_level and include_sub_regions and _filter.widget_type == Widget.WidgetType.GEO:
-                    # XXX: simple values('id') doesn't work. Better way?
-                    value_list = GeoArea.\
-                        get_sub_childrens(value_list, level=region_max_level)\
-                        .filter(admin_level__region__project=project)\
-                        .order_by().values('admin_level__region__project')\
-                        .annotate(ids=ArrayAgg('id'))\
-                        .values('ids')
-
-                query_filter = models.Q(
-                    filterdata__filter=_filter,
-                    # This will use <OR> filter
-                    filterdata__values__overlap=value_list,
-                )
+                    value_list = [
+                        geo_area_id
+                        for geo_hierarchy in GeoAreaHierarchy.get_for_regions(project.regions.only('id', 'cache_index'))
+                        for geo_area_id in geo_hierarchy.get_sub_children_ids(value_list, level=region_max_level)
+                    ]
+                index_values = get_filter_index_values(_filter.pk, value_list)
+
+                # This will use <OR> filter
+                query_filter = models.Q(filter_index_values__overlap=index_values)
                 if use_and_operator:
-                    query_filter = models.Q(
-                        filterdata__filter=_filter,
-                        # This will use <AND> filter
-                        filterdata__values__contains=value_list,
-                    )
+                    # This will use <AND> filter
+                    query_filter = models.Q(filter_index_values__contains=index_values)
                 # Use filter to exclude entries
                 if use_exclude:
                     entries = entries.exclude(query_filter)
@@ -621,16 +635,7 @@ class EntryGQFilterSet(GrapheneFilterSetMixin, UserResourceGqlFilterSet):
 
     def geo_custom_shape_filter(self, queryset, name, value):
         if value:
-            query_params = reduce(
-                lambda acc, item: acc | item,
-                [
-                    models.Q(
-                        attribute__widget__widget_id='geoWidget',
-                        attribute__data__value__contains=[{'type': v}],
-                    ) for v in value.split(',')
-                ],
-            )
-            return queryset.filter(query_params)
+            return filter_entries_by_geo_custom_shapes(queryset, value.split(','))
         return queryset
 
     def project_entry_labels_filter(self, queryset, name, value):
@@ -682,10 +687,22 @@ class EntryGQFilterSet(GrapheneFilterSetMixin, UserResourceGqlFilterSet):
 
     def search_filter(self, qs, _, value):
         if value:
-            filters = models.Q(lead__title__icontains=value) | models.Q(excerpt__icontains=value)
+            # NOTE: Uses trigram indexes of UPPER(lead.title) and UPPER(entry.excerpt)
+            filters = models.Q(
+                lead__in=Lead.objects.filter(title__icontains=value).values('id'),
+            ) | models.Q(excerpt__icontains=value)
             if is_valid_number(value):
                 filters = models.Q(id=value) | filters
-            return qs.filter(filters)
+            qs = qs.filter(filters)
+            if not qs.query.order_by:
+                # Matched by either lead title or excerpt, rank using the better match
+                qs = qs.order_by(
+                    models.functions.Greatest(
+                        TrigramWordSimilarity(value, 'lead__title'),
+                        TrigramWordSimilarity(value, 'excerpt'),
+                    ).desc(),
+                    '-id',
+                )
         return qs
 
     @property
@@ -694,7 +711,10 @@ class EntryGQFilterSet(GrapheneFilterSetMixin, UserResourceGqlFilterSet):
         # Note: Since we cannot have `.distinct()` inside a subquery
         if self.data.get('from_subquery', False):
             return Entry.objects.filter(id__in=qs)
-        return qs.distinct()
+        # AF filters (filter index), search and geo filters don't join, distinct is only required for multi-valued joins
+        if has_multi_valued_join(qs):
+            return qs.distinct()
+        return qs
 
 
 def get_entry_filter_object_type(input_type):
@@ -0,0 +1,44 @@
+# Generated by Django 3.2.17 on 2026-10-18 14:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('entry', '0038_auto_20240709_0417'),
+    ]
+
+    operations = [
+        # Remove duplicate rows (if any) before adding the constraints, keep the latest one
+        migrations.RunSQL(
+            sql='''
+                DELETE FROM entry_filterdata a
+                USING entry_filterdata b
+                WHERE
+                    a.id < b.id AND
+                    a.entry_id = b.entry_id AND
+                    a.filter_id = b.filter_id
+            ''',
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.RunSQL(
+            sql='''
+                DELETE FROM entry_exportdata a
+                USING entry_exportdata b
+                WHERE
+                    a.id < b.id AND
+                    a.entry_id = b.entry_id AND
+                    a.exportable_id = b.exportable_id
+            ''',
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AddConstraint(
+            model_name='filterdata',
+            constraint=models.UniqueConstraint(fields=('entry', 'filter'), name='unique_entry_filter_data'),
+        ),
+        migrations.AddConstraint(
+            model_name='exportdata',
+            constraint=models.UniqueConstraint(fields=('entry', 'exportable'), name='unique_entry_export_data'),
+        ),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 3.2.17 on 2026-10-18 15:05
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+from utils.common import batched
+
+
+# NOTE: Same as entry.widgets.utils.update_entry_filter_index (Copied to not depend on the live app code)
+UPDATE_ENTRY_FILTER_INDEX_SQL = '''
+    UPDATE entry_entry AS entry SET
+        filter_index_values = COALESCE((
+            SELECT array_agg(filter_data.filter_id::text || ':' || filter_value)
+            FROM entry_filterdata AS filter_data, unnest(filter_data."values") AS filter_value
+            WHERE filter_data.entry_id = entry.id
+        ), '{}'),
+        filter_index_data = COALESCE((
+            SELECT jsonb_object_agg(
+                'f' || filter_data.filter_id::text,
+                jsonb_strip_nulls(jsonb_build_object(
+                    'number', filter_data.number,
+                    'from_number', filter_data.from_number,
+                    'to_number', filter_data.to_number,
+                    'text', filter_data.text
+                ))
+            )
+            FROM entry_filterdata AS filter_data
+            WHERE filter_data.entry_id = entry.id
+        ), '{}')
+    WHERE entry.id = ANY(%s)
+'''
+
+
+def populate_entry_filter_index(apps, schema_editor):
+    FilterData = apps.get_model('entry', 'FilterData')
+    entry_ids_qs = FilterData.objects.order_by('entry_id').values_list('entry_id', flat=True).distinct()
+    with schema_editor.connection.cursor() as cursor:
+        for entry_ids in batched(entry_ids_qs.iterator(), batch_size=5000):
+            cursor.execute(UPDATE_ENTRY_FILTER_INDEX_SQL, [list(entry_ids)])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('entry', '0039_unique_filter_export_data'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='entry',
+            name='filter_index_data',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='entry',
+            name='filter_index_values',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.TextField(), blank=True, default=list, size=None),
+        ),
+        migrations.RunPython(populate_entry_filter_index, reverse_code=migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='entry',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['filter_index_values'], name='entry_filter_index_values_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='entry',
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=['filter_index_data'], name='entry_filter_index_data_gin', opclasses=['jsonb_path_ops'],
+            ),
+        ),
+    ]
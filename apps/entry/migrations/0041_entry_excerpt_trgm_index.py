@@ -0,0 +1,19 @@
+# Generated by Django 3.2.17 on 2026-10-18 15:40
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0004_auto_20171129_0851'),  # pg_trgm extension
+        ('entry', '0040_entry_filter_index'),
+    ]
+
+    operations = [
+        # Used by excerpt__icontains (UPPER(excerpt) LIKE UPPER(...))
+        migrations.RunSQL(
+            sql='CREATE INDEX entry_excerpt_upper_trgm ON entry_entry USING gin ((UPPER(excerpt::text)) gin_trgm_ops)',
+            reverse_sql='DROP INDEX IF EXISTS entry_excerpt_upper_trgm',
+        ),
+    ]
@@ -0,0 +1,19 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('entry', '0041_entry_excerpt_trgm_index'),
+    ]
+
+    operations = [
+        # Used by geo custom shape filter (data -> 'value' @> '[{"type": ...}]')
+        migrations.RunSQL(
+            sql=(
+                "CREATE INDEX entry_attribute_data_value_gin ON entry_attribute"
+                " USING gin ((data -> 'value') jsonb_path_ops)"
+            ),
+            reverse_sql='DROP INDEX IF EXISTS entry_attribute_data_value_gin',
+        ),
+    ]
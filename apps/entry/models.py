@@ -2,11 +2,12 @@ import os
 from django.contrib.contenttypes.fields import GenericRelation
 from django.contrib.postgres.aggregates.general import ArrayAgg
 from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
 from django.db import models
 
 from deep.middleware import get_current_user
 from unified_connector.models import ConnectorLeadPreviewAttachment
-from utils.common import parse_number
+from utils.common import parse_number, get_save_update_fields
 from project.mixins import ProjectEntityMixin
 from project.permissions import PROJECT_PERMISSIONS
 from gallery.models import File
@@ -109,6 +110,15 @@ class Entry(UserResource, ProjectEntityMixin):
     verified_by = models.ManyToManyField(User, blank=True)
     draft_entry = models.ForeignKey(DraftEntry, on_delete=models.SET_NULL, null=True, blank=True)
 
+    # Denormalized FilterData used to filter entries using AF filters without joins.
+    # NOTE: Managed by entry.widgets.utils.update_entry_filter_index, not by Entry.save
+    # ['<filter_id>:<value>'] for FilterData.values
+    filter_index_values = ArrayField(models.TextField(), default=list, blank=True)
+    # {'f<filter_id>': {number, from_number, to_number, text}}
+    filter_index_data = models.JSONField(default=dict, blank=True)
+
+    FILTER_INDEX_FIELDS = ('filter_index_values', 'filter_index_data')
+
     # NOTE: control is like final verified action
     def control(self, user, controlled=True):
         self.controlled = controlled
@@ -156,6 +166,12 @@ class Entry(UserResource, ProjectEntityMixin):
 
     def save(self, *args, **kwargs):
         self.excerpt_modified = self.excerpt != self.dropped_excerpt
+        if self.pk is None or self._state.adding:
+            self.filter_index_values = []
+            self.filter_index_data = {}
+        elif kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            # Don't overwrite the filter index (updated using SQL) with the stale values of this instance
+            kwargs['update_fields'] = get_save_update_fields(self, self.FILTER_INDEX_FIELDS)
         super().save(*args, **kwargs)
 
     def get_image_url(self):
@@ -232,6 +248,10 @@ class Entry(UserResource, ProjectEntityMixin):
     class Meta(UserResource.Meta):
         verbose_name_plural = 'entries'
         ordering = ['order', '-created_at']
+        indexes = [
+            GinIndex(fields=['filter_index_values'], name='entry_filter_index_values_gin'),
+            GinIndex(fields=['filter_index_data'], name='entry_filter_index_data_gin', opclasses=['jsonb_path_ops']),
+        ]
 
 
 class Attribute(models.Model):
@@ -297,6 +317,12 @@ class FilterData(models.Model):
     to_number = models.IntegerField(default=None, blank=True, null=True)
     text = models.TextField(default=None, blank=True, null=True)
 
+    class Meta:
+        constraints = [
+            # Used by upsert (See entry.widgets.utils.upsert_filter_data)
+            models.UniqueConstraint(fields=('entry', 'filter'), name='unique_entry_filter_data'),
+        ]
+
     @staticmethod
     def get_for(user):
         """
@@ -329,6 +355,12 @@ class ExportData(models.Model):
     exportable = models.ForeignKey(Exportable, on_delete=models.CASCADE)
     data = models.JSONField(default=None, blank=True, null=True)
 
+    class Meta:
+        constraints = [
+            # Used by upsert (See entry.widgets.utils.upsert_export_data)
+            models.UniqueConstraint(fields=('entry', 'exportable'), name='unique_entry_export_data'),
+        ]
+
     @staticmethod
     def get_for(user):
         """
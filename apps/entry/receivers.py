@@ -1,8 +1,10 @@
-from django.db import models
+from django.db import models, transaction
 from django.dispatch import receiver
 
+from analysis_framework.models import AnalysisFramework, Filter
 from lead.models import Lead
-from .models import Entry
+from .models import Entry, FilterData
+from .widgets.utils import update_entry_filter_index
 
 
 @receiver(models.signals.post_save, sender=Entry)
@@ -11,3 +13,28 @@ def update_lead_status(sender, instance, created, **kwargs):
     if lead.status == Lead.Status.NOT_TAGGED:
         lead.status = Lead.Status.IN_PROGRESS
         lead.save(update_fields=['status'])
+
+
+@receiver(models.signals.post_save, sender=FilterData)
+def filter_data_post_save(sender, instance, **kwargs):
+    # NOTE: Bulk writes are handled by entry.widgets.utils.upsert_filter_data
+    update_entry_filter_index([instance.entry_id])
+
+
+# NOTE: No post_delete receiver for FilterData, it would disable the fast (single query) cascade delete.
+# Deleted entries don't need the index, only the Filter delete needs a rebuild for the remaining entries.
+@receiver(models.signals.pre_delete, sender=Filter)
+def filter_pre_delete(sender, instance, **kwargs):
+    entry_ids = list(
+        FilterData.objects.filter(filter=instance).values_list('entry_id', flat=True)
+    )
+    if not entry_ids:
+        return
+    analysis_framework_id = instance.analysis_framework_id
+
+    def _update_entry_filter_index():
+        # Entries are deleted with the framework (cascade)
+        if AnalysisFramework.objects.filter(pk=analysis_framework_id).exists():
+            update_entry_filter_index(entry_ids)
+
+    transaction.on_commit(_update_entry_filter_index)
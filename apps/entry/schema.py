@@ -2,12 +2,13 @@ import graphene
 
 from django.db.models import QuerySet
 from graphene_django import DjangoObjectType
-from graphene_django_extras import DjangoObjectField, PageGraphqlPagination
+from graphene_django_extras import DjangoObjectField
 
 from utils.common import has_prefetched
 from utils.graphene.enums import EnumDescription
 from utils.graphene.types import CustomDjangoListObjectType, ClientIdMixin, FileFieldType
 from utils.graphene.fields import DjangoPaginatedListObjectField, DjangoListField
+from utils.graphene.pagination import CursorPageGraphqlPagination, ListCountStrategy
 from user_resource.schema import UserResourceMixin
 from deep.permissions import ProjectPermissions as PP
 from lead.models import Lead
@@ -157,13 +158,15 @@ class EntryListType(CustomDjangoListObjectType):
     class Meta:
         model = Entry
         filterset_class = EntryGQFilterSet
+        count_strategy = ListCountStrategy.ESTIMATED
+        with_next_cursor = True
 
 
 class Query:
     entry = DjangoObjectField(EntryType)
     entries = DjangoPaginatedListObjectField(
         EntryListType,
-        pagination=PageGraphqlPagination(
+        pagination=CursorPageGraphqlPagination(
             page_size_query_param='pageSize'
         )
     )
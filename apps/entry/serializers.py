@@ -220,7 +220,7 @@ class EntrySerializer(RemoveNullFieldsMixin,
 
     class Meta:
         model = Entry
-        fields = '__all__'
+        exclude = Entry.FILTER_INDEX_FIELDS
 
     def get_project_labels(self, entry):
         # Should be provided from view
@@ -336,7 +336,7 @@ class EditEntriesDataSerializer(RemoveNullFieldsMixin,
         for region in lead.project.regions.all():
             if not region.geo_options:
                 region.calc_cache()
-            options[str(region.id)] = region.geo_options
+            options[str(region.id)] = region.get_geo_area_options()
         return options
 
     def get_entry_labels(self, lead):
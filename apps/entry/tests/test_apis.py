@@ -26,20 +26,9 @@ from tabular.models import Sheet, Field
 class EntryTests(TestCase):
     def create_entry_with_data_series(self):
         sheet = autofixture.create_one(Sheet, generate_fk=True)
-        series = [  # create some dummy values
-            {
-                'value': 'male', 'processed_value': 'male',
-                'invalid': False, 'empty': False
-            },
-            {
-                'value': 'female', 'processed_value': 'female',
-                'invalid': False, 'empty': False
-            },
-            {
-                'value': 'female', 'processed_value': 'female',
-                'invalid': False, 'empty': False
-            },
-        ]
+        series = {  # create some dummy values
+            'values': ['male', 'female', 'female'],
+        }
         cache_series = [
             {'value': 'male', 'count': 1},
             {'value': 'female', 'count': 2},
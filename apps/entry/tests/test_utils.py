@@ -0,0 +1,120 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from deep.tests import TestCase
+
+from analysis_framework.factories import AnalysisFrameworkFactory, WidgetFactory
+from analysis_framework.models import Widget, Filter
+from entry.factories import EntryFactory, EntryAttributeFactory
+from entry.filter_set import EntryGQFilterSet, get_filtered_entries_using_af_filter, has_multi_valued_join
+from entry.models import Entry, Attribute, FilterData, ExportData
+from entry.utils import AttributesDataUpdater, update_attributes
+from lead.factories import LeadFactory
+from project.factories import ProjectFactory
+
+
+class TestAttributesDataUpdater(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.af = AnalysisFrameworkFactory.create()
+        self.widget = WidgetFactory.create(
+            analysis_framework=self.af,
+            widget_id=Widget.WidgetType.SCALE,
+            properties={
+                'options': [
+                    {'key': 'scale-1', 'label': 'Scale 1', 'color': '#fff'},
+                    {'key': 'scale-2', 'label': 'Scale 2', 'color': '#000'},
+                ],
+            },
+        )
+        project = ProjectFactory.create(analysis_framework=self.af)
+        lead = LeadFactory.create(project=project)
+        self.entries = EntryFactory.create_batch(5, lead=lead)
+
+    def test_attribute_save(self):
+        attribute = EntryAttributeFactory.create(entry=self.entries[0], widget=self.widget, data={'value': 'scale-1'})
+        filter_data = FilterData.objects.get(entry=self.entries[0])
+        export_data = ExportData.objects.get(entry=self.entries[0])
+        assert filter_data.values == ['scale-1']
+        assert export_data.data['excel'] == {'value': 'Scale 1'}
+
+        # Existing data is updated
+        attribute.data = {'value': 'scale-2'}
+        attribute.save()
+        filter_data.refresh_from_db()
+        export_data.refresh_from_db()
+        assert filter_data.values == ['scale-2']
+        assert export_data.data['excel'] == {'value': 'Scale 2'}
+
+    def test_bulk_update(self):
+        Attribute.objects.bulk_create([
+            Attribute(entry=entry, widget=self.widget, data={'value': 'scale-2'})
+            for entry in self.entries
+        ])
+        assert FilterData.objects.count() == 0
+        assert ExportData.objects.count() == 0
+
+        updater = AttributesDataUpdater()
+        assert updater.update_queryset(Attribute.objects.all(), chunk_size=3) == 5
+        assert FilterData.objects.filter(values=['scale-2']).count() == 5
+        assert ExportData.objects.filter(data__excel__value='Scale 2').count() == 5
+
+        # Rerun doesn't create duplicates
+        assert update_attributes(widget=self.widget) == 5
+        assert FilterData.objects.count() == 5
+        assert ExportData.objects.count() == 5
+
+    def test_filter_index(self):
+        _filter = Filter.objects.get(analysis_framework=self.af, widget_key=self.widget.key)
+        for entry, value in zip(self.entries[:3], ['scale-1', 'scale-2', 'scale-1']):
+            EntryAttributeFactory.create(entry=entry, widget=self.widget, data={'value': value})
+
+        entry = Entry.objects.get(pk=self.entries[0].pk)
+        assert entry.filter_index_values == [f'{_filter.pk}:scale-1']
+        # Entry save doesn't overwrite the index
+        entry.filter_index_values = []
+        entry.save()
+        entry.refresh_from_db()
+        assert entry.filter_index_values == [f'{_filter.pk}:scale-1']
+
+        def _get_filtered_entries(value_list, **kwargs):
+            qs = get_filtered_entries_using_af_filter(
+                Entry.objects.all(),
+                Filter.qs_with_widget_type().filter(pk=_filter.pk),
+                [{'filter_key': _filter.key, 'value_list': value_list, **kwargs}],
+                new_query_structure=True,
+            )
+            assert 'entry_filterdata' not in str(qs.query)
+            return set(qs.values_list('id', flat=True))
+
+        assert _get_filtered_entries(['scale-1']) == {self.entries[0].pk}
+        assert _get_filtered_entries(['scale-1', 'scale-2']) == {entry.pk for entry in self.entries[:2]}
+        assert _get_filtered_entries(['scale-1', 'scale-2'], use_and_operator=True) == set()
+        assert _get_filtered_entries(['scale-1'], use_exclude=True) == {
+            entry.pk for entry in self.entries if entry.pk != self.entries[0].pk
+        }
+
+        # Entry delete doesn't rebuild the index (FilterData are fast deleted)
+        with CaptureQueriesContext(connection) as queries:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.entries[2].delete()
+        assert not any('filter_index_values' in query['sql'] for query in queries.captured_queries)
+        # Removed Filter is removed from the index (single rebuild after commit)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            _filter.delete()
+        assert len(callbacks) == 1
+        assert FilterData.objects.count() == 0
+        assert Entry.objects.get(pk=self.entries[0].pk).filter_index_values == []
+        assert Entry.objects.get(pk=self.entries[0].pk).filter_index_data == {}
+
+    def test_filter_set_distinct(self):
+        assert not has_multi_valued_join(Entry.objects.filter(lead__title='title', created_by__username='user'))
+        assert has_multi_valued_join(Entry.objects.filter(entrygrouplabel__group__title='group'))
+        assert has_multi_valued_join(Entry.objects.filter(lead__authors__title='author'))
+
+        def _get_qs(**filters):
+            return EntryGQFilterSet(data=filters, queryset=Entry.objects.all()).qs
+
+        # DISTINCT is only used for multi-valued joins
+        assert not _get_qs(search='excerpt', controlled=True).query.distinct
+        assert _get_qs(lead_group_label='group').query.distinct
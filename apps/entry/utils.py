@@ -1,50 +1,136 @@
+import time
+import logging
+
+from analysis_framework.models import Filter, Exportable
 from entry.models import Attribute
 from gallery.models import File
 from utils.image import decode_base64_if_possible
 
-from .widgets.utils import set_filter_data, set_export_data
+from .widgets.utils import upsert_filter_data, upsert_export_data
 from .widgets.store import widget_store
 
+logger = logging.getLogger(__name__)
 
-def update_entry_attribute(attribute):
-    entry = attribute.entry
-    widget = attribute.widget
-    data = attribute.data or {}
-    if not entry or not widget:
-        return
 
-    widget_module = widget_store.get(widget.widget_id)
-    if widget_module:
+class AttributesDataUpdater:
+    """
+    Generate FilterData/ExportData for attributes in batch.
+    - Filters/Exportables are loaded once per analysis framework.
+    - Attributes are processed in chunks (keyset pagination), each chunk is written using bulk upserts.
+    - The upserts bump the project data version (No model signals for bulk writes).
+    """
+    CHUNK_SIZE = 1000
+
+    def __init__(self):
+        # {af_id: {(widget_key, key): filter_id}}
+        self.filters_map = {}
+        # {af_id: {widget_key: exportable_id}}
+        self.exportables_map = {}
+        self.count = 0
+        self.duration = 0
+
+    def _load_framework(self, af_id):
+        if af_id in self.filters_map:
+            return
+        self.filters_map[af_id] = {
+            (widget_key, key): filter_id
+            for filter_id, widget_key, key in Filter.objects.filter(
+                analysis_framework=af_id,
+            ).values_list('id', 'widget_key', 'key')
+        }
+        self.exportables_map[af_id] = {
+            widget_key: exportable_id
+            # NOTE: Latest exportable is used if there are duplicates (Same as the old behaviour)
+            for exportable_id, widget_key in Exportable.objects.filter(
+                analysis_framework=af_id,
+            ).order_by('id').values_list('id', 'widget_key')
+        }
+
+    def _collect(self, attribute, filter_data_map, export_data_map):
+        widget = attribute.widget
+        widget_module = widget_store.get(widget.widget_id)
+        if widget_module is None:
+            return
         update_info = widget_module.update_attribute(
             widget,
-            data,
+            attribute.data or {},
             widget.properties or {},
         )
+        af_id = widget.analysis_framework_id
+        self._load_framework(af_id)
+
+        for filter_data in update_info.get('filter_data') or []:
+            key = filter_data.get('key') or widget.key
+            filter_id = self.filters_map[af_id].get((widget.key, key))
+            if filter_id is None:
+                logger.warning(f'Filter not found for widget: {widget.pk} (key: {key})')
+                continue
+            filter_data_map[(attribute.entry_id, filter_id)] = filter_data
 
-        filter_data_list = update_info.get('filter_data')
         export_data = update_info.get('export_data')
+        if export_data:
+            exportable_id = self.exportables_map[af_id].get(widget.key)
+            if exportable_id is None:
+                logger.warning(f'Exportable not found for widget: {widget.pk}')
+                return
+            export_data_map[(attribute.entry_id, exportable_id)] = export_data.get('data')
 
-        if filter_data_list:
-            for filter_data in filter_data_list:
-                set_filter_data(
-                    entry,
-                    widget,
-                    **filter_data,
-                )
+    def update(self, attributes):
+        """
+        attributes: Iterable of Attribute with widget
+        """
+        start_time = time.perf_counter()
+        filter_data_map = {}
+        export_data_map = {}
+        count = 0
+        for attribute in attributes:
+            self._collect(attribute, filter_data_map, export_data_map)
+            count += 1
+        upsert_filter_data(filter_data_map)
+        upsert_export_data(export_data_map)
+        self.count += count
+        self.duration += time.perf_counter() - start_time
+        return count
 
-        if export_data:
-            set_export_data(
-                entry,
-                widget,
-                **export_data,
-            )
+    def update_queryset(self, attribute_qs, chunk_size=None):
+        """
+        Process the attribute queryset in chunks, returns the number of processed attributes
+        """
+        chunk_size = chunk_size or self.CHUNK_SIZE
+        attribute_qs = attribute_qs.select_related('widget').order_by('pk')
+        last_pk = None
+        while True:
+            chunk_qs = attribute_qs
+            if last_pk is not None:
+                chunk_qs = chunk_qs.filter(pk__gt=last_pk)
+            attributes = list(chunk_qs[:chunk_size])
+            if not attributes:
+                break
+            self.update(attributes)
+            last_pk = attributes[-1].pk
+            logger.info(f'Updated attributes: {self.count} ({self.throughput:.2f} attributes/sec)')
+        return self.count
 
+    @property
+    def throughput(self):
+        """
+        Processed attributes per second
+        """
+        if not self.duration:
+            return 0
+        return self.count / self.duration
+
+
+def update_entry_attribute(attribute):
+    if not attribute.entry_id or not attribute.widget_id:
+        return
+    AttributesDataUpdater().update([attribute])
 
-def update_attributes(**attr_filters):
-    attributes = Attribute.objects.filter(**attr_filters)
 
-    for attribute in attributes:
-        update_entry_attribute(attribute)
+def update_attributes(**attr_filters):
+    return AttributesDataUpdater().update_queryset(
+        Attribute.objects.filter(**attr_filters)
+    )
 
 
 def base64_to_deep_image(image, lead, user):
@@ -1,44 +1,139 @@
-from analysis_framework.models import Filter, Exportable
-from entry.models import FilterData, ExportData
-
-
-def set_filter_data(
-        entry, widget, key=None,
-        number=None,
-        from_number=None, to_number=None,
-        values=None,
-        text=None,
-):
-    key = key or widget.key
-    filter = Filter.objects.filter(
-        widget_key=widget.key,
-        analysis_framework=widget.analysis_framework,
-        key=key,
-    ).first()
-    f, _ = FilterData.objects.update_or_create(
-        entry=entry,
-        filter=filter,
-        defaults={
-            'number': number,
-            'values': values,
-            'from_number': from_number,
-            'to_number': to_number,
-            'text': text,
-        },
-    )
-    return f
+import json
+from typing import Dict, Iterable, Tuple
 
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+from psycopg2.extras import execute_values
 
-def set_export_data(entry, widget, data):
-    exportable = Exportable.objects.get(
-        widget_key=widget.key,
-        analysis_framework=widget.analysis_framework,
-    )
-    e, _ = ExportData.objects.update_or_create(
-        entry=entry,
-        exportable=exportable,
-        defaults={
-            'data': data,
-        },
+from deep.caches import DataVersion
+from entry.models import Entry, FilterData, ExportData
+
+FilterDataKey = Tuple[int, int]  # (entry_id, filter_id)
+ExportDataKey = Tuple[int, int]  # (entry_id, exportable_id)
+
+UPSERT_PAGE_SIZE = 1000
+
+
+def bump_entries_project_data_version(entry_ids: Iterable[int]):
+    """
+    Bulk writes skip the model signals, bump the data version used by the caches (eg: Export cache) here
+    """
+    DataVersion.bump_many_on_commit(
+        DataVersion.PROJECT,
+        Entry.objects.filter(pk__in=list(entry_ids)).order_by().values_list('project_id', flat=True).distinct(),
     )
-    return e
+
+
+def upsert_filter_data(filter_data_map: Dict[FilterDataKey, dict]):
+    """
+    Create or update FilterData using a single INSERT ... ON CONFLICT per page
+    filter_data_map: {(entry_id, filter_id): {number, from_number, to_number, values, text}}
+    """
+    if not filter_data_map:
+        return
+    with connection.cursor() as cursor:
+        execute_values(
+            cursor,
+            f'''
+                INSERT INTO {FilterData._meta.db_table}
+                    (entry_id, filter_id, number, from_number, to_number, "values", text)
+                VALUES %s
+                ON CONFLICT (entry_id, filter_id) DO UPDATE SET
+                    number = EXCLUDED.number,
+                    from_number = EXCLUDED.from_number,
+                    to_number = EXCLUDED.to_number,
+                    "values" = EXCLUDED."values",
+                    text = EXCLUDED.text
+            ''',
+            [
+                (
+                    entry_id,
+                    filter_id,
+                    data.get('number'),
+                    data.get('from_number'),
+                    data.get('to_number'),
+                    data.get('values'),
+                    data.get('text'),
+                )
+                for (entry_id, filter_id), data in filter_data_map.items()
+            ],
+            template='(%s, %s, %s, %s, %s, %s::varchar(100)[], %s)',
+            page_size=UPSERT_PAGE_SIZE,
+        )
+    entry_ids = {entry_id for entry_id, _ in filter_data_map.keys()}
+    update_entry_filter_index(entry_ids)
+    bump_entries_project_data_version(entry_ids)
+
+
+def get_filter_index_key(filter_id):
+    # NOTE: Numeric keys are treated as array index by Django's JSON key lookups
+    return f'f{filter_id}'
+
+
+def get_filter_index_values(filter_id, values):
+    return [f'{filter_id}:{value}' for value in values]
+
+
+def update_entry_filter_index(entry_ids: Iterable[int]):
+    """
+    Rebuild Entry.filter_index_values/filter_index_data using the entry's FilterData
+    """
+    entry_ids = list(entry_ids)
+    if not entry_ids:
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'''
+                UPDATE {Entry._meta.db_table} AS entry SET
+                    filter_index_values = COALESCE((
+                        SELECT array_agg(filter_data.filter_id::text || ':' || filter_value)
+                        FROM {FilterData._meta.db_table} AS filter_data, unnest(filter_data."values") AS filter_value
+                        WHERE filter_data.entry_id = entry.id
+                    ), '{{}}'),
+                    filter_index_data = COALESCE((
+                        SELECT jsonb_object_agg(
+                            'f' || filter_data.filter_id::text,
+                            jsonb_strip_nulls(jsonb_build_object(
+                                'number', filter_data.number,
+                                'from_number', filter_data.from_number,
+                                'to_number', filter_data.to_number,
+                                'text', filter_data.text
+                            ))
+                        )
+                        FROM {FilterData._meta.db_table} AS filter_data
+                        WHERE filter_data.entry_id = entry.id
+                    ), '{{}}')
+                WHERE entry.id = ANY(%s)
+            ''',
+            [entry_ids],
+        )
+
+
+def upsert_export_data(export_data_map: Dict[ExportDataKey, dict]):
+    """
+    Create or update ExportData using a single INSERT ... ON CONFLICT per page
+    export_data_map: {(entry_id, exportable_id): data}
+    """
+    if not export_data_map:
+        return
+    with connection.cursor() as cursor:
+        execute_values(
+            cursor,
+            f'''
+                INSERT INTO {ExportData._meta.db_table} (entry_id, exportable_id, data)
+                VALUES %s
+                ON CONFLICT (entry_id, exportable_id) DO UPDATE SET
+                    data = EXCLUDED.data
+            ''',
+            [
+                (
+                    entry_id,
+                    exportable_id,
+                    None if data is None else json.dumps(data, cls=DjangoJSONEncoder),
+                )
+                for (entry_id, exportable_id), data in export_data_map.items()
+            ],
+            template='(%s, %s, %s::jsonb)',
+            page_size=UPSERT_PAGE_SIZE,
+        )
+    bump_entries_project_data_version({entry_id for entry_id, _ in export_data_map.keys()})
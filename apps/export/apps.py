@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class ExportConfig(AppConfig):
     name = 'export'
+
+    def ready(self):
+        import export.receivers  # noqa
@@ -1,18 +1,25 @@
+import json
 import logging
-from django.core.files.base import ContentFile
+import tempfile
+from itertools import zip_longest
+
+from django.conf import settings
+from django.core.files.base import File
 from django.db import models
 
 from deep.permalinks import Permalink
 from utils.common import (
+    batched,
     excel_column_name,
     get_valid_xml_string as xstr,
     deep_date_parse,
 )
-from export.formats.xlsx import WorkBook, RowsBuilder
+from export.formats.xlsx import WorkBook, RowsBuilder, ShardWorkSheet
 
 from analysis_framework.models import Widget
 from entry.models import Entry, ExportData, ProjectEntryLabel, LeadEntryGroup
 from lead.models import Lead
+from geo.hierarchy import GeoAreaHierarchy
 from export.models import Export
 
 from gallery.utils import get_private_file_url
@@ -26,6 +33,9 @@ def get_hyperlink(url, text):
 
 
 class ExcelExporter:
+    # Number of entries (and their export data) loaded at once
+    ENTRIES_CHUNK_SIZE = 500
+
     class ColumnsData:
         TITLES = {
             **{
@@ -51,9 +61,8 @@ class ExcelExporter:
         self.project = project
         self.export_object = export_object
         self.is_preview = is_preview
-        self.wb = WorkBook()
-        # XXX: Limit memory usage? (Or use redis?)
-        self.geoarea_data_cache = {}
+        # Rows are streamed to disk, memory usage doesn't grow with the number of entries
+        self.wb = WorkBook(write_only=True)
 
         # Date Format
         self.date_renderer = Export.get_date_renderer(date_format)
@@ -113,12 +122,12 @@ class ExcelExporter:
             2: 'date',
         }
 
-        # Keep track of sheet data present
+        # Keep track of sheet data present (Sheets are written at the end, see add_tabular_sheets)
         '''
         tabular_sheets = {
             'leadtitle-sheettitle': {
-                'field1_title': col_num_in_sheet,
-                'field2_title': col_num_in_sheet,
+                'field1_title': field1,
+                'field2_title': field2,
             }
         }
         '''
@@ -127,7 +136,7 @@ class ExcelExporter:
         # Keep track of tabular fields
         self.tabular_fields = {}
 
-        self.region_data = {}
+        self.region_geo_hierarchy = {}
         # mapping of original name vs truncated name
         self._sheets = {}
 
@@ -140,24 +149,17 @@ class ExcelExporter:
         exportable_titles = []
 
         if export_type == 'geo' and regions:
-            self.region_data = {}
+            self.region_geo_hierarchy = {}
 
             for region in regions:
-                admin_levels = region.adminlevel_set.all()
-                admin_level_data = []
+                geo_hierarchy = GeoAreaHierarchy.get(region)
 
                 exportable_titles.append(f'{region.title} Polygons')
-                for admin_level in admin_levels:
-                    exportable_titles.append(admin_level.title)
-                    exportable_titles.append('{} (code)'.format(admin_level.title))
-
-                    # Collect geo area names for each admin level
-                    admin_level_data.append({
-                        'id': admin_level.id,
-                        'geo_area_titles': admin_level.get_geo_area_titles(),
-                    })
+                for admin_level in geo_hierarchy.admin_levels:
+                    exportable_titles.append(admin_level['title'])
+                    exportable_titles.append('{} (code)'.format(admin_level['title']))
 
-                self.region_data[region.id] = admin_level_data
+                self.region_geo_hierarchy[region.id] = geo_hierarchy
 
         elif export_type == 'multiple':
             index = len(exportable_titles)
@@ -229,6 +231,11 @@ class ExcelExporter:
             self.split.auto_fit_cells_in_row(1)
         self.group.auto_fit_cells_in_row(1)
 
+        # Column types are applied as the entry rows are appended
+        self.group.set_col_types(self.col_types)
+        if self.split:
+            self.split.set_col_types(self.col_types)
+
         self.regions = regions
         return self
 
@@ -359,42 +366,30 @@ class ExcelExporter:
                     region_geo_polygons[region_id].append(geo_polygon['title'])
 
             for region in self.regions:
-                admin_levels = self.region_data[region.id]
+                geo_hierarchy = self.region_geo_hierarchy[region.id]
                 geo_polygons = region_geo_polygons.get(region.id, [])
-                max_levels = len(admin_levels)
+                max_levels = len(geo_hierarchy.admin_levels)
                 rows_value = []
 
                 rows.add_rows_of_values(geo_polygons)
 
-                for rev_level, admin_level in enumerate(admin_levels[::-1]):
-                    geo_area_titles = admin_level['geo_area_titles']
-                    level = max_levels - rev_level
-                    for geo_id in geo_id_values:
-                        if geo_id not in geo_area_titles:
-                            continue
-                        if geo_id in self.geoarea_data_cache:
-                            rows_value.append(self.geoarea_data_cache[geo_id])
-                            continue
-
-                        row_values = ['' for i in range(0, max_levels - level)] * 2
-
-                        title = geo_area_titles[geo_id].get('title', '')
-                        code = geo_area_titles[geo_id].get('code', '')
-                        parent_id = geo_area_titles[geo_id].get('parent_id')
-
-                        row_values.extend([code, title])
-                        for _level in range(0, level - 1)[::-1]:
-                            if parent_id:
-                                _geo_area_titles = admin_levels[_level]['geo_area_titles']
-                                _geo_area = _geo_area_titles.get(parent_id) or {}
-                                _title = _geo_area.get('title', '')
-                                _code = _geo_area.get('code', '')
-                                parent_id = _geo_area.get('parent_id')
-                                row_values.extend([_code, _title])
-                            else:
-                                row_values.extend(['', ''])
-                        rows_value.append(row_values[::-1])
-                        self.geoarea_data_cache[geo_id] = row_values[::-1]
+                # Title and code of the ancestors at every admin level, lowest admin level geo areas first
+                geo_indexes = geo_hierarchy.get_indexes(geo_id_values)
+                geo_ancestors = geo_hierarchy.get_ancestors(geo_id_values)
+                for row_index in sorted(
+                    (row_index for row_index, geo_index in enumerate(geo_indexes) if geo_index >= 0),
+                    key=lambda row_index: -geo_hierarchy.admin_level_indexes[geo_indexes[row_index]],
+                ):
+                    row_values = []
+                    for ancestor_index in geo_ancestors[row_index]:
+                        if ancestor_index >= 0:
+                            row_values.extend([
+                                geo_hierarchy.titles[ancestor_index],
+                                geo_hierarchy.codes[ancestor_index],
+                            ])
+                        else:
+                            row_values.extend(['', ''])
+                    rows_value.append(row_values)
 
                 if len(rows_value) > 0:
                     rows.add_rows_of_value_lists(rows_value)
@@ -429,46 +424,20 @@ class ExcelExporter:
         if not self._sheets.get(worksheet_title) and len(worksheet_title) > 31:
             self._sheets[worksheet_title] = '{}-{}'.format(
                 worksheet_title[:28],
-                len(self.wb.wb.worksheets)
+                # Worksheets created so far + tabular worksheets to be created
+                len(self.wb.sheets) + len(self.tabular_sheets),
             )
         elif not self._sheets.get(worksheet_title):
             self._sheets[worksheet_title] = worksheet_title
         worksheet_title = self._sheets[worksheet_title]
 
-        if worksheet_title not in self.wb.wb.sheetnames:
-            tabular_sheet = self.wb.create_sheet(worksheet_title).ws
-        else:
-            tabular_sheet = self.wb.wb.get_sheet_by_name(worksheet_title)
-
         # Get fields data
-        worksheet_data = self.tabular_sheets.get(worksheet_title, {})
-
-        col_number = worksheet_data.get(field.title)
-        if col_number is None:
-            # col_number None means we don't have the field in the work sheet
-            # So, we create one assigning next number to the field
-            cols_count = len(worksheet_data.keys())
-            col_number = cols_count + 1
-            worksheet_data[field.title] = col_number
-
-            # Now add data to the column
-            # excel_column_name converts number to excel column names: 1 -> A..
-            sheet_col_name = excel_column_name(col_number)
-
-            self.tabular_sheets[worksheet_title] = worksheet_data
-
-            # Insert field title to sheet in first row
-            tabular_sheet['{}1'.format(sheet_col_name)].value =\
-                field.title
-
-            # Add field values to corresponding column
-            for i, x in enumerate(field.actual_data):
-                tabular_sheet[
-                    '{}{}'.format(sheet_col_name, 2 + i)
-                ].value = x.get('processed_value') or x['value']
-        else:
-            sheet_col_name = excel_column_name(col_number)
+        worksheet_data = self.tabular_sheets.setdefault(worksheet_title, {})
+        # Field is added as a new column if not already present
+        worksheet_data.setdefault(field.title, field)
 
+        # excel_column_name converts number to excel column names: 1 -> A..
+        sheet_col_name = excel_column_name(list(worksheet_data.keys()).index(field.title) + 1)
         link = f'#\'{worksheet_title}\'!{sheet_col_name}1'
         return get_hyperlink(link, field.title)
 
@@ -491,9 +460,49 @@ class ExcelExporter:
 
         return ''
 
-    def add_entries(self, entries):
+    def get_export_data_map(self, entry_ids):
+        """
+        Return export data of the entries for the loaded exportables: {(entry_id, exportable_id): data}
+        """
+        exportable_ids = [
+            exportable.id
+            for exportable in self.exportables
+            if not isinstance(exportable, str)
+        ]
+        export_data_map = {}
+        if not exportable_ids:
+            return export_data_map
+        export_data_qs = ExportData.objects.filter(
+            entry__in=entry_ids,
+            exportable__in=exportable_ids,
+            data__excel__isnull=False,
+        ).order_by('id').values_list('entry_id', 'exportable_id', 'data')
+        for entry_id, exportable_id, data in export_data_qs:
+            # Same as .first() if there are multiple
+            export_data_map.setdefault((entry_id, exportable_id), data)
+        return export_data_map
+
+    def iterate_entries(self, entries):
+        """
+        Yield (entry, export_data_map) loading entries (with it's prefetches) and export data chunk by chunk
+        """
         iterable_entries = entries[:Export.PREVIEW_ENTRY_SIZE] if self.is_preview else entries
-        for i, entry in enumerate(iterable_entries):
+        # Keep the order of the entries queryset
+        entry_ids = list(iterable_entries.values_list('id', flat=True))
+        for chunk_entry_ids in batched(entry_ids, batch_size=self.ENTRIES_CHUNK_SIZE):
+            entries_map = {
+                entry.pk: entry
+                for entry in entries.filter(pk__in=chunk_entry_ids)
+            }
+            export_data_map = self.get_export_data_map(chunk_entry_ids)
+            for entry_id in chunk_entry_ids:
+                yield entries_map[entry_id], export_data_map
+
+    def add_entries(self, entries, row_offset=0):
+        """
+        row_offset: Number of entries before these entries (Used by sharded export)
+        """
+        for i, (entry, export_data_map) in enumerate(self.iterate_entries(entries), start=row_offset):
             # Export each entry
             # Start building rows and export data for each exportable
 
@@ -528,24 +537,21 @@ class ExcelExporter:
                     # And write some value based on type and data
                     # or empty strings if no data.
                     data = exportable.data.get('excel')
-                    export_data = ExportData.objects.filter(
-                        exportable=exportable,
-                        entry=entry,
-                        data__excel__isnull=False,
-                    ).first()
-
-                    if export_data and type(export_data.data.get('excel', {})) == list:
-                        export_data = export_data.data.get('excel', [])
+                    export_data = export_data_map.get((entry.pk, exportable.pk))
+
+                    if export_data and type(export_data.get('excel', {})) == list:
+                        export_data = export_data.get('excel', [])
                     else:
                         export_data = export_data and {
-                            **export_data.data.get('common', {}),
-                            **export_data.data.get('excel', {})
+                            **export_data.get('common', {}),
+                            **export_data.get('excel', {})
                         }
                     self.add_entries_from_excel_data(rows, data, export_data)
 
             rows.apply()
+        return self
 
-        # Now add data to entry group sheet
+    def add_entry_groups_sheet(self):
         for (leadid, gid), labeldata in self.group_label_matrix.items():
             row_data = [
                 self.lead_id_titles_map.get(leadid),
@@ -553,6 +559,39 @@ class ExcelExporter:
                 *labeldata.values(),
             ]
             self.entry_groups_sheet.append([row_data])
+
+    def export_shard(self, entries, row_offset):
+        """
+        Render rows of the entries into a JSON lines file instead of the workbook (See add_shard)
+        """
+        shard_file = tempfile.TemporaryFile(dir=settings.TEMP_DIR)
+        self.split = self.split and ShardWorkSheet('split', shard_file)
+        self.group = ShardWorkSheet('group', shard_file)
+        self.add_entries(entries, row_offset=row_offset)
+        entry_groups_sheet = ShardWorkSheet('entry_group', shard_file)
+        for (lead_id, group_id), labeldata in self.group_label_matrix.items():
+            entry_groups_sheet.append([
+                [lead_id, group_id, label_id, link]
+                for label_id, link in labeldata.items()
+                if link is not None
+            ])
+        shard_file.seek(0)
+        return File(shard_file)
+
+    def add_shard(self, shard_file):
+        """
+        Add rows rendered by export_shard, shards need to be added in order.
+        """
+        for line in shard_file:
+            name, value = json.loads(line)
+            if name == 'split':
+                if self.split:
+                    self.split.append([value])
+            elif name == 'group':
+                self.group.append([value])
+            elif name == 'entry_group':
+                lead_id, group_id, label_id, link = value
+                self.group_label_matrix[(lead_id, group_id)][label_id] = link
         return self
 
     def add_bibliography_sheet(self, leads_qs):
@@ -585,16 +624,24 @@ class ExcelExporter:
                 ]]
             )
 
+    def add_tabular_sheets(self):
+        for worksheet_title, worksheet_data in self.tabular_sheets.items():
+            tabular_sheet = self.wb.create_sheet(worksheet_title)
+            # Field title in first row and field values in corresponding column
+            tabular_sheet.append([list(worksheet_data.keys())])
+            tabular_sheet.append(
+                zip_longest(*[
+                    field.get_export_values()
+                    for field in worksheet_data.values()
+                ])
+            )
+
     def export(self, leads_qs):
         """
         Export and return export data
         """
-        self.group.set_col_types(self.col_types)
-        if self.split:
-            self.split.set_col_types(self.col_types)
-
+        self.add_entry_groups_sheet()
         # Add bibliography
         self.add_bibliography_sheet(leads_qs)
-
-        buffer = self.wb.save()
-        return ContentFile(buffer)
+        self.add_tabular_sheets()
+        return self.wb.save_to_file()
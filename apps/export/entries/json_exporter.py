@@ -1,18 +1,52 @@
-from utils.files import generate_json_file_for_upload
+import json
+import tempfile
+
+from django.conf import settings
+from django.core.files.base import File
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+
+from utils.common import batched
 from analysis_framework.models import Widget
+from entry.models import Attribute
 from export.models import Export
 
 
 class JsonExporter:
-    def __init__(self, is_preview=False):
+    """
+    Entries are rendered one by one into a temporary file instead of building the whole payload in memory.
+    ndjson: Render as JSON lines, {"widgets": [...]} line followed by a line per entry.
+    """
+    ENTRIES_CHUNK_SIZE = 500
+
+    def __init__(self, is_preview=False, ndjson=False):
         self.is_preview = is_preview
-        self.data = {}
+        self.ndjson = ndjson
+        self.widgets = []
+        # Created on the first write (Not used by export_shard)
+        self.file = None
+        self.entries_count = 0
+
+    def _get_header(self):
+        if self.ndjson:
+            return self._dumps({'widgets': self.widgets}) + '\n'
+        return '{\n"widgets": ' + self._dumps(self.widgets, indent=2) + ',\n"entries": ['
+
+    def _write(self, text):
+        if self.file is None:
+            # Header is written with the first write (After the exportables are loaded)
+            self.file = tempfile.TemporaryFile(dir=settings.TEMP_DIR)
+            self.file.write(self._get_header().encode('utf-8'))
+        self.file.write(text.encode('utf-8'))
+
+    @staticmethod
+    def _dumps(data, **kwargs):
+        return json.dumps(data, cls=DjangoJSONEncoder, sort_keys=True, **kwargs)
 
     def load_exportables(self, exportables):
         self.exportables = exportables
         self.widget_ids = []
 
-        self.data['widgets'] = []
         for exportable in self.exportables:
             widget = Widget.objects.get(
                 analysis_framework=exportable.analysis_framework,
@@ -25,48 +59,94 @@ class JsonExporter:
             data['widget_type'] = widget.widget_id
             data['title'] = widget.title
             data['properties'] = widget.properties
-            self.data['widgets'].append(data)
-
+            self.widgets.append(data)
         return self
 
+    def iterate_entries(self, entries):
+        """
+        Load entries (with it's prefetches) chunk by chunk
+        NOTE: QuerySet.iterator ignores prefetch_related (Django < 4.1), so chunks are loaded using ids instead.
+        """
+        iterable_entries = entries[:Export.PREVIEW_ENTRY_SIZE] if self.is_preview else entries
+        # Keep the order of the entries queryset
+        entry_ids = list(iterable_entries.values_list('id', flat=True))
+        for chunk_entry_ids in batched(entry_ids, batch_size=self.ENTRIES_CHUNK_SIZE):
+            entries_map = {
+                entry.pk: entry
+                for entry in entries.filter(pk__in=chunk_entry_ids).select_related(
+                    'tabular_field',
+                ).prefetch_related(
+                    models.Prefetch(
+                        'attribute_set',
+                        queryset=Attribute.objects.select_related('widget'),
+                    ),
+                )
+            }
+            for entry_id in chunk_entry_ids:
+                yield entries_map[entry_id]
+
+    def get_entry_data(self, entry):
+        lead = entry.lead
+        data = {}
+        data['id'] = entry.id
+        data['lead_id'] = lead.id
+        data['lead'] = lead.title
+        data['source'] = lead.get_source_display()
+        data['priority'] = lead.get_priority_display()
+        data['author'] = lead.get_authors_display()
+        data['date'] = lead.published_on
+        data['excerpt'] = entry.excerpt
+        data['image'] = entry.get_image_url()
+        data['attributes'] = []
+        data['data_series'] = {}
+
+        for attribute in entry.attribute_set.all():
+            attribute_data = {}
+            attribute_data['widget_id'] = attribute.widget.key
+            attribute_data['data'] = attribute.data
+            data['attributes'].append(attribute_data)
+        if entry.tabular_field:
+            data['data_series'] = {
+                'options': entry.tabular_field.options,
+                'data': entry.tabular_field.actual_data,
+            }
+        return data
+
+    def add_entry_data(self, data):
+        if self.ndjson:
+            self._write(self._dumps(data) + '\n')
+        else:
+            self._write(('\n' if self.entries_count == 0 else ',\n') + self._dumps(data, indent=2))
+        self.entries_count += 1
+
     def add_entries(self, entries):
-        self.data['entries'] = []
+        for entry in self.iterate_entries(entries):
+            self.add_entry_data(self.get_entry_data(entry))
+        return self
 
-        iterable_entries = entries[:Export.PREVIEW_ENTRY_SIZE] if self.is_preview else entries
-        for entry in iterable_entries:
-            lead = entry.lead
-            data = {}
-            data['id'] = entry.id
-            data['lead_id'] = lead.id
-            data['lead'] = lead.title
-            data['source'] = lead.get_source_display()
-            data['priority'] = lead.get_priority_display()
-            data['author'] = lead.get_authors_display()
-            data['date'] = lead.published_on
-            data['excerpt'] = entry.excerpt
-            data['image'] = entry.get_image_url()
-            data['attributes'] = []
-            data['data_series'] = {}
-
-            for attribute in entry.attribute_set.all():
-                attribute_data = {}
-                attribute_data['widget_id'] = attribute.widget.key
-                attribute_data['data'] = attribute.data
-                data['attributes'].append(attribute_data)
-            if entry.tabular_field:
-                data['data_series'] = {
-                    'options': entry.tabular_field.options,
-                    'data': entry.tabular_field.actual_data,
-                }
-            self.data['entries'].append(data)
+    def export_shard(self, entries):
+        """
+        Render the entries into a JSON lines file (See add_shard)
+        """
+        shard_file = tempfile.TemporaryFile(dir=settings.TEMP_DIR)
+        for entry in self.iterate_entries(entries):
+            shard_file.write(self._dumps(self.get_entry_data(entry)).encode('utf-8'))
+            shard_file.write(b'\n')
+        shard_file.seek(0)
+        return File(shard_file)
+
+    def add_shard(self, shard_file):
+        """
+        Add entries rendered by export_shard, shards need to be added in order.
+        """
+        for line in shard_file:
+            self.add_entry_data(json.loads(line))
         return self
 
     def export(self):
         """
         Export and return export data
         """
-        return generate_json_file_for_upload(
-            self.data,
-            sort_keys=True,
-            indent=2,
-        )
+        self._write('' if self.ndjson else '\n]\n}\n')
+        self.file.seek(0)
+        return File(self.file)
@@ -2,10 +2,10 @@ import os
 import tempfile
 import logging
 from datetime import datetime
-from subprocess import call
 
 from django.conf import settings
 from django.core.files.base import ContentFile, File
+from django.db.models.fields.files import FieldFile
 from django.db.models import (
     Case,
     When,
@@ -13,9 +13,11 @@ from django.db.models import (
 )
 from docx.shared import Inches
 from deep.permalinks import Permalink
+from utils import libreoffice
 from utils.common import deep_date_parse, deep_date_format
 
 from export.formats.docx import Document
+from export.formats.images import ImagePrefetcher
 
 from analysis_framework.models import Widget
 from entry.models import (
@@ -43,6 +45,7 @@ from ary.export.data_collection_techniques_info import (
 )
 
 from lead.models import Lead
+from geo.hierarchy import GeoAreaHierarchy
 from tabular.viz import renderer as viz_renderer
 from export.models import Export
 
@@ -244,11 +247,11 @@ class ReportExporter:
         self.exporting_widgets_keys = list(
             Widget.objects.filter(id__in=self.exporting_widgets_ids).values_list('key', flat=True)
         )
-        self.region_data = {}
-        # XXX: Limit memory usage? (Or use redis?)
-        self.geoarea_data_cache = {}
+        self.region_geo_hierarchies = []
         self.assessment_data_cache = {}
         self.entry_widget_data_cache = {}
+        # Local path of the prefetched entry images (See load_images)
+        self.entry_images = {}
 
         # Citation
         self.citation_style = citation_style or Export.CitationStyle.DEFAULT
@@ -269,17 +272,7 @@ class ReportExporter:
         ).exists()
         # Load geo data if required
         if geo_data_required:
-            self.region_data = {}
-            for region in regions:
-                # Collect geo area names for each admin level
-                self.region_data[region.id] = [
-                    {
-                        'id': admin_level.id,
-                        'level': admin_level.level,
-                        'geo_area_titles': admin_level.get_geo_area_titles(),
-                    }
-                    for admin_level in region.adminlevel_set.all()
-                ]
+            self.region_geo_hierarchies = GeoAreaHierarchy.get_for_regions(regions)
 
         return self
 
@@ -353,6 +346,39 @@ class ReportExporter:
         self.collected_widget_text = collected_widget_text
         return self
 
+    def load_images(self, entries):
+        """
+        Download (concurrently), downscale and cache the images of the entries before generating the document
+        """
+        entries = entries.select_related('image', 'entry_attachment', 'tabular_field')
+        iterable_entries = entries[:Export.PREVIEW_ENTRY_SIZE] if self.is_preview else entries
+        entry_files = {}
+        for entry in iterable_entries:
+            image = None
+            if entry.entry_type == Entry.TagType.IMAGE:
+                image = entry.image and entry.image.file
+            elif entry.entry_type == Entry.TagType.DATA_SERIES and entry.tabular_field:
+                image = viz_renderer.get_entry_image(entry)
+            elif entry.entry_type == Entry.TagType.ATTACHMENT and entry.entry_attachment:
+                image = entry.entry_attachment.file_preview
+            # Only storage files, others (raw image/default image) are used as it is
+            if isinstance(image, FieldFile) and image.name:
+                entry_files[entry.id] = image
+        self.entry_images = ImagePrefetcher().prefetch(entry_files)
+        return self
+
+    def _add_entry_image(self, entry, image):
+        image_path = self.entry_images.get(entry.id)
+        if image_path:
+            try:
+                with open(image_path, 'rb') as fp:
+                    self.doc.add_image(fp)
+                return
+            except FileNotFoundError:
+                # Evicted from cache by another export
+                pass
+        self.doc.add_image(image)
+
     def _generate_legend_page(self, project):
         para = self.doc.add_paragraph()
         self.legend_paragraph.add_next_paragraph(para)
@@ -396,36 +422,8 @@ class ReportExporter:
             return
 
         render_values = []
-        for region_id, admin_levels in self.region_data.items():
-            for admin_level in admin_levels:
-                geo_area_titles = admin_level['geo_area_titles']
-                for geo_id in geo_id_values:
-                    if geo_id not in geo_area_titles:
-                        continue
-                    if geo_id in self.geoarea_data_cache:
-                        title = self.geoarea_data_cache[geo_id]
-                        title and render_values.append(title)
-                        continue
-                    self.geoarea_data_cache[geo_id] = None
-
-                    title = geo_area_titles[geo_id].get('title')
-                    parent_id = geo_area_titles[geo_id].get('parent_id')
-                    if admin_level['level'] == 1:
-                        title and render_values.append(title)
-                        self.geoarea_data_cache[geo_id] = title
-                        continue
-
-                    # Try to look through parent
-                    for _level in range(0, admin_level['level'])[::-1]:
-                        if parent_id:
-                            _geo_area_titles = admin_levels[_level]['geo_area_titles']
-                            _geo_area = _geo_area_titles.get(parent_id) or {}
-                            _title = _geo_area.get('title')
-                            parent_id = _geo_area.get('parent_id')
-                            if _level == 1:
-                                _title and render_values.append(_title)
-                                self.geoarea_data_cache[geo_id] = title
-                                break
+        for geo_hierarchy in self.region_geo_hierarchies:
+            render_values.extend(geo_hierarchy.get_titles_at_level(geo_id_values, level=1))
 
         if render_values:
             return INTERNAL_SEPARATOR.join(set(render_values))
@@ -595,7 +593,7 @@ class ReportExporter:
         if entry.entry_type == Entry.TagType.ATTACHMENT:
             image = entry.entry_attachment.file_preview
         if image:
-            self.doc.add_image(image)
+            self._add_entry_image(entry, image)
             if image_text:
                 self.doc.add_paragraph(image_text).justify()
             para = self.doc.add_paragraph().justify()
@@ -902,10 +900,7 @@ class ReportExporter:
             temp_doc = tempfile.NamedTemporaryFile(dir=settings.TEMP_DIR)
             self.doc.save_to_file(temp_doc)
 
-            filename = temp_doc.name.split('/')[-1]
-            temp_pdf = os.path.join(settings.TEMP_DIR, '{}.pdf'.format(filename))
-
-            call(['libreoffice', '--headless', '--convert-to', 'pdf', temp_doc.name, '--outdir', settings.TEMP_DIR])
+            temp_pdf = libreoffice.convert(temp_doc.name, settings.TEMP_DIR, 'pdf')
             file = File(open(temp_pdf, 'rb'))
 
             # Cleanup
@@ -0,0 +1,133 @@
+import io
+import os
+import hashlib
+import logging
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.db.models.fields.files import FieldFile
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+
+class DiskLRUCache:
+    """
+    Bytes cache stored as files in a local directory.
+    Least recently used files (using modified time) are removed by evict when above max_size.
+    NOTE: Can be shared by multiple processes, files are written atomically.
+    """
+    TEMP_FILE_PREFIX = '.tmp-'
+
+    def __init__(self, directory, max_size):
+        self.directory = directory
+        self.max_size = max_size
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _get_path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(key.encode('utf-8')).hexdigest())
+
+    def get_path(self, key) -> Optional[str]:
+        path = self._get_path(key)
+        try:
+            # Mark as recently used
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def set(self, key, content: bytes) -> str:
+        path = self._get_path(key)
+        with tempfile.NamedTemporaryFile(dir=self.directory, prefix=self.TEMP_FILE_PREFIX, delete=False) as fp:
+            fp.write(content)
+        os.replace(fp.name, path)
+        return path
+
+    def evict(self):
+        files = []
+        total_size = 0
+        with os.scandir(self.directory) as it:
+            for dir_entry in it:
+                if not dir_entry.is_file() or dir_entry.name.startswith(self.TEMP_FILE_PREFIX):
+                    continue
+                stat = dir_entry.stat()
+                files.append((stat.st_mtime, stat.st_size, dir_entry.path))
+                total_size += stat.st_size
+        for _, size, path in sorted(files):
+            if total_size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total_size -= size
+
+
+def downscale_image(content: bytes, max_width: int) -> bytes:
+    """
+    Resize image to max_width (keeping aspect ratio), smaller images are returned as it is.
+    """
+    image = Image.open(io.BytesIO(content))
+    if image.width <= max_width:
+        return content
+    image_format = image.format
+    if image_format == 'JPEG':
+        image = image.convert('RGB')
+    else:
+        image_format = 'PNG'
+        image = image.convert('RGBA')
+    image = image.resize(
+        (max_width, max(1, round(image.height * max_width / image.width))),
+        Image.LANCZOS,
+    )
+    output = io.BytesIO()
+    image.save(output, format=image_format)
+    return output.getvalue()
+
+
+class ImagePrefetcher:
+    """
+    Download images from the storage concurrently, downscale them to max_width and keep them in a local disk cache.
+    Cache key is the file name and it's last modified time (etag equivalent available for all storages).
+    """
+    def __init__(self, max_width=None, workers=None):
+        self.max_width = max_width or settings.EXPORT_IMAGE_MAX_WIDTH
+        self.workers = workers or settings.EXPORT_IMAGE_DOWNLOAD_WORKERS
+        self.cache = DiskLRUCache(settings.EXPORT_IMAGE_CACHE_DIR, settings.EXPORT_IMAGE_CACHE_MAX_SIZE)
+
+    def get_cache_key(self, file: FieldFile):
+        modified_time = file.storage.get_modified_time(file.name)
+        return f'{file.name}:{modified_time.timestamp()}:{self.max_width}'
+
+    def fetch(self, file: FieldFile) -> Optional[str]:
+        """
+        Returns path of the processed image in the local cache
+        """
+        try:
+            cache_key = self.get_cache_key(file)
+            path = self.cache.get_path(cache_key)
+            if path is None:
+                with file.storage.open(file.name, 'rb') as fp:
+                    content = fp.read()
+                path = self.cache.set(cache_key, downscale_image(content, self.max_width))
+            return path
+        except Exception:
+            logger.warning(f'Failed to prefetch image: {file.name}', exc_info=True)
+            return None
+
+    def prefetch(self, files: Dict[int, FieldFile]) -> Dict[int, str]:
+        """
+        files: {key: file}
+        Returns {key: local path} of the successfully fetched files
+        """
+        unique_files = {file.name: file for file in files.values()}
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            paths = dict(zip(unique_files.keys(), executor.map(self.fetch, unique_files.values())))
+        self.cache.evict()
+        return {
+            key: paths[file.name]
+            for key, file in files.items()
+            if paths[file.name] is not None
+        }
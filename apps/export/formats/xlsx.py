@@ -1,7 +1,13 @@
+import json
+import logging
+import tempfile
 from collections import OrderedDict
 
-
+from django.conf import settings
+from django.core.files.base import File
+from django.core.serializers.json import DjangoJSONEncoder
 from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.utils import get_column_letter
 from openpyxl.writer.excel import save_virtual_workbook
 
@@ -12,6 +18,8 @@ from utils.common import (
     parse_number,
 )
 
+logger = logging.getLogger(__name__)
+
 
 def xstr(value):
     if isinstance(value, int):
@@ -22,19 +30,43 @@ def xstr(value):
 class WorkBook:
     """
     An xlsx workbook
+    write_only: Stream rows to temporary files instead of keeping every cell in memory (See WriteOnlyWorkSheet)
     """
-    def __init__(self):
-        self.wb = Workbook()
+    def __init__(self, write_only=False):
+        self.write_only = write_only
+        self.wb = Workbook(write_only=write_only)
+        self.sheets = []
+
+    def _add_sheet(self, ws):
+        sheet = WriteOnlyWorkSheet(ws) if self.write_only else WorkSheet(ws)
+        self.sheets.append(sheet)
+        return sheet
 
     def get_active_sheet(self):
-        return WorkSheet(self.wb.active)
+        if self.write_only:
+            # Write-only workbook doesn't have a default sheet
+            return self._add_sheet(self.wb.create_sheet())
+        return self._add_sheet(self.wb.active)
 
     def create_sheet(self, title):
-        return WorkSheet(self.wb.create_sheet(title))
+        return self._add_sheet(self.wb.create_sheet(title))
 
     def save(self):
+        if self.write_only:
+            return self.save_to_file().read()
         return save_virtual_workbook(self.wb)
 
+    def save_to_file(self):
+        """
+        Save workbook to a temporary file and return it as django File (Removed when closed)
+        """
+        for sheet in self.sheets:
+            sheet.flush()
+        temp_file = tempfile.NamedTemporaryFile(dir=settings.TEMP_DIR, suffix='.xlsx')
+        self.wb.save(temp_file)
+        temp_file.seek(0)
+        return File(temp_file)
+
 
 COL_TYPES = {
     'date': 'dd-mm-yyyy',
@@ -55,27 +87,36 @@ class WorkSheet:
     """
     def __init__(self, ws):
         self.ws = ws
+        # Applied to rows (except header) appended after set_col_types
+        self.col_types = {}
 
     def set_title(self, title):
         self.ws.title = title
         return self
 
     def auto_fit_cells_in_row(self, row_id):
-        row = list(self.ws.rows)[row_id - 1]
-        for cell in row:
+        for cell in next(self.ws.iter_rows(min_row=row_id, max_row=row_id), []):
             self.ws.column_dimensions[get_column_letter(cell.column)].width = max(len(str(cell.value)), 15)
         return self
 
     def append(self, rows):
-        [self.ws.append(row) for row in rows]
+        for row in rows:
+            self.ws.append(row)
+            if self.col_types and self.ws.max_row > 1:
+                for col_index, col_type in self.col_types.items():
+                    self._set_cell_type(self.ws.cell(row=self.ws.max_row, column=col_index + 1), col_type)
         return self
 
+    def flush(self):
+        pass
+
     def _set_cell_type(self, cell, col_type):
         value = cell.value
         cell.value = value and TYPE_CONVERTERS[col_type](value)
         cell.number_format = COL_TYPES[col_type]
 
     def set_col_types(self, col_types):
+        self.col_types = col_types
         for col_index, col_type in col_types.items():
             for cell_t in self.ws.iter_rows(
                     min_row=2,
@@ -86,6 +127,92 @@ class WorkSheet:
                     continue
                 cell = cell_t[0]
                 self._set_cell_type(cell, col_type)
+        return self
+
+
+class WriteOnlyWorkSheet(WorkSheet):
+    """
+    A worksheet of a write-only workbook.
+    Rows are converted (col_types) as they are appended and written to a temporary file by openpyxl.
+    Column widths need to be known before the first row is written, so the first BUFFER_ROWS rows
+    are kept in memory to be used by auto_fit_cells_in_row.
+    """
+    BUFFER_ROWS = 10
+
+    def __init__(self, ws):
+        super().__init__(ws)
+        self.rows_count = 0
+        self.buffer = []
+        self.col_widths = {}
+
+    def auto_fit_cells_in_row(self, row_id):
+        if self.buffer is None or row_id > len(self.buffer):
+            logger.warning(f'Row {row_id} is not buffered, skipping auto fit for sheet: {self.ws.title}')
+            return self
+        # Running max of the requested rows
+        for col_index, value in enumerate(self.buffer[row_id - 1]):
+            self.col_widths[col_index] = max(len(str(value)), self.col_widths.get(col_index, 15))
+        return self
+
+    def _convert_row(self, row):
+        row = list(row)
+        for col_index, col_type in self.col_types.items():
+            if col_index >= len(row):
+                continue
+            value = row[col_index]
+            cell = WriteOnlyCell(self.ws, value=value and TYPE_CONVERTERS[col_type](value))
+            cell.number_format = COL_TYPES[col_type]
+            row[col_index] = cell
+        return row
+
+    def _write_row(self, row_number, row):
+        # Skip header
+        if self.col_types and row_number > 1:
+            row = self._convert_row(row)
+        self.ws.append(row)
+
+    def append(self, rows):
+        for row in rows:
+            self.rows_count += 1
+            if self.buffer is None:
+                self._write_row(self.rows_count, row)
+                continue
+            self.buffer.append(row)
+            if len(self.buffer) >= self.BUFFER_ROWS:
+                self.flush()
+        return self
+
+    def flush(self):
+        if self.buffer is None:
+            return
+        for col_index, width in self.col_widths.items():
+            self.ws.column_dimensions[get_column_letter(col_index + 1)].width = width
+        for row_number, row in enumerate(self.buffer, start=1):
+            self._write_row(row_number, row)
+        self.buffer = None
+
+    def set_col_types(self, col_types):
+        if self.buffer is None:
+            # Rows already written can't be changed
+            logger.warning(f'Column types set after rows are written for sheet: {self.ws.title}')
+        self.col_types = col_types
+        return self
+
+
+class ShardWorkSheet:
+    """
+    Collects rows as JSON lines ([name, row]) instead of writing them to a workbook.
+    Used by sharded exports, rows are appended to the actual WorkSheet in the merge step.
+    """
+    def __init__(self, name, file):
+        self.name = name
+        self.file = file
+
+    def append(self, rows):
+        for row in rows:
+            self.file.write(json.dumps([self.name, row], cls=DjangoJSONEncoder).encode('utf-8'))
+            self.file.write(b'\n')
+        return self
 
 
 class RowsBuilder:
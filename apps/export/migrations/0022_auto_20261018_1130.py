@@ -0,0 +1,23 @@
+# Generated by Django 3.2.17 on 2026-10-18 11:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('export', '0021_auto_20230105_1048'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='export',
+            name='shards_completed',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='export',
+            name='shards_count',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 3.2.17 on 2026-10-18 12:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('export', '0022_auto_20261018_1130'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExportCache',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=32, unique=True)),
+                ('file_size', models.PositiveBigIntegerField(default=0)),
+                ('hits', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_used_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('export', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='export.export')),
+            ],
+        ),
+    ]
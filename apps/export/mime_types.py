@@ -7,3 +7,4 @@ EXCEL_MIME_TYPE = \
 CSV_MIME_TYPE = 'text/csv'
 JSON_MIME_TYPE = \
     'application/json'
+NDJSON_MIME_TYPE = 'application/x-ndjson'
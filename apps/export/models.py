@@ -15,6 +15,7 @@ from export.mime_types import (
     DOCX_MIME_TYPE,
     EXCEL_MIME_TYPE,
     JSON_MIME_TYPE,
+    NDJSON_MIME_TYPE,
     PDF_MIME_TYPE,
 )
 from analysis.models import Analysis
@@ -42,6 +43,7 @@ class ExportBaseModel(models.Model):
         DOCX = 'docx', 'docx'
         PDF = 'pdf', 'pdf'
         JSON = 'json', 'json'
+        NDJSON = 'ndjson', 'ndjson'  # JSON lines
 
     # Mime types
     MIME_TYPE_MAP = {
@@ -50,6 +52,7 @@ class ExportBaseModel(models.Model):
         Format.DOCX: DOCX_MIME_TYPE,
         Format.PDF: PDF_MIME_TYPE,
         Format.JSON: JSON_MIME_TYPE,
+        Format.NDJSON: NDJSON_MIME_TYPE,
     }
     DEFAULT_MIME_TYPE = 'application/octet-stream'
 
@@ -85,6 +88,7 @@ class ExportBaseModel(models.Model):
         ).distinct()
 
     def set_task_id(self, async_id):
+        # NOTE: async_id can be a list of task ids (eg: Sharded export), all of them are revoked on cancel
         # Defined timeout is arbitrary now.
         return cache.set(
             self.CELERY_TASK_CACHE_KEY.format(self.pk),
@@ -178,6 +182,7 @@ class Export(ExportBaseModel):
         (DataType.ENTRIES, ExportType.REPORT, Format.DOCX): 'Entries General Export',
         (DataType.ENTRIES, ExportType.REPORT, Format.PDF): 'Entries General Export',
         (DataType.ENTRIES, ExportType.JSON, Format.JSON): 'Entries JSON Export',
+        (DataType.ENTRIES, ExportType.JSON, Format.NDJSON): 'Entries JSON Lines Export',
         (DataType.ASSESSMENTS, ExportType.EXCEL, Format.XLSX): 'Assessments Excel Export',
         (DataType.ASSESSMENTS, ExportType.JSON, Format.JSON): 'Assessments JSON Export',
         (DataType.PLANNED_ASSESSMENTS, ExportType.EXCEL, Format.XLSX): 'Planned Assessments Excel Export',
@@ -205,6 +210,10 @@ class Export(ExportBaseModel):
     is_deleted = models.BooleanField(default=False)
     is_archived = models.BooleanField(default=False)
 
+    # Sharded entries export progress (See export.tasks.export_entries_sharded)
+    shards_count = models.PositiveSmallIntegerField(default=0)
+    shards_completed = models.PositiveSmallIntegerField(default=0)
+
     # used for analysis export
     analysis = models.ForeignKey(
         Analysis, null=True, blank=True,
@@ -235,6 +244,24 @@ class Export(ExportBaseModel):
         return super().save(*args, **kwargs)
 
 
+class ExportCache(models.Model):
+    """
+    Export file reusable by identical exports (Same options and same project data version)
+
+    NOTE: The file is shared by the exports loaded from the cache, it's only removed when no export uses it
+    (See export.receivers). Eviction only stops the file from being reused.
+    """
+    key = models.CharField(max_length=32, unique=True)
+    export = models.ForeignKey(Export, on_delete=models.CASCADE, related_name='+')
+    file_size = models.PositiveBigIntegerField(default=0)
+    hits = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return self.key
+
+
 class GenericExport(ExportBaseModel):
     """
     Async export tasks not scoped by a project
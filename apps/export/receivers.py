@@ -0,0 +1,18 @@
+from django.db import models, transaction
+from django.dispatch import receiver
+
+from export.models import Export
+
+
+@receiver(models.signals.post_delete, sender=Export)
+def cleanup_export_file_on_delete(sender, instance, **kwargs):
+    if not instance.file:
+        return
+    storage, path = instance.file.storage, instance.file.name
+
+    def _delete_file():
+        # NOTE: Exports loaded from the cache share the file (See export.tasks.load_export_from_cache)
+        if not Export.objects.filter(file=path).exists():
+            storage.delete(path)
+
+    transaction.on_commit(_delete_file)
@@ -54,7 +54,7 @@ class UserExportType(DjangoObjectType):
             'id', 'project', 'is_preview', 'title',
             'mime_type', 'extra_options', 'exported_by',
             'exported_at', 'started_at', 'ended_at', 'is_archived',
-            'analysis',
+            'analysis', 'shards_count', 'shards_completed',
         )
 
     project = graphene.ID(source='project_id')
@@ -1,11 +1,23 @@
 import logging
+import datetime
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import models
 from django.utils import timezone
 
-from celery import shared_task
+from celery import chord, shared_task
+from celery.utils import uuid
 
 from deep.celery import CeleryQueue
-from export.models import Export, GenericExport
-from .tasks_entries import export_entries
+from export.models import Export, ExportCache, GenericExport
+from .tasks_entries import (
+    export_entries,
+    get_export_entries_cache_key,
+    get_export_entries_shards,
+    export_entries_shard,
+    merge_export_entries_shards,
+)
 from .tasks_assessment import export_assessments
 from .tasks_analyses import export_analyses
 from .tasks_projects import export_projects_stats
@@ -18,6 +30,9 @@ EXPORTER_TYPE = {
     Export.DataType.ASSESSMENTS: export_assessments,
     Export.DataType.ANALYSES: export_analyses,
 }
+EXPORT_CACHE_KEY_TYPE = {
+    Export.DataType.ENTRIES: get_export_entries_cache_key,
+}
 GENERIC_EXPORTER_TYPE = {
     GenericExport.DataType.PROJECTS_STATS: export_projects_stats,
 }
@@ -30,6 +45,166 @@ def get_export_filename(export):
     return filename
 
 
+def get_export_shards_dir(export_id):
+    return f'export-shards/{export_id}'
+
+
+def save_export_file(export, file):
+    export.mime_type = Export.MIME_TYPE_MAP.get(export.format, Export.DEFAULT_MIME_TYPE)
+    export.file.save(get_export_filename(export), file)
+
+    # Update status to SUCCESS
+    export.status = Export.Status.SUCCESS
+    export.ended_at = timezone.now()
+    export.save()
+
+
+def add_export_to_cache(export, cache_key):
+    if cache_key is None:
+        return
+    ExportCache.objects.bulk_create([
+        ExportCache(
+            key=cache_key,
+            export=export,
+            file_size=export.file.size,
+        )
+    ], ignore_conflicts=True)
+
+
+def load_export_from_cache(export, cache_key):
+    """
+    Use the file of an identical export if available. Returns True if used.
+    """
+    if cache_key is None:
+        return False
+    export_cache = ExportCache.objects.filter(key=cache_key).select_related('export').first()
+    if export_cache is None:
+        return False
+    cached_file = export_cache.export.file
+    if not cached_file or not cached_file.storage.exists(cached_file.name):
+        export_cache.delete()
+        return False
+    ExportCache.objects.filter(pk=export_cache.pk).update(
+        hits=models.F('hits') + 1,
+        last_used_at=timezone.now(),
+    )
+    export.file.name = cached_file.name
+    export.mime_type = export_cache.export.mime_type
+    # Update status to SUCCESS
+    export.status = Export.Status.SUCCESS
+    export.ended_at = timezone.now()
+    export.save()
+    return True
+
+
+def evict_export_cache():
+    """
+    Remove expired cache and least recently used cache above EXPORT_CACHE_MAX_SIZE.
+    Cache of older data versions are not reachable anymore and are removed by expiry.
+    """
+    ExportCache.objects.filter(
+        last_used_at__lt=timezone.now() - datetime.timedelta(days=settings.EXPORT_CACHE_TIMEOUT_DAYS),
+    ).delete()
+    total_size = 0
+    evicted_ids = []
+    for export_cache_id, file_size in ExportCache.objects.order_by('-last_used_at').values_list('id', 'file_size'):
+        total_size += file_size
+        if total_size > settings.EXPORT_CACHE_MAX_SIZE:
+            evicted_ids.append(export_cache_id)
+    ExportCache.objects.filter(pk__in=evicted_ids).delete()
+    return len(evicted_ids)
+
+
+def set_export_as_failed(export_id, data_type):
+    export = Export.objects.filter(id=export_id).first()
+    # Update status to FAILURE
+    if export:
+        export.status = Export.Status.FAILURE
+        export.ended_at = timezone.now()
+        export.save(update_fields=('status', 'ended_at',))
+    logger.error(
+        f'Export Failed {data_type}!!',
+        exc_info=True,
+        extra={
+            'data': {
+                'export_id': export_id,
+            },
+        },
+    )
+
+
+def clear_export_shards(export_id):
+    shards_dir = get_export_shards_dir(export_id)
+    try:
+        _, filenames = default_storage.listdir(shards_dir)
+    except FileNotFoundError:
+        return
+    for filename in filenames:
+        default_storage.delete(f'{shards_dir}/{filename}')
+
+
+def export_entries_sharded(export, shards, cache_key=None):
+    """
+    Render each shard in a separate task (in parallel) and merge them when all are completed
+    """
+    export.shards_count = len(shards)
+    export.shards_completed = 0
+    export.save(update_fields=('shards_count', 'shards_completed',))
+    # NOTE: Task ids are generated here, so that the shard tasks can be revoked as well when the export is canceled
+    shard_tasks = [
+        export_entries_shard_task.s(export.id, shard_index, shard).set(task_id=uuid())
+        for shard_index, shard in enumerate(shards)
+    ]
+    result = chord(shard_tasks)(
+        export_entries_merge_task.s(export.id, cache_key=cache_key).on_error(export_entries_shard_error_task.s(export.id))
+    )
+    # Used to cancel the export
+    export.set_task_id([
+        result.id,
+        *[shard_task.id for shard_task in shard_tasks],
+    ])
+
+
+@shared_task(queue=CeleryQueue.EXPORT_HEAVY)
+def export_entries_shard_task(export_id, shard_index, shard):
+    export = Export.objects.get(pk=export_id)
+    file = export_entries_shard(export, shard)
+    shard_path = default_storage.save(f'{get_export_shards_dir(export_id)}/{shard_index}.jsonl', file)
+    Export.objects.filter(pk=export_id).update(shards_completed=models.F('shards_completed') + 1)
+    return shard_path
+
+
+@shared_task(queue=CeleryQueue.EXPORT_HEAVY)
+def export_entries_merge_task(shard_paths, export_id, cache_key=None):
+    try:
+        export = Export.objects.get(pk=export_id)
+        shard_files = [default_storage.open(shard_path, 'rb') for shard_path in shard_paths]
+        try:
+            file = merge_export_entries_shards(export, shard_files)
+        finally:
+            for shard_file in shard_files:
+                shard_file.close()
+        save_export_file(export, file)
+        add_export_to_cache(export, cache_key)
+        return_value = True
+    except Exception:
+        set_export_as_failed(export_id, Export.DataType.ENTRIES)
+        return_value = False
+    clear_export_shards(export_id)
+    return return_value
+
+
+@shared_task
+def export_entries_shard_error_task(request, exc, traceback, export_id):
+    set_export_as_failed(export_id, Export.DataType.ENTRIES)
+    clear_export_shards(export_id)
+
+
+@shared_task
+def evict_export_cache_task():
+    return evict_export_cache()
+
+
 @shared_task(queue=CeleryQueue.EXPORT_HEAVY)
 def export_task(export_id, force=False):
     data_type = 'UNKNOWN'
@@ -46,33 +221,27 @@ def export_task(export_id, force=False):
         export.started_at = timezone.now()
         export.save(update_fields=('status', 'started_at',))
 
-        file = EXPORTER_TYPE[export.type](export)
+        # NOTE: Generated before the export so that data changed during the export isn't cached as latest
+        cache_key = None
+        if export.type in EXPORT_CACHE_KEY_TYPE:
+            cache_key = EXPORT_CACHE_KEY_TYPE[export.type](export)
+        if load_export_from_cache(export, cache_key):
+            return 'CACHED'
 
-        export.mime_type = Export.MIME_TYPE_MAP.get(export.format, Export.DEFAULT_MIME_TYPE)
-        export.file.save(get_export_filename(export), file)
+        if export.type == Export.DataType.ENTRIES:
+            shards = get_export_entries_shards(export)
+            if shards:
+                # Large export, the export is saved by export_entries_merge_task
+                export_entries_sharded(export, shards, cache_key=cache_key)
+                return 'SHARDED'
 
-        # Update status to SUCCESS
-        export.status = Export.Status.SUCCESS
-        export.ended_at = timezone.now()
-        export.save()
+        file = EXPORTER_TYPE[export.type](export)
+        save_export_file(export, file)
+        add_export_to_cache(export, cache_key)
 
         return_value = True
     except Exception:
-        export = Export.objects.filter(id=export_id).first()
-        # Update status to FAILURE
-        if export:
-            export.status = Export.Status.FAILURE
-            export.ended_at = timezone.now()
-            export.save(update_fields=('status', 'ended_at',))
-        logger.error(
-            f'Export Failed {data_type}!!',
-            exc_info=True,
-            extra={
-                'data': {
-                    'export_id': export_id,
-                },
-            },
-        )
+        set_export_as_failed(export_id, data_type)
         return_value = False
 
     return return_value
@@ -1,11 +1,14 @@
 import copy
+import json
 
+from django.conf import settings
 from django.db import models
 
+from deep.caches import CacheHelper, DataVersion
 from deep.permissions import ProjectPermissions as PP
 from deep.filter_set import get_dummy_request
 from analysis_framework.models import Exportable
-from entry.models import Entry
+from entry.models import Entry, EntryGroupLabel
 from export.models import Export
 from export.entries.excel_exporter import ExcelExporter
 from export.entries.report_exporter import ReportExporter
@@ -14,19 +17,67 @@ from geo.models import Region
 from lead.models import Lead
 from lead.filter_set import LeadGQFilterSet
 from entry.filter_set import EntryGQFilterSet
+from utils.db.keyset import KeysetJSONEncoder, get_keyset_ordering, get_keyset_range_filter
 
 
-def export_entries(export):
+# Export types which can be split into shards (See get_export_entries_shards)
+SHARDABLE_EXPORT_TYPES = [
+    Export.ExportType.EXCEL,
+    Export.ExportType.JSON,
+]
+
+
+def _normalize_export_options(value):
+    # Remove empty values, they are same as not provided
+    if isinstance(value, dict):
+        return {
+            key: normalized_item
+            for key, item in value.items()
+            if (normalized_item := _normalize_export_options(item)) not in (None, '', [], {})
+        }
+    if isinstance(value, (list, tuple)):
+        return [_normalize_export_options(item) for item in value]
+    return value
+
+
+def get_export_entries_cache_key(export):
+    """
+    Export file only depends on the export options, user's lead permission and project/framework/region data.
+    NOTE: Organization (authors/source) changes bump the project data version of the projects using them.
+    """
+    project = export.project
+    user_project_permissions = PP.get_permissions(project, export.exported_by)
+    return CacheHelper.generate_hash({
+        'project': project.pk,
+        'project_data_version': DataVersion.get(DataVersion.PROJECT, project.pk),
+        'analysis_framework_data_version': (
+            project.analysis_framework_id and
+            DataVersion.get(DataVersion.ANALYSIS_FRAMEWORK, project.analysis_framework_id)
+        ),
+        'region_data_versions': [
+            DataVersion.get(DataVersion.REGION, region_id)
+            for region_id in project.regions.order_by('id').values_list('id', flat=True)
+        ],
+        'can_view_all_lead': PP.Permission.VIEW_ALL_LEAD in user_project_permissions,
+        'export_type': export.export_type,
+        'format': export.format,
+        'is_preview': export.is_preview,
+        'filters': _normalize_export_options(export.filters),
+        'extra_options': _normalize_export_options(export.extra_options),
+    })
+
+
+def get_export_entries_querysets(export):
+    """
+    Returns leads_qs, entries_qs, exportables, regions for the export
+    """
     user = export.exported_by
     project = export.project
-    export_type = export.export_type
-    is_preview = export.is_preview
 
     user_project_permissions = PP.get_permissions(project, user)
 
     # Avoid mutating database values
     filters = copy.deepcopy(export.filters)
-    extra_options = copy.deepcopy(export.extra_options)
 
     # Lead/Entry filtered queryset
     leads_qs = Lead.objects.filter(project=export.project)
@@ -52,18 +103,28 @@ def export_entries(export):
     ).qs
 
     # Prefetches
-    entries_qs = entries_qs.prefetch_related(
-        'entrygrouplabel_set',
+    entries_qs = entries_qs.select_related(
+        'created_by__profile',
+        'entry_attachment',
+    ).prefetch_related(
+        models.Prefetch(
+            'entrygrouplabel_set',
+            queryset=EntryGroupLabel.objects.select_related('group'),
+        ),
         models.Prefetch(
             'lead',
             queryset=Lead.objects.annotate(
                 page_count=models.F('leadpreview__page_count'),
+            ).select_related(
+                'source',
+                'source__parent',
             ).prefetch_related(
                 'authors',
                 'authors__organization_type',
                 # Also organization parents
                 'authors__parent',
                 'authors__parent__organization_type',
+                'assignee__profile',
             ),
         ),
     )
@@ -72,21 +133,35 @@ def export_entries(export):
         analysis_framework__project=project,
     ).distinct()
     regions = Region.objects.filter(project=project).distinct()
+    return leads_qs, entries_qs, exportables, regions
+
+
+def get_excel_exporter(export, entries_qs):
+    extra_options = export.extra_options
+    return ExcelExporter(
+        export,
+        entries_qs,
+        export.project,
+        extra_options.get('date_format'),
+        columns=copy.deepcopy(extra_options.get('excel_columns')),
+        decoupled=extra_options.get('excel_decoupled', False),
+        is_preview=export.is_preview,
+    )
+
+
+def export_entries(export):
+    export_type = export.export_type
+    is_preview = export.is_preview
+
+    # Avoid mutating database values
+    extra_options = copy.deepcopy(export.extra_options)
+
+    leads_qs, entries_qs, exportables, regions = get_export_entries_querysets(export)
 
     date_format = extra_options.get('date_format')
 
     if export_type == Export.ExportType.EXCEL:
-        decoupled = extra_options.get('excel_decoupled', False)
-        columns = extra_options.get('excel_columns')
-        export_data = ExcelExporter(
-            export,
-            entries_qs,
-            project,
-            date_format,
-            columns=columns,
-            decoupled=decoupled,
-            is_preview=is_preview,
-        )\
+        export_data = get_excel_exporter(export, entries_qs)\
             .load_exportables(exportables, regions)\
             .add_entries(entries_qs)\
             .export(leads_qs)
@@ -117,12 +192,13 @@ def export_entries(export):
             .load_structure(report_structure)
             .load_group_lables(entries_qs, show_groups)
             .load_text_from_text_widgets(entries_qs, text_widget_ids)
+            .load_images(entries_qs)
             .add_entries(entries_qs)
             .export(pdf=export.format == Export.Format.PDF)
         )
 
     elif export_type == Export.ExportType.JSON:
-        export_data = JsonExporter(is_preview=is_preview)\
+        export_data = JsonExporter(is_preview=is_preview, ndjson=export.format == Export.Format.NDJSON)\
             .load_exportables(exportables)\
             .add_entries(entries_qs)\
             .export()
@@ -133,3 +209,97 @@ def export_entries(export):
         )
 
     return export_data
+
+
+# -- Sharded export
+def get_ordered_entries_qs(entries_qs):
+    # Shards are consecutive chunks of the ordered entries, make sure the order is deterministic
+    return entries_qs.order_by(*(entries_qs.query.order_by or Entry._meta.ordering), 'pk')
+
+
+def get_export_entries_shards(export):
+    """
+    Returns list of shards (dict) with the bounds of the shard entries in the ordered entries. Empty if the export
+    shouldn't be sharded.
+    - {offset, after, last}: Keyset bounds, ordering values of the last entry of the previous shard and of the
+      shard, so that data changed while the shards are running can't shift entries between the shards.
+    - {offset, limit}: Ordering which can't be used for keyset (eg: search similarity)
+    """
+    if export.is_preview or export.export_type not in SHARDABLE_EXPORT_TYPES:
+        return []
+    _, entries_qs, _, _ = get_export_entries_querysets(export)
+    entries_count = entries_qs.count()
+    if entries_count < settings.EXPORT_ENTRIES_SHARD_THRESHOLD:
+        return []
+    # Data series sheets are linked by their position in the workbook, which isn't known by the shards
+    if (
+        export.export_type == Export.ExportType.EXCEL and
+        entries_qs.filter(entry_type=Entry.TagType.DATA_SERIES).exists()
+    ):
+        return []
+    shard_size = -(-entries_count // settings.EXPORT_ENTRIES_SHARDS_COUNT)
+    ordered_entries_qs = get_ordered_entries_qs(entries_qs)
+    ordering = get_keyset_ordering(ordered_entries_qs)
+    if ordering is None:
+        return [
+            dict(offset=offset, limit=shard_size)
+            for offset in range(0, entries_count, shard_size)
+        ]
+
+    shards = []
+    after_values = None
+    values_qs = ordered_entries_qs.values_list(*[field.lstrip('-') for field in ordering])
+    # Single pass over the ordering values (No OFFSET per shard)
+    for index, values in enumerate(values_qs.iterator()):
+        if index % shard_size == 0:
+            shards.append(dict(offset=index, after=after_values))
+        # NOTE: Celery message are JSON, keep the full precision of the values
+        after_values = shards[-1]['last'] = json.loads(json.dumps(values, cls=KeysetJSONEncoder))
+    return shards
+
+
+def export_entries_shard(export, shard):
+    """
+    Render the entries of the shard (See get_export_entries_shards) as a file to be used by
+    merge_export_entries_shards
+    """
+    _, entries_qs, exportables, regions = get_export_entries_querysets(export)
+    shard_entries_qs = get_ordered_entries_qs(entries_qs)
+    offset = shard['offset']
+    if 'limit' in shard:
+        # NOTE: Sliced queryset can't be filtered further by the exporters, use it as a subquery instead
+        shard_entries_qs = get_ordered_entries_qs(
+            entries_qs.filter(pk__in=shard_entries_qs[offset: offset + shard['limit']].values('pk'))
+        )
+    else:
+        shard_entries_qs = shard_entries_qs.filter(
+            get_keyset_range_filter(get_keyset_ordering(shard_entries_qs), shard['after'], shard['last'])
+        )
+
+    if export.export_type == Export.ExportType.EXCEL:
+        return get_excel_exporter(export, entries_qs)\
+            .load_exportables(exportables, regions)\
+            .export_shard(shard_entries_qs, offset)
+    return JsonExporter()\
+        .load_exportables(exportables)\
+        .export_shard(shard_entries_qs)
+
+
+def merge_export_entries_shards(export, shard_files):
+    """
+    Build the final export file using the shard files (in order)
+    """
+    leads_qs, entries_qs, exportables, regions = get_export_entries_querysets(export)
+
+    if export.export_type == Export.ExportType.EXCEL:
+        exporter = get_excel_exporter(export, entries_qs)\
+            .load_exportables(exportables, regions)
+        for shard_file in shard_files:
+            exporter.add_shard(shard_file)
+        return exporter.export(leads_qs)
+
+    exporter = JsonExporter(ndjson=export.format == Export.Format.NDJSON)\
+        .load_exportables(exportables)
+    for shard_file in shard_files:
+        exporter.add_shard(shard_file)
+    return exporter.export()
@@ -0,0 +1,57 @@
+from deep.tests import TestCase
+from user.factories import UserFactory
+from project.factories import ProjectFactory
+from lead.factories import LeadFactory
+from entry.factories import EntryFactory
+from export.factories import ExportFactory
+from analysis_framework.factories import AnalysisFrameworkFactory, WidgetFactory
+
+from analysis_framework.models import Exportable
+from entry.models import Entry, ExportData
+from export.models import Export
+
+
+class EntriesExportTestCase(TestCase):
+    EXPORTABLES_COUNT = 5
+
+    def setUp(self):
+        super().setUp()
+        self.user = UserFactory.create()
+        self.af = AnalysisFrameworkFactory.create()
+        for i in range(self.EXPORTABLES_COUNT):
+            WidgetFactory.create(analysis_framework=self.af, key=f'widget-{i}')
+        self.exportables = [
+            Exportable.objects.create(
+                analysis_framework=self.af,
+                widget_key=f'widget-{i}',
+                data={'excel': {'title': f'Widget {i}'}},
+            )
+            for i in range(self.EXPORTABLES_COUNT)
+        ]
+
+    def _create_project_with_entries(self, entries_count):
+        project = ProjectFactory.create(analysis_framework=self.af)
+        project.add_member(self.user)
+        leads = LeadFactory.create_batch(2, project=project)
+        for i in range(entries_count):
+            entry = EntryFactory.create(
+                lead=leads[i % len(leads)],
+                entry_type=Entry.TagType.EXCERPT,
+            )
+            ExportData.objects.bulk_create([
+                ExportData(
+                    entry=entry,
+                    exportable=exportable,
+                    data={'excel': {'value': f'{exportable.widget_key}-{entry.pk}'}},
+                )
+                for exportable in self.exportables
+            ])
+        return ExportFactory.create(
+            project=project,
+            exported_by=self.user,
+            type=Export.DataType.ENTRIES,
+            export_type=Export.ExportType.EXCEL,
+            format=Export.Format.XLSX,
+            filters={},
+            extra_options={},
+        )
@@ -0,0 +1,33 @@
+import time
+import logging
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from export.tasks.tasks_entries import export_entries
+from .entries_export_test_case import EntriesExportTestCase
+
+logger = logging.getLogger(__name__)
+
+
+class TestExcelExporterQueries(EntriesExportTestCase):
+    def _export(self, export):
+        with CaptureQueriesContext(connection) as queries:
+            start_time = time.perf_counter()
+            export_entries(export)
+            duration = time.perf_counter() - start_time
+        return len(queries), duration
+
+    def test_queries_count_does_not_depend_on_entries(self):
+        small_export = self._create_project_with_entries(3)
+        large_entries_count = 30
+        large_export = self._create_project_with_entries(large_entries_count)
+
+        small_queries_count, _ = self._export(small_export)
+        large_queries_count, duration = self._export(large_export)
+        logger.info(
+            f'Excel export: {large_entries_count} entries x {self.EXPORTABLES_COUNT} exportables, '
+            f'{large_queries_count} queries, {large_entries_count / duration:.2f} entries/sec'
+        )
+        # No per entry (or per entry x per exportable) queries
+        assert large_queries_count == small_queries_count
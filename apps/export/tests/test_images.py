@@ -0,0 +1,38 @@
+import io
+import os
+import tempfile
+
+from django.test import TestCase
+from PIL import Image
+from export.formats.images import DiskLRUCache, downscale_image
+
+
+class DownscaleImageTest(TestCase):
+    def _get_image(self, size, image_format):
+        content = io.BytesIO()
+        Image.new('RGB', size).save(content, format=image_format)
+        return content.getvalue()
+
+    def test_downscale_image(self):
+        for image_format, expected_format in [('PNG', 'PNG'), ('JPEG', 'JPEG'), ('GIF', 'PNG')]:
+            image = Image.open(io.BytesIO(downscale_image(self._get_image((300, 150), image_format), 100)))
+            assert image.format == expected_format
+            assert image.size == (100, 50)
+        # Smaller images are used as it is
+        content = self._get_image((50, 50), 'PNG')
+        assert downscale_image(content, 100) == content
+
+
+class DiskLRUCacheTest(TestCase):
+    def test_evict_least_recently_used(self):
+        cache = DiskLRUCache(tempfile.mkdtemp(), 3000)
+        for i in range(5):
+            path = cache.set(f'key-{i}', b'x' * 1000)
+            os.utime(path, (i, i))
+        # Mark as recently used
+        assert cache.get_path('key-0') is not None
+        cache.evict()
+        assert [
+            key for key in ['key-0', 'key-1', 'key-2', 'key-3', 'key-4']
+            if cache.get_path(key) is not None
+        ] == ['key-0', 'key-3', 'key-4']
@@ -0,0 +1,28 @@
+import json
+
+from export.models import Export
+from export.tasks.tasks_entries import export_entries
+from .entries_export_test_case import EntriesExportTestCase
+
+
+class TestJsonExporter(EntriesExportTestCase):
+    def test_json_and_ndjson_export(self):
+        export = self._create_project_with_entries(7)
+        export.export_type = Export.ExportType.JSON
+        export.format = Export.Format.JSON
+        export.save()
+        data = json.loads(export_entries(export).read())
+        assert len(data['entries']) == 7
+        assert [widget['id'] for widget in data['widgets']] == [f'widget-{i}' for i in range(self.EXPORTABLES_COUNT)]
+
+        export.format = Export.Format.NDJSON
+        export.save()
+        lines = [json.loads(line) for line in export_entries(export)]
+        assert lines[0] == {'widgets': data['widgets']}
+        assert lines[1:] == data['entries']
+
+        # Empty export is still a valid JSON
+        export.format = Export.Format.JSON
+        export.filters = {'ids': ['0']}
+        export.save()
+        assert json.loads(export_entries(export).read())['entries'] == []
@@ -0,0 +1,227 @@
+import json
+from unittest.mock import patch
+
+from django.core.files.storage import default_storage
+from django.test import override_settings
+from django.utils import timezone
+from openpyxl import load_workbook
+
+from geo.factories import RegionFactory
+from organization.factories import OrganizationFactory
+from export.factories import ExportFactory
+
+from entry.models import Entry
+from entry.widgets.utils import upsert_export_data
+from lead.models import Lead
+from export.models import Export, ExportCache
+from export.tasks import export_task, evict_export_cache, export_entries_sharded
+from export.tasks.tasks_entries import (
+    export_entries,
+    get_export_entries_cache_key,
+    get_export_entries_shards,
+    export_entries_shard,
+    merge_export_entries_shards,
+)
+from .entries_export_test_case import EntriesExportTestCase
+
+
+class TestShardedEntriesExport(EntriesExportTestCase):
+    def _get_sharded_export(self, export):
+        shards = get_export_entries_shards(export)
+        shard_files = [
+            export_entries_shard(export, shard)
+            for shard in shards
+        ]
+        return shards, merge_export_entries_shards(export, shard_files)
+
+    @override_settings(EXPORT_ENTRIES_SHARD_THRESHOLD=5, EXPORT_ENTRIES_SHARDS_COUNT=3)
+    def test_sharded_json_export(self):
+        export = self._create_project_with_entries(10)
+        export.export_type = Export.ExportType.JSON
+        export.format = Export.Format.JSON
+        export.save()
+
+        shards, sharded_file = self._get_sharded_export(export)
+        assert len(shards) == 3
+        sharded_data = json.loads(sharded_file.read())
+        data = json.loads(export_entries(export).read())
+        assert len(sharded_data['entries']) == 10
+        assert sharded_data['widgets'] == data['widgets']
+        assert sorted(sharded_data['entries'], key=lambda x: x['id']) == sorted(data['entries'], key=lambda x: x['id'])
+
+    @override_settings(EXPORT_ENTRIES_SHARD_THRESHOLD=5, EXPORT_ENTRIES_SHARDS_COUNT=3)
+    def test_sharded_excel_export(self):
+        export = self._create_project_with_entries(10)
+
+        def _get_rows(file):
+            workbook = load_workbook(file)
+            return [
+                sorted(ws.iter_rows(values_only=True))
+                for ws in workbook.worksheets
+            ]
+
+        shards, sharded_file = self._get_sharded_export(export)
+        assert len(shards) == 3
+        assert _get_rows(sharded_file) == _get_rows(export_entries(export))
+
+    @override_settings(EXPORT_ENTRIES_SHARD_THRESHOLD=5, EXPORT_ENTRIES_SHARDS_COUNT=3)
+    def test_export_shards_bounds(self):
+        export = self._create_project_with_entries(10)
+        export.export_type = Export.ExportType.JSON
+        export.format = Export.Format.JSON
+        export.save()
+        # Same ordering values (order, created_at) for all the entries, only the pk tie breaker differs
+        Entry.objects.filter(project=export.project).update(order=1, created_at=timezone.now())
+
+        shards = get_export_entries_shards(export)
+        # Only the keyset bounds are sent to the shard tasks, not the entry ids
+        assert [(shard['offset'], shard['after'] is None) for shard in shards] == [(0, True), (4, False), (8, False)]
+        assert [shard['after'] for shard in shards[1:]] == [shard['last'] for shard in shards[:-1]]
+        shard_entry_ids = [
+            sorted(json.loads(line)['id'] for line in export_entries_shard(export, shard))
+            for shard in shards
+        ]
+        assert [len(entry_ids) for entry_ids in shard_entry_ids] == [4, 4, 2]
+        assert sorted(sum(shard_entry_ids, [])) == sorted(
+            Entry.objects.filter(project=export.project).values_list('id', flat=True)
+        )
+
+    @override_settings(EXPORT_ENTRIES_SHARD_THRESHOLD=5, EXPORT_ENTRIES_SHARDS_COUNT=3)
+    def test_cancel_sharded_export(self):
+        export = self._create_project_with_entries(10)
+        export.status = Export.Status.STARTED
+        export.save()
+        shards = get_export_entries_shards(export)
+        with patch('export.tasks.chord') as chord_mock:
+            chord_mock.return_value.return_value.id = 'merge-task-id'
+            export_entries_sharded(export, shards)
+        with patch('export.models.celery_app.control.revoke') as revoke_mock:
+            export.cancel()
+        # Shard tasks are revoked with the merge task
+        revoked_task_ids = revoke_mock.call_args[0][0]
+        assert len(revoked_task_ids) == len(shards) + 1
+        assert revoked_task_ids[0] == 'merge-task-id'
+        assert export.status == Export.Status.CANCELED
+
+    @override_settings(EXPORT_ENTRIES_SHARD_THRESHOLD=50)
+    def test_small_export_is_not_sharded(self):
+        export = self._create_project_with_entries(10)
+        assert get_export_entries_shards(export) == []
+
+
+class TestExportCache(EntriesExportTestCase):
+    def _create_identical_export(self, export, **kwargs):
+        return ExportFactory.create(
+            project=export.project,
+            exported_by=export.exported_by,
+            type=export.type,
+            export_type=export.export_type,
+            format=export.format,
+            filters=export.filters,
+            extra_options=export.extra_options,
+            **kwargs,
+        )
+
+    def test_identical_export_uses_cache(self):
+        export = self._create_project_with_entries(3)
+        assert export_task(export.id) is True
+        export.refresh_from_db()
+        assert ExportCache.objects.filter(export=export).count() == 1
+
+        # Same options, same data
+        cached_export = self._create_identical_export(export)
+        assert export_task(cached_export.id) == 'CACHED'
+        cached_export.refresh_from_db()
+        assert cached_export.status == Export.Status.SUCCESS
+        assert cached_export.file.name == export.file.name
+        assert ExportCache.objects.get(export=export).hits == 1
+
+        # Different options
+        other_export = self._create_identical_export(export, is_preview=True)
+        assert export_task(other_export.id) is True
+
+        # Data changed
+        entry = Entry.objects.filter(project=export.project).first()
+        with self.captureOnCommitCallbacks(execute=True):
+            entry.excerpt = 'Updated excerpt'
+            entry.save()
+        new_export = self._create_identical_export(export)
+        assert export_task(new_export.id) is True
+        new_export.refresh_from_db()
+        assert new_export.file.name != export.file.name
+        assert ExportCache.objects.count() == 3
+
+    def test_export_cache_key_data_versions(self):
+        export = self._create_project_with_entries(3)
+        region = RegionFactory.create()
+        export.project.regions.add(region)
+        organization = OrganizationFactory.create()
+        lead = Lead.objects.filter(project=export.project).first()
+        lead.authors.add(organization)
+        cache_key = get_export_entries_cache_key(export)
+        assert get_export_entries_cache_key(export) == cache_key
+
+        # Region data changed (eg: Geo areas re-imported)
+        with self.captureOnCommitCallbacks(execute=True):
+            region.save()
+        assert get_export_entries_cache_key(export) != cache_key
+        cache_key = get_export_entries_cache_key(export)
+
+        # Organization used by the lead changed
+        with self.captureOnCommitCallbacks(execute=True):
+            organization.title = 'Renamed organization'
+            organization.save()
+        assert get_export_entries_cache_key(export) != cache_key
+        cache_key = get_export_entries_cache_key(export)
+
+        # Other changes of the organization
+        with self.captureOnCommitCallbacks(execute=True):
+            organization.popularity += 1
+            organization.save()
+        assert get_export_entries_cache_key(export) == cache_key
+
+    def test_export_cache_key_bulk_writes(self):
+        export = self._create_project_with_entries(3)
+        assert export_task(export.id) is True
+        entry = Entry.objects.filter(project=export.project).first()
+        cache_key = get_export_entries_cache_key(export)
+
+        # Bulk upserts skip the model signals
+        with self.captureOnCommitCallbacks(execute=True):
+            upsert_export_data({(entry.pk, self.exportables[0].pk): {'excel': {'value': 'Updated value'}}})
+        assert get_export_entries_cache_key(export) != cache_key
+        assert export_task(self._create_identical_export(export).id) is True
+        cache_key = get_export_entries_cache_key(export)
+
+        # Raw SQL update
+        with self.captureOnCommitCallbacks(execute=True):
+            Lead.update_search_text([entry.lead_id])
+        assert get_export_entries_cache_key(export) != cache_key
+
+    def test_cached_export_file_is_shared(self):
+        export = self._create_project_with_entries(3)
+        export_task(export.id)
+        cached_export = self._create_identical_export(export)
+        assert export_task(cached_export.id) == 'CACHED'
+        export.refresh_from_db()
+        file_name = export.file.name
+
+        # Eviction doesn't remove the file
+        with override_settings(EXPORT_CACHE_MAX_SIZE=0):
+            assert evict_export_cache() == 1
+        assert default_storage.exists(file_name)
+        # File is still used by the other export
+        with self.captureOnCommitCallbacks(execute=True):
+            export.delete()
+        assert default_storage.exists(file_name)
+        # Removed with the last export
+        with self.captureOnCommitCallbacks(execute=True):
+            cached_export.delete()
+        assert not default_storage.exists(file_name)
+
+    def test_evict_export_cache(self):
+        export = self._create_project_with_entries(3)
+        export_task(export.id)
+        with override_settings(EXPORT_CACHE_MAX_SIZE=0):
+            assert evict_export_cache() == 1
+        assert ExportCache.objects.count() == 0
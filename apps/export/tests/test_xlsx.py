@@ -1,5 +1,8 @@
+import datetime
+
 from django.test import TestCase
-from export.formats.xlsx import RowsBuilder
+from openpyxl import load_workbook
+from export.formats.xlsx import RowsBuilder, WorkBook, WriteOnlyWorkSheet
 
 
 class RowsBuilderTest(TestCase):
@@ -32,3 +35,31 @@ class RowsBuilderTest(TestCase):
 
         self.assertEqual(result, builder.rows)
         self.assertEqual(group_result, builder.group_rows)
+
+
+class WorkBookTest(TestCase):
+    def test_write_only_workbook(self):
+        wb = WorkBook(write_only=True)
+        sheet = wb.get_active_sheet().set_title('Entries')
+        other_sheet = wb.create_sheet('Other')
+
+        sheet.append([['Date', 'A very long column title', 'Value']])
+        sheet.auto_fit_cells_in_row(1)
+        sheet.set_col_types({0: 'date'})
+        rows_count = WriteOnlyWorkSheet.BUFFER_ROWS * 3
+        for i in range(rows_count):
+            sheet.append([['2020-01-02', str(i), 'value']])
+            other_sheet.append([[str(i)]])
+
+        file = wb.save_to_file()
+        result = load_workbook(file)
+        self.assertEqual(result.sheetnames, ['Entries', 'Other'])
+        ws = result['Entries']
+        self.assertEqual(ws.max_row, rows_count + 1)
+        self.assertEqual(ws['A1'].value, 'Date')
+        self.assertEqual(ws['A2'].value, datetime.datetime(2020, 1, 2))
+        self.assertEqual(ws['A2'].number_format, 'dd-mm-yyyy')
+        self.assertEqual(ws[f'B{rows_count + 1}'].value, str(rows_count - 1))
+        self.assertEqual(ws.column_dimensions['A'].width, 15)
+        self.assertEqual(ws.column_dimensions['B'].width, len('A very long column title'))
+        self.assertEqual(result['Other'].max_row, rows_count)
@@ -0,0 +1,152 @@
+import math
+import tempfile
+from typing import Iterator, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files import File
+from django.db import connection
+from django.contrib.gis.db.models import Extent
+
+from deep.caches import CacheKey, DataVersion
+
+from .models import AdminLevel, GeoArea
+
+BBox = Tuple[float, float, float, float]  # (min_x, min_y, max_x, max_y)
+
+GEOJSON_CHUNK_SIZE = 500
+GEO_TILE_MAX_ZOOM = 18
+# Same as django.core.serializers geojson output
+GEOJSON_HEADER = '{"type": "FeatureCollection", "crs": {"type": "name", "properties": {"name": "EPSG:4326"}}, "features": ['
+GEOJSON_FOOTER = ']}'
+
+# NOTE: Features are rendered in the database, geometries are not loaded in python
+GEOJSON_FEATURES_SQL = f'''
+    SELECT
+        json_build_object(
+            'type', 'Feature',
+            'properties', json_build_object(
+                'title', title,
+                'code', code,
+                'cached_data', cached_data,
+                'pk', id::text
+            ),
+            'geometry', ST_AsGeoJSON({{geometry}})::json
+        )::text
+    FROM {GeoArea._meta.db_table}
+    WHERE
+        admin_level_id = %(admin_level_id)s
+        {{bbox_filter}}
+    ORDER BY id
+'''
+
+MVT_TILE_SQL = f'''
+    WITH
+        tile AS (
+            SELECT ST_TileEnvelope(%(z)s, %(x)s, %(y)s) AS envelope
+        ),
+        features AS (
+            SELECT
+                ST_AsMVTGeom(ST_Transform(G.polygons, 3857), tile.envelope) AS geom,
+                G.id,
+                G.title,
+                G.code,
+                G.parent_id
+            FROM {GeoArea._meta.db_table} AS G, tile
+            WHERE
+                G.admin_level_id = %(admin_level_id)s AND
+                G.polygons && ST_Transform(tile.envelope, 4326)
+        )
+    SELECT ST_AsMVT(features.*, 'geo_areas') FROM features
+'''
+
+
+def get_zoom_tolerance(zoom: int) -> float:
+    """
+    Size of a pixel (in degree) at the zoom level, used to simplify the geometries for the zoom level
+    """
+    return 360 / (256 * 2 ** zoom)
+
+
+def stream_admin_level_geojson(
+    admin_level_id: int,
+    bbox: Optional[BBox] = None,
+    zoom: Optional[int] = None,
+) -> Iterator[str]:
+    """
+    GeoJSON of the admin level geo areas (Optionally within bbox and simplified for the zoom level) as chunks
+    """
+    params = {'admin_level_id': admin_level_id}
+    geometry = 'polygons'
+    bbox_filter = ''
+    if zoom is not None:
+        geometry = 'ST_SimplifyPreserveTopology(polygons, %(tolerance)s)'
+        params['tolerance'] = get_zoom_tolerance(zoom)
+    if bbox is not None:
+        bbox_filter = 'AND polygons && ST_MakeEnvelope(%(min_x)s, %(min_y)s, %(max_x)s, %(max_y)s, 4326)'
+        params.update(zip(('min_x', 'min_y', 'max_x', 'max_y'), bbox))
+
+    yield GEOJSON_HEADER
+    # Server side cursor, features are fetched in chunks
+    with connection.chunked_cursor() as cursor:
+        cursor.execute(GEOJSON_FEATURES_SQL.format(geometry=geometry, bbox_filter=bbox_filter), params)
+        separator = ''
+        for rows in iter(lambda: cursor.fetchmany(GEOJSON_CHUNK_SIZE), []):
+            yield separator + ', '.join(row[0] for row in rows)
+            separator = ', '
+    yield GEOJSON_FOOTER
+
+
+def get_admin_level_geojson_file(admin_level_id: int) -> File:
+    """
+    GeoJSON of the admin level written to a temporary file (Needs to be closed)
+    """
+    fp = tempfile.TemporaryFile(dir=settings.TEMP_DIR)
+    for chunk in stream_admin_level_geojson(admin_level_id):
+        fp.write(chunk.encode('utf-8'))
+    fp.seek(0)
+    return File(fp)
+
+
+def get_admin_level_bounds(admin_level_id: int) -> dict:
+    extent = GeoArea.objects.filter(
+        admin_level=admin_level_id,
+        polygons__isnull=False,
+    ).aggregate(extent=Extent('polygons'))['extent']
+    if not extent or not all(math.isfinite(value) for value in extent):
+        return {}
+    min_x, min_y, max_x, max_y = extent
+    return {
+        'minX': min_x,
+        'minY': min_y,
+        'maxX': max_x,
+        'maxY': max_y,
+    }
+
+
+def get_admin_level_tile(admin_level: AdminLevel, z: int, x: int, y: int) -> bytes:
+    """
+    Mapbox vector tile of the admin level geo areas, cached using the region data version
+    """
+    cache_key = CacheKey.GEO_ADMIN_LEVEL_TILE_KEY_FORMAT.format(
+        admin_level.pk,
+        DataVersion.get(DataVersion.REGION, admin_level.region_id),
+        z, x, y,
+    )
+    tile = cache.get(cache_key)
+    if tile is None:
+        with connection.cursor() as cursor:
+            cursor.execute(MVT_TILE_SQL, {'admin_level_id': admin_level.pk, 'z': z, 'x': x, 'y': y})
+            tile = bytes(cursor.fetchone()[0] or b'')
+        cache.set(cache_key, tile, settings.GEO_ADMIN_LEVEL_TILE_CACHE_TIMEOUT)
+    return tile
+
+
+def parse_bbox(value: str) -> BBox:
+    """
+    min_x,min_y,max_x,max_y -> (min_x, min_y, max_x, max_y)
+    """
+    bbox = tuple(float(v) for v in value.split(','))
+    if len(bbox) != 4 or not all(math.isfinite(v) for v in bbox):
+        raise ValueError(f'Invalid bbox: {value}')
+    return bbox
@@ -0,0 +1,164 @@
+from typing import Iterable, List, Union
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+
+from deep.caches import CacheKey, local_cache
+
+from .models import Region, AdminLevel, GeoArea
+
+GeoAreaIds = Iterable[Union[str, int]]
+
+
+def _take(array: np.ndarray, indexes: np.ndarray) -> np.ndarray:
+    """
+    array[indexes] where -1 index gives -1
+    """
+    valid = indexes >= 0
+    values = np.full(len(indexes), -1, dtype=array.dtype)
+    values[valid] = array[indexes[valid]]
+    return values
+
+
+def _search(sorted_ids: np.ndarray, ids: np.ndarray) -> np.ndarray:
+    """
+    Index of the ids in sorted_ids (-1 if not available)
+    """
+    indexes = np.full(len(ids), -1, dtype=np.int64)
+    if len(sorted_ids):
+        found_indexes = np.searchsorted(sorted_ids, ids).clip(max=len(sorted_ids) - 1)
+        found = sorted_ids[found_indexes] == ids
+        indexes[found] = found_indexes[found]
+    return indexes
+
+
+def _to_id_array(geo_area_ids: GeoAreaIds) -> np.ndarray:
+    ids = []
+    for _id in geo_area_ids:
+        try:
+            ids.append(int(_id))
+        except (TypeError, ValueError):
+            ids.append(-1)
+    return np.array(ids, dtype=np.int64)
+
+
+class GeoAreaHierarchy:
+    """
+    Compact array representation of the geo areas of a region.
+    Cached per region cache_index, which is incremented by Region.calc_cache after the geo areas are updated.
+
+    - admin_levels: [{id, level, title}] Ordered by level
+    - ids: Geo area ids (Sorted)
+    - parents: Index of the parent geo area (-1 if not available)
+    - admin_level_indexes: Index of the admin level (in admin_levels)
+    - titles, codes: Geo area titles and codes
+    """
+
+    def __init__(self, region_id, admin_levels, ids, parents, admin_level_indexes, titles, codes):
+        self.region_id = region_id
+        self.admin_levels = admin_levels
+        self.ids = ids
+        self.parents = parents
+        self.admin_level_indexes = admin_level_indexes
+        self.titles = titles
+        self.codes = codes
+
+    @classmethod
+    def _build(cls, region_id: int) -> 'GeoAreaHierarchy':
+        admin_levels = list(
+            AdminLevel.objects.filter(region=region_id).order_by('level').values('id', 'level', 'title')
+        )
+        admin_level_index_map = {
+            admin_level['id']: index
+            for index, admin_level in enumerate(admin_levels)
+        }
+        rows = list(
+            GeoArea.objects.filter(admin_level__region=region_id).order_by('id').values_list(
+                'id', 'parent_id', 'admin_level_id', 'title', 'code',
+            )
+        )
+        ids = np.array([row[0] for row in rows], dtype=np.int64)
+        parent_ids = np.array([row[1] or -1 for row in rows], dtype=np.int64)
+        return cls(
+            region_id=region_id,
+            admin_levels=admin_levels,
+            ids=ids,
+            parents=_search(ids, parent_ids).astype(np.int32),
+            admin_level_indexes=np.array([admin_level_index_map[row[2]] for row in rows], dtype=np.int16),
+            titles=[row[3] for row in rows],
+            codes=[row[4] for row in rows],
+        )
+
+    @classmethod
+    def get(cls, region: Region) -> 'GeoAreaHierarchy':
+        """
+        Cached in local memory and redis using the region cache_index
+        """
+        timeout = settings.GEO_AREA_HIERARCHY_CACHE_TIMEOUT
+        if not timeout:
+            return cls._build(region.pk)
+        cache_key = CacheKey.GEO_AREA_HIERARCHY_KEY_FORMAT.format(region.pk, region.cache_index)
+        data = local_cache.get(cache_key)
+        if data is None:
+            data = cache.get(cache_key)
+            if data is None:
+                data = cls._build(region.pk).__dict__
+                cache.set(cache_key, data, timeout)
+            local_cache.set(cache_key, data, timeout)
+        return cls(**data)
+
+    @classmethod
+    def get_for_regions(cls, regions: Iterable[Region]) -> List['GeoAreaHierarchy']:
+        return [cls.get(region) for region in regions]
+
+    def get_indexes(self, geo_area_ids: GeoAreaIds) -> np.ndarray:
+        """
+        Index of the geo areas (-1 if not available in this region)
+        """
+        return _search(self.ids, _to_id_array(geo_area_ids))
+
+    def get_ancestors(self, geo_area_ids: GeoAreaIds) -> np.ndarray:
+        """
+        Index of the ancestors (including the geo area itself) at every admin level.
+        Returns array of shape (len(geo_area_ids), len(admin_levels)), -1 if not available.
+        """
+        current = self.get_indexes(geo_area_ids)
+        ancestors = np.full((len(current), len(self.admin_levels)), -1, dtype=np.int64)
+        rows = np.arange(len(current))
+        # NOTE: Bounded by the number of admin levels (Also guards against the cyclic parents)
+        for _ in range(len(self.admin_levels)):
+            valid = current >= 0
+            if not valid.any():
+                break
+            ancestors[rows[valid], self.admin_level_indexes[current[valid]]] = current[valid]
+            current = _take(self.parents, current)
+        return ancestors
+
+    def get_titles_at_level(self, geo_area_ids: GeoAreaIds, level: int) -> List[str]:
+        """
+        Titles of the ancestors of the geo areas at the given admin level
+        """
+        admin_level_index = next(
+            (index for index, admin_level in enumerate(self.admin_levels) if admin_level['level'] == level),
+            None,
+        )
+        if admin_level_index is None:
+            return []
+        return [
+            self.titles[index]
+            for index in self.get_ancestors(geo_area_ids)[:, admin_level_index]
+            if index >= 0
+        ]
+
+    def get_sub_children_ids(self, geo_area_ids: GeoAreaIds, level=1) -> List[int]:
+        """
+        Geo areas and their children up to (level - 1) depth (Same as GeoArea.get_sub_childrens)
+        """
+        value_ids = _to_id_array(geo_area_ids)
+        selected = np.isin(self.ids, value_ids)
+        current = np.arange(len(self.ids))
+        for _ in range(level - 1):
+            current = _take(self.parents, current)
+            selected |= (current >= 0) & np.isin(_take(self.ids, current), value_ids)
+        return self.ids[selected].tolist()
@@ -0,0 +1,26 @@
+from django.db import migrations
+
+
+def reset_geo_options(apps, schema_editor):
+    # Legacy format (list of dicts), re-generated as columns on demand
+    Region = apps.get_model('geo', 'Region')
+    Project = apps.get_model('project', 'Project')
+    Region.objects.update(geo_options=None)
+    # Project geo cache files are also generated using the legacy format. Files are kept (served as legacy format)
+    # and re-generated in the background on the next request as the hash doesn't match (See geo.views.GeoOptionsView)
+    Project.objects.update(geo_cache_hash=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('geo', '0043_create-unaccent_extension'),
+        ('project', '0008_alter_projectpinned_unique_together'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            reset_geo_options,
+            reverse_code=migrations.RunPython.noop,
+        ),
+    ]
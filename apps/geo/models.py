@@ -1,10 +1,6 @@
-import json
-
 from typing import List, Union
 from django.contrib.gis.db import models
-from django.core.serializers import serialize
 from django.db import transaction, connection
-from django.contrib.gis.gdal import Envelope
 from django.contrib.gis.db.models.aggregates import Union as PgUnion
 from django.contrib.gis.db.models.functions import Centroid
 
@@ -48,22 +44,40 @@ class Region(UserResource):
         ordering = ['title', 'code']
 
     def calc_cache(self, save=True):
-        self.geo_options = [
-            {
-                'label': '{} / {}'.format(geo_area.admin_level.title, geo_area.title),
-                'title': geo_area.title,
-                'key': str(geo_area.id),
-                'admin_level': geo_area.admin_level.level,
-                'admin_level_title': geo_area.admin_level.title,
-                'region': self.id,
-                'region_title': self.title,
-                'parent': geo_area.parent.id if geo_area.parent else None,
-            } for geo_area in GeoArea.objects.prefetch_related(
-                'admin_level',
-            ).filter(
-                admin_level__region=self
-            ).order_by('admin_level__level').distinct()
-        ]
+        """
+        geo_options is stored as columns (parallel arrays) instead of the list of dicts.
+        {
+            region, region_title,
+            admin_levels: [{level, title}],
+            ids, titles, parents, admin_level_indexes,  # Per geo area (Index of admin_levels for admin_level_indexes)
+        }
+        Use get_geo_area_options for the list of dicts.
+        """
+        admin_levels = list(
+            AdminLevel.objects.filter(region=self).order_by('level', 'id').values('id', 'level', 'title')
+        )
+        admin_level_index_map = {
+            admin_level.pop('id'): index
+            for index, admin_level in enumerate(admin_levels)
+        }
+        ids, titles, parents, admin_level_indexes = [], [], [], []
+        geo_area_qs = GeoArea.objects.filter(
+            admin_level__region=self
+        ).order_by('admin_level__level', 'id').values_list('id', 'title', 'parent_id', 'admin_level_id')
+        for _id, title, parent_id, admin_level_id in geo_area_qs.iterator(chunk_size=2000):
+            ids.append(_id)
+            titles.append(title)
+            parents.append(parent_id)
+            admin_level_indexes.append(admin_level_index_map[admin_level_id])
+        self.geo_options = {
+            'region': self.id,
+            'region_title': self.title,
+            'admin_levels': admin_levels,
+            'ids': ids,
+            'titles': titles,
+            'parents': parents,
+            'admin_level_indexes': admin_level_indexes,
+        }
 
         # Calculate region centroid
         self.centroid = GeoArea.objects\
@@ -73,6 +87,32 @@ class Region(UserResource):
         if save:
             self.save()
 
+    def get_geo_area_options(self) -> List[dict]:
+        """
+        geo_options as list of dicts (Legacy format)
+        """
+        geo_options = self.geo_options
+        if not geo_options:
+            return []
+        admin_levels = geo_options['admin_levels']
+        return [
+            {
+                'label': '{} / {}'.format(admin_levels[admin_level_index]['title'], title),
+                'title': title,
+                'key': str(_id),
+                'admin_level': admin_levels[admin_level_index]['level'],
+                'admin_level_title': admin_levels[admin_level_index]['title'],
+                'region': geo_options['region'],
+                'region_title': geo_options['region_title'],
+                'parent': parent,
+            } for _id, title, parent, admin_level_index in zip(
+                geo_options['ids'],
+                geo_options['titles'],
+                geo_options['parents'],
+                geo_options['admin_level_indexes'],
+            )
+        ]
+
     def get_verbose_title(self):
         if self.public:
             return self.title
@@ -192,6 +232,9 @@ class AdminLevel(models.Model):
         return self.geo_area_titles
 
     def calc_cache(self, save=True):
+        # XXX: Circular dependency
+        from geo.geojson import get_admin_level_geojson_file, get_admin_level_bounds
+
         # Update geo parent_titles data
         with transaction.atomic():
             GEO_PARENT_DATA_CALC_SQL = f'''
@@ -241,47 +284,26 @@ class AdminLevel(models.Model):
             with connection.cursor() as cursor:
                 cursor.execute(GEO_PARENT_DATA_CALC_SQL, {'admin_level_id': self.pk})
 
-        geojson = json.loads(serialize(
-            'geojson',
-            self.geoarea_set.all(),
-            geometry_field='polygons',
-            fields=('pk', 'title', 'code', 'cached_data'),
-        ))
-
         # Titles
-        titles = {}
-        for geo_area in self.geoarea_set.all():
-            titles[str(geo_area.id)] = {
-                'title': geo_area.title,
-                'parent_id': str(geo_area.parent.pk) if geo_area.parent else None,
-                'code': geo_area.code,
+        self.geo_area_titles = {
+            str(geo_area_id): {
+                'title': title,
+                'parent_id': str(parent_id) if parent_id else None,
+                'code': code,
             }
-        self.geo_area_titles = titles
-
-        # Bounds
-        bounds = {}
-        areas = self.geoarea_set.filter(polygons__isnull=False)
-        if areas.count() > 0:
-            try:
-                envelope = Envelope(*areas[0].polygons.extent)
-                for area in areas[1:]:
-                    envelope.expand_to_include(*area.polygons.extent)
-                bounds = {
-                    'minX': envelope.min_x,
-                    'minY': envelope.min_y,
-                    'maxX': envelope.max_x,
-                    'maxY': envelope.max_y,
-                }
-            except ValueError:
-                pass
-
-        self.geojson_file.save(
-            f'admin-level-{self.pk}.json',
-            generate_json_file_for_upload(geojson),
-        )
+            for geo_area_id, title, parent_id, code in self.geoarea_set.values_list('id', 'title', 'parent_id', 'code')
+        }
+
+        # GeoJSON (Streamed from the database to a temporary file) and Bounds
+        geojson_file = get_admin_level_geojson_file(self.pk)
+        try:
+            self.geojson_file.save(f'admin-level-{self.pk}.json', geojson_file, save=False)
+        finally:
+            geojson_file.close()
         self.bounds_file.save(
             f'admin-level-{self.pk}.json',
-            generate_json_file_for_upload({'bounds': bounds}),
+            generate_json_file_for_upload({'bounds': get_admin_level_bounds(self.pk)}),
+            save=False,
         )
         if save:
             self.save()
@@ -1,13 +1,16 @@
+from typing import List
+
+from billiard import Pool
 from celery import shared_task
 from django.conf import settings
 from django.contrib.gis.gdal import DataSource
 from django.contrib.gis.geos import GEOSGeometry
-from django.db.models import Q
 from geo.models import Region, AdminLevel, GeoArea
 
 from redis_store import redis
 
 import os
+import time
 import reversion
 import tempfile
 import zipfile
@@ -16,6 +19,11 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+GEO_AREA_IMPORT_BATCH_SIZE = 500
+# Geometries are simplified in a process pool (GEO_AREA_IMPORT_WORKERS) for the layers larger than this
+GEO_AREA_IMPORT_POOL_MIN_FEATURES = 1000
+GEO_AREA_IMPORT_POOL_CHUNK_SIZE = 200
+
 
 @shared_task
 def add(x, y):
@@ -26,69 +34,134 @@ def add(x, y):
     return x + y
 
 
-def _save_geo_area(admin_level, parent, feature):
-    name = None
-    code = None
+def _simplify_geometry(args):
+    wkb, tolerance = args
+    return bytes(GEOSGeometry(memoryview(wkb)).simplify(
+        tolerance=tolerance,
+        preserve_topology=True,
+    ).wkb)
 
-    if admin_level.name_prop:
-        name = feature.get(admin_level.name_prop)
-    if admin_level.code_prop:
-        code = feature.get(admin_level.code_prop)
 
-    name = name or ''
+def _simplify_geometries(wkbs: List[bytes], tolerance: float) -> List[bytes]:
+    args = [(wkb, tolerance) for wkb in wkbs]
+    workers = settings.GEO_AREA_IMPORT_WORKERS
+    if workers <= 1 or len(args) < GEO_AREA_IMPORT_POOL_MIN_FEATURES:
+        return [_simplify_geometry(arg) for arg in args]
+    # NOTE: billiard (fork of multiprocessing used by celery) allows pool inside the celery prefork workers
+    pool = Pool(processes=workers)
+    try:
+        return pool.map(_simplify_geometry, args, chunksize=GEO_AREA_IMPORT_POOL_CHUNK_SIZE)
+    finally:
+        pool.close()
+        pool.join()
 
-    geo_area = GeoArea.objects.filter(
-        Q(code=None, title=name) | Q(code=code),
-        admin_level=admin_level,
-    ).first()
 
-    if not geo_area:
-        geo_area = GeoArea()
+def _get_feature_value(feature, prop, feature_names):
+    if not prop or prop not in feature_names:
+        return None
+    value = feature.get(prop)
+    return None if value is None else str(value)
 
-    geo_area.title = name
-    geo_area.code = code if code else ''
-    geo_area.admin_level = admin_level
 
-    geom = feature.geom
-    geom = GEOSGeometry(geom.wkt).simplify(
-        tolerance=admin_level.tolerance,
-        preserve_topology=True,
-    )
+def _get_parent_resolver(admin_level, parent):
+    """
+    In-memory (title, code) -> id maps of the parent admin level, first (lowest id) geo area is used for duplicates
+    """
+    by_title_code = {}
+    by_title = {}
+    by_code = {}
+    if parent:
+        for geo_area_id, title, code in GeoArea.objects.filter(
+            admin_level=parent,
+        ).order_by('id').values_list('id', 'title', 'code'):
+            by_title_code.setdefault((title, code), geo_area_id)
+            by_title.setdefault(title, geo_area_id)
+            by_code.setdefault(code, geo_area_id)
+
+    def _resolve(parent_name, parent_code):
+        if not parent:
+            return None
+        if parent_name is not None:
+            if admin_level.parent_code_prop:
+                return by_title_code.get((parent_name, parent_code))
+            return by_title.get(parent_name)
+        if parent_code is not None:
+            return by_code.get(parent_code)
+    return _resolve
+
 
-    # if geom.geom_type == 'Polygon':
-    #     geom = MultiPolygon(geom)
-    # elif geom.geom_type != 'MultiPolygon':
-    #     raise Exception('Invalid geometry type for geoarea')
+def _import_geo_areas(admin_level, parent, layer):
+    """
+    Bulk import geo areas of the admin level from the layer
 
-    geo_area.polygons = geom
+    Existing geo areas are matched using the code, parents are resolved using the already imported parent level.
+    Geo areas which are not in the layer are deleted.
+    """
+    start_time = time.time()
     feature_names = [
         f.decode('utf-8') if isinstance(f, bytes) else f
-        for f in feature.fields
+        for f in layer.fields
     ]
 
-    if parent:
-        if admin_level.parent_name_prop and \
-                admin_level.parent_name_prop in feature_names:
-            candidates = GeoArea.objects.filter(
-                admin_level=parent,
-                title=feature.get(admin_level.parent_name_prop)
-            )
-
-            if admin_level.parent_code_prop:
-                candidates = candidates.filter(
-                    code=feature.get(admin_level.parent_code_prop)
-                )
-            geo_area.parent = candidates.first()
-
-        elif admin_level.parent_code_prop and \
-                admin_level.parent_code_prop in feature_names:
-            geo_area.parent = GeoArea.objects.filter(
-                admin_level=parent,
-                code=feature.get(admin_level.parent_code_prop)
-            ).first()
+    # -- Load the layer (Last feature is used for the duplicate codes)
+    features = {}
+    for index, feature in enumerate(layer):
+        code = _get_feature_value(feature, admin_level.code_prop, feature_names)
+        features[code or f'__feature-{index}'] = dict(
+            title=_get_feature_value(feature, admin_level.name_prop, feature_names) or '',
+            code=code or '',
+            parent_name=_get_feature_value(feature, admin_level.parent_name_prop, feature_names),
+            parent_code=_get_feature_value(feature, admin_level.parent_code_prop, feature_names),
+            wkb=bytes(feature.geom.wkb),
+        )
+    features = list(features.values())
+    geometries = _simplify_geometries([feature.pop('wkb') for feature in features], admin_level.tolerance)
 
-    geo_area.save()
-    return geo_area
+    # -- Existing geo areas
+    existing_geo_area_ids = set()
+    existing_geo_area_id_by_code = {}
+    for geo_area_id, code in GeoArea.objects.filter(
+        admin_level=admin_level,
+    ).order_by('id').values_list('id', 'code'):
+        existing_geo_area_ids.add(geo_area_id)
+        if code:
+            existing_geo_area_id_by_code.setdefault(code, geo_area_id)
+
+    resolve_parent = _get_parent_resolver(admin_level, parent)
+    new_geo_areas = []
+    updated_geo_areas = []
+    for feature, geometry in zip(features, geometries):
+        geo_area = GeoArea(
+            id=existing_geo_area_id_by_code.get(feature['code']) if feature['code'] else None,
+            admin_level=admin_level,
+            title=feature['title'],
+            code=feature['code'],
+            polygons=GEOSGeometry(memoryview(geometry)),
+            parent_id=resolve_parent(feature['parent_name'], feature['parent_code']),
+        )
+        if geo_area.id:
+            updated_geo_areas.append(geo_area)
+        else:
+            new_geo_areas.append(geo_area)
+
+    # -- Write
+    GeoArea.objects.bulk_create(new_geo_areas, batch_size=GEO_AREA_IMPORT_BATCH_SIZE)
+    GeoArea.objects.bulk_update(
+        updated_geo_areas,
+        fields=('title', 'code', 'polygons', 'parent'),
+        batch_size=GEO_AREA_IMPORT_BATCH_SIZE,
+    )
+    # Delete all previous geo areas that have not been added
+    stale_geo_area_ids = existing_geo_area_ids - {geo_area.id for geo_area in updated_geo_areas}
+    if stale_geo_area_ids:
+        GeoArea.objects.filter(id__in=stale_geo_area_ids).delete()
+
+    duration = time.time() - start_time
+    logger.info(
+        f'Geo areas imported for admin level {admin_level.pk}: {len(features)} features in {duration:.2f}s'
+        f' ({len(features) / max(duration, 0.001):.2f} features/sec)'
+    )
+    return len(features)
 
 
 def _generate_geo_areas(admin_level, parent):
@@ -126,30 +199,13 @@ def _generate_geo_areas(admin_level, parent):
 
         # If more than one layer exists, extract from the first layer
         if data_source.layer_count == 1:
-            layer = data_source[0]
-
-            added_areas = []
-            for feature in layer:
-                # Each feature is a geo area
-                geo_area = _save_geo_area(
-                    admin_level, parent,
-                    feature,
-                )
-                added_areas.append(geo_area.id)
-
-            # Delete all previous geo areas that have not been added
-            GeoArea.objects.filter(
-                admin_level=admin_level
-            ).exclude(id__in=added_areas).delete()
+            # Each feature is a geo area
+            _import_geo_areas(admin_level, parent, data_source[0])
 
     admin_level.stale_geo_areas = False
     admin_level.geojson_file = None
     admin_level.bounds_file = None
-    # The following cache calculation is too much memory consuming.
-    # So instead of doing it with lot of other intesive tasks in this
-    # process, leave it to be done for the first time when the
-    # admin level get request is called.
-    # FIXME: Improve memory consumption.
+    # NOTE: GeoJSON is streamed from the database to the storage (See geo.geojson)
     admin_level.calc_cache(save=False)
     admin_level.save()
 
@@ -239,7 +295,7 @@ def cal_region_cache(regions_id):
 @shared_task
 def cal_admin_level_cache(admin_levels_id):
     """
-    NOTE: Only use this from Admin Panel
+    NOTE: Used by Admin Panel and geo.views (When the geojson/bounds files are not available)
     """
     success_admin_levels = []
     for admin_level in AdminLevel.objects.filter(pk__in=admin_levels_id).distinct():
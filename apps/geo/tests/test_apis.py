@@ -1,8 +1,12 @@
 import json
 
+from django.core.cache import cache
+
+from deep.caches import CacheKey
 from deep.tests import TestCase
 from geo.models import Region, AdminLevel, GeoArea
 from project.models import Project
+from project.tasks import get_project_geo_cache_hash
 
 
 class RegionTests(TestCase):
@@ -163,7 +167,7 @@ class GeoOptionsApi(TestCase):
         self.create(AdminLevel, title='AdminLevel2', region=region3, level=1)
         geo_area1_1 = self.create(GeoArea, title='GeoArea1', admin_level=admin_level1_1)
         geo_area1_2 = self.create(GeoArea, title='GeoArea2', admin_level=admin_level1_2, parent=geo_area1_1)
-        self.create(GeoArea, title='GeoArea2', admin_level=admin_level2_1)
+        geo_area2_1 = self.create(GeoArea, title='GeoArea2', admin_level=admin_level2_1)
 
         url = f'/api/v1/geo-options/?project={project.pk}'
 
@@ -171,29 +175,42 @@ class GeoOptionsApi(TestCase):
         response = self.client.get(url, follow=True)
         self.assert_200(response)
         cached_file_url = response.data['geo_options_cached_file']
+        assert response.data['geo_options_cached_file_format'] == 'columnar-v1'
 
         data = json.loads(b''.join(list(self.client.get(cached_file_url).streaming_content)))
+        assert set(data.keys()) == {str(region1.id), str(region2.id)}
+        region1_data = data[str(region1.id)]
+        assert region1_data['ids'] == [geo_area1_1.pk, geo_area2_1.pk]
+        assert region1_data['parents'] == [None, None]
+        assert region1_data['regionTitle'] == region1.title
+        assert [
+            region1_data['adminLevels'][index]['title']
+            for index in region1_data['adminLevelIndexes']
+        ] == [admin_level1_1.title, admin_level2_1.title]
+        assert data[str(region2.id)]['parents'] == [geo_area1_1.pk]
+
+        # Legacy format
+        region2.refresh_from_db()
+        geo_area_options = region2.get_geo_area_options()
         self.assertEqual(
-            data[str(region1.id)][1].get('label'),
-            '{} / {}'.format(admin_level1_1.title, geo_area1_2.title)
+            geo_area_options[0].get('label'),
+            '{} / {}'.format(admin_level1_2.title, geo_area1_2.title)
         )
-
-        # check if parent is present in geo options
-        for _, options in data.items():
-            for option in options:
-                assert 'parent' in option
+        assert geo_area_options[0]['parent'] == geo_area1_1.pk
 
         # URL should be same for future request
         response = self.client.get(url, follow=True)
         self.assert_200(response)
         assert cached_file_url == response.data['geo_options_cached_file']
 
-        # URL should be changed if region data is changed
-        region1.refresh_from_db()
+        # Stale URL is served and re-generated in the background if region data is changed
         region1.cache_index += 1
         region1.save(update_fields=('cache_index',))
         response = self.client.get(url, follow=True)
         self.assert_200(response)
+        assert cached_file_url == response.data['geo_options_cached_file']
+        response = self.client.get(url, follow=True)
+        self.assert_200(response)
         assert cached_file_url != response.data['geo_options_cached_file']
         cached_file_url = response.data['geo_options_cached_file']
 
@@ -210,6 +227,20 @@ class GeoOptionsApi(TestCase):
         self.assert_200(response)
         assert cached_file_url == response.data['geo_options_cached_file']
 
+        # Legacy file is served till the new one is generated in the background
+        Project.objects.filter(pk=project.pk).update(geo_cache_hash=None)
+        cache.delete(CacheKey.PROJECT_GEO_CACHE_SCHEDULED_KEY_FORMAT.format(
+            project.pk, get_project_geo_cache_hash(project),
+        ))
+        response = self.client.get(url, follow=True)
+        self.assert_200(response)
+        assert cached_file_url == response.data['geo_options_cached_file']
+        assert response.data['geo_options_cached_file_format'] == 'legacy'
+        response = self.client.get(url, follow=True)
+        self.assert_200(response)
+        assert cached_file_url != response.data['geo_options_cached_file']
+        assert response.data['geo_options_cached_file_format'] == 'columnar-v1'
+
 
 class TestGeoAreaApi(TestCase):
     def test_geo_area(self):
@@ -0,0 +1,33 @@
+from deep.tests import TestCase
+
+from geo.factories import RegionFactory, AdminLevelFactory, GeoAreaFactory
+from geo.hierarchy import GeoAreaHierarchy
+
+
+class GeoAreaHierarchyTest(TestCase):
+    def test_geo_area_hierarchy(self):
+        region = RegionFactory.create()
+        admin_level0 = AdminLevelFactory.create(region=region, level=0)
+        admin_level1 = AdminLevelFactory.create(region=region, level=1)
+        admin_level2 = AdminLevelFactory.create(region=region, level=2)
+        geo0 = GeoAreaFactory.create(admin_level=admin_level0)
+        geo1_1, geo1_2 = GeoAreaFactory.create_batch(2, admin_level=admin_level1, parent=geo0)
+        geo2_1 = GeoAreaFactory.create(admin_level=admin_level2, parent=geo1_1)
+        geo2_2 = GeoAreaFactory.create(admin_level=admin_level2, parent=geo1_2)
+        other_region_geo = GeoAreaFactory.create(admin_level=AdminLevelFactory.create(level=0))
+
+        hierarchy = GeoAreaHierarchy.get(region)
+        geo_area_ids = [str(geo2_1.pk), geo1_2.pk, other_region_geo.pk, 'invalid-id']
+        ancestors = hierarchy.get_ancestors(geo_area_ids)
+        assert [
+            [hierarchy.titles[index] if index >= 0 else None for index in row]
+            for row in ancestors
+        ] == [
+            [geo0.title, geo1_1.title, geo2_1.title],
+            [geo0.title, geo1_2.title, None],
+            [None, None, None],
+            [None, None, None],
+        ]
+        assert hierarchy.get_titles_at_level(geo_area_ids, level=1) == [geo1_1.title, geo1_2.title]
+        assert set(hierarchy.get_sub_children_ids([geo0.pk], level=2)) == {geo0.pk, geo1_1.pk, geo1_2.pk}
+        assert set(hierarchy.get_sub_children_ids([geo1_2.pk], level=3)) == {geo1_2.pk, geo2_2.pk}
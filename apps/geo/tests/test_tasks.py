@@ -1,14 +1,18 @@
 import re
 import os
 import json
+import math
 import tempfile
+from unittest.mock import patch
+
+from billiard import Pool
 
 from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test.utils import override_settings
 
 from deep.tests import TestCase
-from geo.tasks import load_geo_areas
+from geo.tasks import load_geo_areas, _simplify_geometries
 from geo.models import Region, AdminLevel, GeoArea
 from gallery.models import File
 
@@ -114,6 +118,44 @@ class LoadGeoAreasTaskTest(TestCase):
 
         self.assertIsNotNone(sindhupalchowk)
 
+    @override_settings(GEO_AREA_IMPORT_WORKERS=2)
+    @patch('geo.tasks.GEO_AREA_IMPORT_POOL_CHUNK_SIZE', 2)
+    @patch('geo.tasks.GEO_AREA_IMPORT_POOL_MIN_FEATURES', 1)
+    @patch('geo.tasks.Pool', wraps=Pool)
+    def test_load_areas_with_process_pool(self, pool_mock):
+        self.assertTrue(load_geo_areas(self.region.pk))
+        pool_mock.assert_called_with(processes=2)
+        self.assertTrue(GeoArea.objects.filter(admin_level=self.admin_level0).exists())
+        self.assertTrue(GeoArea.objects.filter(admin_level=self.admin_level1).exists())
+
+        # Same as the simplification without the process pool
+        wkbs = [
+            bytes(polygons.wkb)
+            for polygons in GeoArea.objects.filter(
+                admin_level__region=self.region, polygons__isnull=False,
+            ).values_list('polygons', flat=True)
+        ]
+        pool_mock.reset_mock()
+        pooled_wkbs = _simplify_geometries(wkbs, 0.01)
+        pool_mock.assert_called_once()
+        with override_settings(GEO_AREA_IMPORT_WORKERS=1):
+            self.assertEqual(pooled_wkbs, _simplify_geometries(wkbs, 0.01))
+
+    def test_reload_areas(self):
+        self.assertTrue(load_geo_areas(self.region.pk))
+        geo_areas = dict(GeoArea.objects.filter(admin_level__region=self.region).values_list('id', 'parent_id'))
+        self.assertTrue(len(geo_areas) > 0)
+        # Stale geo area is removed
+        stale_geo_area = GeoArea.objects.create(admin_level=self.admin_level1, title='Stale', code='STALE')
+
+        # Existing geo areas are updated (ids and parents are retained)
+        self.assertTrue(load_geo_areas(self.region.pk))
+        self.assertEqual(
+            dict(GeoArea.objects.filter(admin_level__region=self.region).values_list('id', 'parent_id')),
+            geo_areas,
+        )
+        self.assertFalse(GeoArea.objects.filter(pk=stale_geo_area.pk).exists())
+
     def test_geojson_api(self):
         result = load_geo_areas(self.region.pk)
         self.assertTrue(result)
@@ -131,6 +173,18 @@ class LoadGeoAreasTaskTest(TestCase):
         self.assertIsNotNone(r_data['features'])
         self.assertTrue(len(r_data['features']) > 0)
 
+        # Simplified geojson within the bbox is streamed
+        bounds = GeoArea.objects.filter(admin_level=self.admin_level0).first().polygons.extent
+        response = self.client.get(url, {'bbox': ','.join(str(v) for v in bounds), 'zoom': 5})
+        self.assert_200(response)
+        r_data = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(r_data['type'], 'FeatureCollection')
+        self.assertTrue(0 < len(r_data['features']) <= len(GeoArea.objects.filter(admin_level=self.admin_level0)))
+        # Zoom out of the tile zoom range
+        for zoom in [-1, 10 ** 9]:
+            response = self.client.get(url, {'bbox': ','.join(str(v) for v in bounds), 'zoom': zoom})
+            self.assert_400(response)
+
         # Test if geobounds also works
         url = '/api/v1/admin-levels/{}/geojson/bounds/'.format(
             self.admin_level0.pk
@@ -141,3 +195,25 @@ class LoadGeoAreasTaskTest(TestCase):
 
         r_data = read_json_from_url(response.url)
         self.assertIsNotNone(r_data['bounds'])
+
+    def test_geo_tile_api(self):
+        result = load_geo_areas(self.region.pk)
+        self.assertTrue(result)
+
+        # Tile containing the geo area centroid
+        centroid = GeoArea.objects.filter(admin_level=self.admin_level0).first().polygons.centroid
+        z = 5
+        x = int((centroid.x + 180) / 360 * 2 ** z)
+        lat = math.radians(centroid.y)
+        y = int((1 - math.asinh(math.tan(lat)) / math.pi) / 2 * 2 ** z)
+        url = '/api/v1/admin-levels/{}/tiles/{}/{}/{}.mvt'
+
+        self.authenticate()
+        response = self.client.get(url.format(self.admin_level0.pk, z, x, y))
+        self.assert_200(response)
+        self.assertEqual(response['Content-Type'], 'application/vnd.mapbox-vector-tile')
+        self.assertTrue(len(response.content) > 0)
+
+        # Tile out of the zoom/tile range
+        response = self.client.get(url.format(self.admin_level0.pk, z, 2 ** z, y))
+        self.assert_404(response)
@@ -1,4 +1,6 @@
 from django.shortcuts import redirect, get_object_or_404
+from django.http import HttpResponse, StreamingHttpResponse
+from django.core.cache import cache
 from django.contrib.gis.geos import GEOSGeometry
 from django.contrib.gis.gdal.error import GDALException
 from django.conf import settings
@@ -16,14 +18,28 @@ from rest_framework import (
 from rest_framework.decorators import action
 import django_filters
 
+from deep.caches import CacheKey
 from deep.permissions import (
     ModifyPermission,
     IsProjectMember
 )
 from project.models import Project
-from project.tasks import generate_project_geo_region_cache
+from project.tasks import (
+    PROJECT_GEO_CACHE_FORMAT,
+    PROJECT_GEO_CACHE_LEGACY_FORMAT,
+    generate_missing_project_geo_region_cache,
+    generate_project_geo_cache,
+    get_project_geo_cache_hash,
+)
 
 from .models import Region, AdminLevel, GeoArea
+from .geojson import (
+    GEO_TILE_MAX_ZOOM,
+    get_admin_level_bounds,
+    get_admin_level_tile,
+    parse_bbox,
+    stream_admin_level_geojson,
+)
 from .serializers import (
     AdminLevelSerializer,
     RegionSerializer,
@@ -34,7 +50,7 @@ from .filter_set import (
     AdminLevelFilterSet,
     RegionFilterSet
 )
-from .tasks import load_geo_areas
+from .tasks import load_geo_areas, cal_admin_level_cache
 
 
 class RegionViewSet(viewsets.ModelViewSet):
@@ -165,26 +181,54 @@ class GeoAreasLoadTriggerView(views.APIView):
         })
 
 
+def _get_admin_level_for_user(request, admin_level_id):
+    admin_level = AdminLevel.objects.filter(id=admin_level_id).first()
+    if admin_level is None:
+        raise exceptions.NotFound()
+    if not admin_level.can_get(request.user):
+        raise exceptions.PermissionDenied()
+    return admin_level
+
+
+def _schedule_admin_level_cache(admin_level):
+    # Only once for the concurrent requests
+    if cache.add(CacheKey.GEO_ADMIN_LEVEL_CACHE_SCHEDULED_KEY_FORMAT.format(admin_level.pk), 1, 60 * 10):
+        cal_admin_level_cache.delay([admin_level.pk])
+
+
 class GeoJsonView(views.APIView):
     """
     A view that returns geojson for given admin level
+
+    Optional query params (Features are streamed from the database):
+    - bbox: min_x,min_y,max_x,max_y (Only the geo areas within the bbox)
+    - zoom: Zoom level (Geometries are simplified for the zoom level)
     """
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request, admin_level_id, version=None):
-        # TODO: Use get_object_or_404
+        admin_level = _get_admin_level_for_user(request, admin_level_id)
 
-        if not AdminLevel.objects.filter(id=admin_level_id).exists():
-            raise exceptions.NotFound()
+        bbox = request.GET.get('bbox')
+        zoom = request.GET.get('zoom')
+        try:
+            bbox = parse_bbox(bbox) if bbox else None
+            zoom = int(zoom) if zoom else None
+            if zoom is not None and not 0 <= zoom <= GEO_TILE_MAX_ZOOM:
+                raise ValueError(f'zoom should be between 0 and {GEO_TILE_MAX_ZOOM}')
+        except ValueError as e:
+            raise exceptions.ValidationError(str(e))
 
-        admin_level = AdminLevel.objects.get(id=admin_level_id)
-        if not admin_level.can_get(request.user):
-            raise exceptions.PermissionDenied()
+        if bbox is None and zoom is None and admin_level.geojson_file:
+            return redirect(request.build_absolute_uri(admin_level.geojson_file.url))
 
         if not admin_level.geojson_file:
-            admin_level.calc_cache()
-
-        return redirect(request.build_absolute_uri(admin_level.geojson_file.url))
+            # Generated in the background, stream from the database till then
+            _schedule_admin_level_cache(admin_level)
+        return StreamingHttpResponse(
+            stream_admin_level_geojson(admin_level.pk, bbox=bbox, zoom=zoom),
+            content_type='application/json',
+        )
 
 
 class GeoBoundsView(views.APIView):
@@ -194,17 +238,31 @@ class GeoBoundsView(views.APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request, admin_level_id, version=None):
-        if not AdminLevel.objects.filter(id=admin_level_id).exists():
-            raise exceptions.NotFound()
+        admin_level = _get_admin_level_for_user(request, admin_level_id)
 
-        admin_level = AdminLevel.objects.get(id=admin_level_id)
-        if not admin_level.can_get(request.user):
-            raise exceptions.PermissionDenied()
+        if admin_level.bounds_file:
+            return redirect(request.build_absolute_uri(admin_level.bounds_file.url))
 
-        if not admin_level.bounds_file:
-            admin_level.calc_cache()
+        # Generated in the background, calculate in the database till then
+        _schedule_admin_level_cache(admin_level)
+        return response.Response({'bounds': get_admin_level_bounds(admin_level.pk)})
 
-        return redirect(request.build_absolute_uri(admin_level.bounds_file.url))
+
+class GeoTileView(views.APIView):
+    """
+    A view that returns mapbox vector tile of the given admin level
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, admin_level_id, z, x, y, version=None):
+        admin_level = _get_admin_level_for_user(request, admin_level_id)
+        z, x, y = int(z), int(x), int(y)
+        if z > GEO_TILE_MAX_ZOOM or not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+            raise exceptions.NotFound()
+        return HttpResponse(
+            get_admin_level_tile(admin_level, z, x, y),
+            content_type='application/vnd.mapbox-vector-tile',
+        )
 
 
 class GeoOptionsView(views.APIView):
@@ -215,14 +273,22 @@ class GeoOptionsView(views.APIView):
         if not project.is_member(request.user):
             raise exceptions.PermissionDenied()
 
-        if (
-            project.geo_cache_file.name is None or
-            project.geo_cache_hash is None or
-            project.geo_cache_hash != str(hash(tuple(project.regions.order_by('id').values_list('cache_index', flat=True))))
-        ):
-            generate_project_geo_region_cache(project)
+        if not project.geo_cache_file:
+            # Nothing to serve yet
+            generate_missing_project_geo_region_cache(project)
+        else:
+            geo_cache_hash = get_project_geo_cache_hash(project)
+            if (
+                project.geo_cache_hash != geo_cache_hash and
+                cache.add(CacheKey.PROJECT_GEO_CACHE_SCHEDULED_KEY_FORMAT.format(project.pk, geo_cache_hash), 1, 60 * 10)
+            ):
+                # Stale file is served till the new one is generated in the background
+                generate_project_geo_cache.delay(project.pk)
         return response.Response({
-            'geo_options_cached_file': request.build_absolute_uri(project.geo_cache_file.url)
+            'geo_options_cached_file': request.build_absolute_uri(project.geo_cache_file.url),
+            'geo_options_cached_file_format': (
+                PROJECT_GEO_CACHE_FORMAT if project.geo_cache_hash is not None else PROJECT_GEO_CACHE_LEGACY_FORMAT
+            ),
         })
 
 
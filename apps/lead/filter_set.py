@@ -183,22 +183,8 @@ class LeadFilterSet(django_filters.FilterSet):
         # NOTE: This exists to make it compatible with post filter
         if not value:
             return qs
-        return qs.filter(
-            # By title
-            models.Q(title__icontains=value) |
-            # By source
-            models.Q(source_raw__icontains=value) |
-            models.Q(source__title__icontains=value) |
-            models.Q(source__parent__title__icontains=value) |
-            # By author
-            models.Q(author__title__icontains=value) |
-            models.Q(author__parent__title__icontains=value) |
-            models.Q(author_raw__icontains=value) |
-            models.Q(authors__title__icontains=value) |
-            models.Q(authors__parent__title__icontains=value) |
-            # By URL
-            models.Q(url__icontains=value)
-        ).distinct()
+        # By title, source, author and url
+        return Lead.search(qs, value)
 
     def project_filter(self, qs, name, value):
         # NOTE: @bewakes used this because normal project filter
@@ -363,22 +349,8 @@ class LeadGQFilterSet(UserResourceGqlFilterSet):
         # NOTE: This exists to make it compatible with post filter
         if not value:
             return qs
-        return qs.filter(
-            # By title
-            models.Q(title__icontains=value) |
-            # By source
-            models.Q(source_raw__icontains=value) |
-            models.Q(source__title__icontains=value) |
-            models.Q(source__parent__title__icontains=value) |
-            # By author
-            models.Q(author__title__icontains=value) |
-            models.Q(author__parent__title__icontains=value) |
-            models.Q(author_raw__icontains=value) |
-            models.Q(authors__title__icontains=value) |
-            models.Q(authors__parent__title__icontains=value) |
-            # By URL
-            models.Q(url__icontains=value)
-        ).distinct()
+        # By title, source, author and url
+        return Lead.search(qs, value)
 
     def ordering_filter(self, qs, name, value):
         active_entry_count_field = self.custom_context.get('active_entry_count_field')
@@ -0,0 +1,29 @@
+# Generated by Django 3.2.17 on 2026-10-18 10:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lead', '0054_auto_20231218_0552'),
+    ]
+
+    operations = [
+        # Remove duplicate pairs (if any) before adding the constraint
+        migrations.RunSQL(
+            sql='''
+                DELETE FROM lead_leadduplicates a
+                USING lead_leadduplicates b
+                WHERE
+                    a.id > b.id AND
+                    a.source_lead_id = b.source_lead_id AND
+                    a.target_lead_id = b.target_lead_id
+            ''',
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AddConstraint(
+            model_name='leadduplicates',
+            constraint=models.UniqueConstraint(fields=('source_lead', 'target_lead'), name='unique_lead_duplicate_pair'),
+        ),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 3.2.17 on 2026-10-18 15:40
+
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+from utils.common import batched
+
+
+# NOTE: Same as lead.models.Lead.update_search_text (Copied to not depend on the live app code)
+def populate_lead_search_text(apps, schema_editor):
+    Lead = apps.get_model('lead', 'Lead')
+    lead_table = Lead._meta.db_table
+    lead_author_table = Lead.authors.through._meta.db_table
+    organization_table = apps.get_model('organization', 'Organization')._meta.db_table
+    update_sql = f'''
+        UPDATE {lead_table} AS lead SET
+            search_text = lower(concat_ws(
+                ' ',
+                lead.title,
+                lead.url,
+                lead.source_raw,
+                lead.author_raw,
+                (
+                    SELECT string_agg(concat_ws(' ', organization.title, parent_organization.title), ' ')
+                    FROM {organization_table} AS organization
+                        LEFT JOIN {organization_table} AS parent_organization
+                            ON parent_organization.id = organization.parent_id
+                    WHERE organization.id IN (lead.source_id, lead.author_id)
+                ),
+                (
+                    SELECT string_agg(concat_ws(' ', organization.title, parent_organization.title), ' ')
+                    FROM {lead_author_table} AS lead_author
+                        INNER JOIN {organization_table} AS organization
+                            ON organization.id = lead_author.organization_id
+                        LEFT JOIN {organization_table} AS parent_organization
+                            ON parent_organization.id = organization.parent_id
+                    WHERE lead_author.lead_id = lead.id
+                )
+            ))
+        WHERE lead.id = ANY(%s)
+    '''
+    lead_ids_qs = Lead.objects.order_by('id').values_list('id', flat=True)
+    with schema_editor.connection.cursor() as cursor:
+        for lead_ids in batched(lead_ids_qs.iterator(), batch_size=5000):
+            cursor.execute(update_sql, [lead_ids])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0004_auto_20171129_0851'),  # pg_trgm extension
+        ('organization', '0012_organization_popularity'),
+        ('lead', '0055_leadduplicates_unique_lead_duplicate_pair'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lead',
+            name='search_text',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.RunPython(populate_lead_search_text, reverse_code=migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='lead',
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=['search_text'], name='lead_search_text_trgm', opclasses=['gin_trgm_ops'],
+            ),
+        ),
+        # Used by title__icontains (UPPER(title) LIKE UPPER(...))
+        migrations.RunSQL(
+            sql='CREATE INDEX lead_title_upper_trgm ON lead_lead USING gin ((UPPER(title::text)) gin_trgm_ops)',
+            reverse_sql='DROP INDEX IF EXISTS lead_title_upper_trgm',
+        ),
+    ]
@@ -2,7 +2,11 @@ import uuid as python_uuid
 from django.contrib.contenttypes.fields import GenericRelation
 from django.conf import settings
 from django.contrib.auth.models import User
-from django.db import models, transaction
+from django.contrib.postgres.indexes import GinIndex
+from django.db import connection, models, transaction
+
+from deep.caches import DataVersion
+from utils.common import get_save_update_fields
 
 from project.models import Project
 from project.permissions import PROJECT_PERMISSIONS
@@ -157,6 +161,17 @@ class Lead(UserResource, ProjectEntityMixin):
     indexed_at = models.DateTimeField(null=True, blank=True)
     auto_entry_extraction_status = models.SmallIntegerField(
         choices=AutoExtractionStatus.choices, default=AutoExtractionStatus.NONE)
+    # Lowercase title, url, source and authors (including parent organizations) used for search
+    # NOTE: Managed by Lead.update_search_text
+    search_text = models.TextField(blank=True, editable=False)
+
+    # Fields used to generate search_text
+    SEARCH_TEXT_FIELDS = ('title', 'url', 'source', 'source_raw', 'author', 'author_raw')
+
+    class Meta(UserResource.Meta):
+        indexes = [
+            GinIndex(fields=['search_text'], name='lead_search_text_trgm', opclasses=['gin_trgm_ops']),
+        ]
 
     def __str__(self):
         return '{}'.format(self.title)
@@ -168,8 +183,17 @@ class Lead(UserResource, ProjectEntityMixin):
         super().__init__(*args, **kwargs)
         if self.pk:
             self.__initial = self.get_dict()
+            self.__initial_search_text_data = self.get_search_text_data()
         else:
             self.__initial = None
+            self.__initial_search_text_data = None
+
+    def get_search_text_data(self):
+        # NOTE: Deferred fields are not fetched
+        return tuple(
+            self.__dict__.get(self._meta.get_field(field).attname)
+            for field in self.SEARCH_TEXT_FIELDS
+        )
 
     def get_dict(self):
         return {
@@ -183,9 +207,84 @@ class Lead(UserResource, ProjectEntityMixin):
         if commit:
             self.save(update_fields=('extraction_status',))
 
+    @classmethod
+    def update_search_text(cls, lead_ids):
+        lead_ids = list(lead_ids)
+        if not lead_ids:
+            return
+        organization_table = Organization._meta.db_table
+
+        def _organization_title_sql(join_sql, where_sql):
+            return f'''
+                SELECT string_agg(concat_ws(' ', organization.title, parent_organization.title), ' ')
+                FROM {join_sql}
+                    LEFT JOIN {organization_table} AS parent_organization
+                        ON parent_organization.id = organization.parent_id
+                WHERE {where_sql}
+            '''
+
+        # Source and author
+        organization_sql = _organization_title_sql(
+            f'{organization_table} AS organization',
+            'organization.id IN (lead.source_id, lead.author_id)',
+        )
+        authors_sql = _organization_title_sql(
+            f'''
+                {cls.authors.through._meta.db_table} AS lead_author
+                INNER JOIN {organization_table} AS organization
+                    ON organization.id = lead_author.organization_id
+            ''',
+            'lead_author.lead_id = lead.id',
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'''
+                    UPDATE {cls._meta.db_table} AS lead SET
+                        search_text = lower(concat_ws(
+                            ' ',
+                            lead.title,
+                            lead.url,
+                            lead.source_raw,
+                            lead.author_raw,
+                            ({organization_sql}),
+                            ({authors_sql})
+                        ))
+                    WHERE lead.id = ANY(%s)
+                    RETURNING lead.project_id
+                ''',
+                [lead_ids],
+            )
+            project_ids = [project_id for project_id, in cursor.fetchall()]
+        # Used by the search filter of the cached exports
+        DataVersion.bump_many_on_commit(DataVersion.PROJECT, project_ids)
+
+    @classmethod
+    def search(cls, qs, value):
+        """
+        Filter leads using title, url, source and authors (Uses trigram index of search_text)
+        Results are ranked by similarity if there is no other ordering
+        """
+        from utils.db.functions import TrigramWordSimilarity
+        value = value.lower()
+        qs = qs.filter(search_text__contains=value)
+        if not qs.query.order_by:
+            qs = qs.order_by(TrigramWordSimilarity(value, 'search_text').desc(), '-id')
+        return qs
+
     def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
         update_fields = kwargs.get('update_fields')
+        if update_fields is None and not self._state.adding and not kwargs.get('force_insert'):
+            # Don't overwrite search_text (updated using SQL) with the stale value of this instance
+            kwargs['update_fields'] = get_save_update_fields(self, ['search_text'])
+        super().save(*args, **kwargs)
+        search_text_data = self.get_search_text_data()
+        if (
+            (update_fields is None or any(x in update_fields for x in self.SEARCH_TEXT_FIELDS)) and
+            search_text_data != self.__initial_search_text_data
+        ):
+            # NOTE: authors are updated using m2m_changed (See commons.receivers)
+            Lead.update_search_text([self.pk])
+            self.__initial_search_text_data = search_text_data
         initial_fields = ['text', 'attachment', 'attachment_id', 'url']
 
         if (
@@ -451,3 +550,11 @@ class LeadDuplicates(models.Model):
     # This is to collect feedback from user whether this duplicate pair is
     # valid or not.
     is_valid = models.BooleanField(default=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=('source_lead', 'target_lead'),
+                name='unique_lead_duplicate_pair',
+            ),
+        ]
@@ -6,7 +6,7 @@ from django.db.models import QuerySet
 from graphene_django import DjangoObjectType, DjangoListField
 from graphene_django_extras import DjangoObjectField, PageGraphqlPagination
 
-from utils.graphene.pagination import NoOrderingPageGraphqlPagination
+from utils.graphene.pagination import NoOrderingCursorPageGraphqlPagination, ListCountStrategy
 from utils.graphene.enums import EnumDescription
 from utils.graphene.types import CustomDjangoListObjectType, ClientIdMixin, FileFieldType
 from utils.graphene.fields import DjangoPaginatedListObjectField
@@ -484,6 +484,8 @@ class LeadListType(CustomDjangoListObjectType):
     class Meta:
         model = Lead
         filterset_class = LeadGQFilterSet
+        count_strategy = ListCountStrategy.ESTIMATED
+        with_next_cursor = True
 
 
 class LeadPreviewAttachmentListType(CustomDjangoListObjectType):
@@ -496,7 +498,7 @@ class Query:
     lead = DjangoObjectField(LeadDetailType)
     leads = DjangoPaginatedListObjectField(
         LeadListType,
-        pagination=NoOrderingPageGraphqlPagination(
+        pagination=NoOrderingCursorPageGraphqlPagination(
             page_size_query_param='pageSize',
         )
     )
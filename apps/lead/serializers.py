@@ -200,7 +200,7 @@ class LeadSerializer(
 
     class Meta:
         model = Lead
-        fields = ('__all__')
+        exclude = ('search_text',)
         # Legacy Fields
         read_only_fields = ('author_raw', 'source_raw')
         write_only_on_create_fields = ['emm_triggers', 'emm_entities']
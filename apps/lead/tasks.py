@@ -5,7 +5,7 @@ from celery import shared_task
 from django.db.models import Q
 from django.utils import timezone
 
-from utils.common import redis_lock
+from utils.common import redis_lock, batched
 from deepl_integration.handlers import LeadExtractionHandler
 
 from .models import Lead
@@ -69,3 +69,20 @@ def remaining_lead_extract():
         logger.info(f'[Lead Extraction] {status.label}: {count}')
         for lead_id in queryset.values_list('id', flat=True)[:PROCCESS_LEADS_PER_STATUS]:
             extract_from_lead(lead_id)
+
+
+@shared_task
+def update_organization_leads_search_text(organization_id):
+    """
+    Update search_text of the leads using the organization (directly or as parent organization)
+    """
+    lead_ids_qs = Lead.objects.filter(
+        Q(source=organization_id) |
+        Q(source__parent=organization_id) |
+        Q(author=organization_id) |
+        Q(author__parent=organization_id) |
+        Q(authors=organization_id) |
+        Q(authors__parent=organization_id)
+    ).order_by('id').values_list('id', flat=True).distinct()
+    for lead_ids in batched(lead_ids_qs.iterator(), batch_size=1000):
+        Lead.update_search_text(lead_ids)
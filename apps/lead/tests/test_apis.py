@@ -2,7 +2,9 @@ import logging
 from datetime import date
 import uuid
 
+from django.db import connection
 from django.db.models import Q
+from django.test.utils import CaptureQueriesContext
 from django.core.files.uploadedfile import SimpleUploadedFile
 
 from rest_framework.exceptions import ErrorDetail
@@ -1257,6 +1259,59 @@ class LeadTests(TestCase):
         obtained_ids = {x['id'] for x in resp.data['results']}
         assert expected_ids == obtained_ids
 
+    def test_lead_filter_search_after_organization_change(self):
+        project = self.create_project()
+        parent = self.create(Organization, title='parentorg')
+        author = self.create(Organization, title='blablaone')
+        lead = self.create(Lead, project=project)
+        lead.authors.set([author])
+
+        url = '/api/v1/leads/filter/'
+        self.authenticate()
+
+        def _search(value):
+            resp = self.client.post(url, {'search': value})
+            self.assert_200(resp)
+            return {x['id'] for x in resp.data['results']}
+
+        assert _search('BlaBlaOne') == {lead.id}
+        with self.captureOnCommitCallbacks(execute=True):
+            author.title = 'blablathree'
+            author.parent = parent
+            author.save()
+        assert _search('blablaone') == set()
+        assert _search('blablathree') == {lead.id}
+        assert _search('parentorg') == {lead.id}
+
+        lead.authors.clear()
+        assert _search('blablathree') == set()
+
+    def test_lead_save_updates_search_text_on_change(self):
+        project = self.create_project()
+        lead = self.create(Lead, project=project, title='blablaone')
+        lead = Lead.objects.get(pk=lead.pk)
+
+        def _search_text_updated():
+            with CaptureQueriesContext(connection) as queries:
+                lead.save()
+            return any('concat_ws' in query['sql'] for query in queries.captured_queries)
+
+        # Unchanged search fields
+        lead.status = Lead.Status.TAGGED
+        assert _search_text_updated() is False
+        lead.title = 'blablatwo'
+        assert _search_text_updated() is True
+        lead.refresh_from_db()
+        assert 'blablatwo' in lead.search_text
+
+        # Save of a stale instance doesn't overwrite the search_text (updated using SQL on authors change)
+        stale_lead = Lead.objects.get(pk=lead.pk)
+        lead.authors.add(self.create(Organization, title='blablaauthor'))
+        stale_lead.status = Lead.Status.IN_PROGRESS
+        stale_lead.save()
+        lead.refresh_from_db()
+        assert 'blablaauthor' in lead.search_text
+
     def test_lead_filter_emm_entities(self):
         url = '/api/v1/leads/?emm_entities={}'
         project = self.create_project()
@@ -1,4 +1,9 @@
 import json
+from datetime import timedelta
+
+from django.db import connection
+from django.utils import timezone
+from django.test.utils import CaptureQueriesContext
 
 from djangorestframework_camel_case.render import CamelCaseJSONRenderer
 from utils.graphene.tests import GraphQLTestCase
@@ -351,6 +356,88 @@ class TestLeadQuerySchema(GraphQLTestCase):
         self.assertEqual(content['data']['project']['leads']['totalCount'], 11, content)
         self.assertListIds(content['data']['project']['leads']['results'], confidential_leads + normal_leads, content)
 
+    def test_leads_cursor_query(self):
+        query = '''
+            query MyQuery ($id: ID!, $pageSize: Int, $cursor: String, $ordering: [LeadOrderingEnum!]) {
+              project(id: $id) {
+                leads(pageSize: $pageSize, cursor: $cursor, ordering: $ordering) {
+                  nextCursor
+                  results {
+                    id
+                  }
+                }
+              }
+            }
+        '''
+
+        project = ProjectFactory.create()
+        member_user = UserFactory.create()
+        project.add_member(member_user, role=self.project_role_reader)
+        leads = LeadFactory.create_batch(7, project=project)
+        # Same priority for a few leads to check the tie breaker
+        Lead.objects.filter(pk__in=[lead.pk for lead in leads[:4]]).update(priority=Lead.Priority.HIGH)
+
+        def _query_check(**variables):
+            return self.query_check(
+                query,
+                variables={'id': project.id, 'pageSize': 3, **variables},
+            )['data']['project']['leads']
+
+        self.force_login(member_user)
+        for ordering in [None, ['ASC_PRIORITY'], ['DESC_PRIORITY']]:
+            # Using cursor from the first page (page pagination)
+            content = _query_check(ordering=ordering)
+            fetched_lead_ids = [item['id'] for item in content['results']]
+            while content['nextCursor']:
+                content = _query_check(ordering=ordering, cursor=content['nextCursor'])
+                fetched_lead_ids.extend([item['id'] for item in content['results']])
+            self.assertEqual(len(fetched_lead_ids), 7, ordering)
+            self.assertEqual(set(fetched_lead_ids), {str(lead.pk) for lead in leads}, ordering)
+
+        # Neither page pagination nor cursor pagination should count the rows if totalCount isn't requested
+        with CaptureQueriesContext(connection) as queries:
+            content = _query_check()
+            _query_check(cursor=content['nextCursor'])
+        self.assertFalse(
+            [query['sql'] for query in queries.captured_queries if '"__count"' in query['sql']],
+        )
+
+        # Invalid cursor
+        self.query_check(query, variables={'id': project.id, 'cursor': 'invalid-cursor'}, assert_for_error=True)
+
+    def test_leads_cursor_query_same_millisecond(self):
+        query = '''
+            query MyQuery ($id: ID!, $cursor: String) {
+              project(id: $id) {
+                leads(pageSize: 2, cursor: $cursor) {
+                  nextCursor
+                  results {
+                    id
+                  }
+                }
+              }
+            }
+        '''
+
+        project = ProjectFactory.create()
+        member_user = UserFactory.create()
+        project.add_member(member_user, role=self.project_role_reader)
+        leads = LeadFactory.create_batch(4, project=project)
+        # Default ordering: -created_at, -pk. The first page ends between two leads created in the same millisecond
+        created_at = timezone.now().replace(microsecond=123000)
+        for lead, microseconds in zip(leads, [1000000, 900, 500, -1000000]):
+            Lead.objects.filter(pk=lead.pk).update(created_at=created_at + timedelta(microseconds=microseconds))
+
+        self.force_login(member_user)
+        content = self.query_check(query, variables={'id': project.id})['data']['project']['leads']
+        fetched_lead_ids = [item['id'] for item in content['results']]
+        content = self.query_check(
+            query,
+            variables={'id': project.id, 'cursor': content['nextCursor']},
+        )['data']['project']['leads']
+        fetched_lead_ids.extend([item['id'] for item in content['results']])
+        self.assertEqual(fetched_lead_ids, [str(lead.pk) for lead in leads])
+
     def test_lead_query_with_duplicates_true(self):
         query = '''
             query MyQuery ($projectId: ID!) {
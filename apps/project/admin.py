@@ -50,7 +50,7 @@ def trigger_project_viz_stat_calc(generator):
 
 def trigger_project_stat_cache_calc():
     def action(modeladmin, request, queryset):
-        generate_project_stats_cache.delay(force=True)
+        generate_project_stats_cache.delay(force=True, all_projects=True)
         messages.add_message(
             request, messages.INFO,
             mark_safe(
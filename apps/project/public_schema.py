@@ -8,7 +8,6 @@ from django.db import models
 
 from utils.graphene.types import CustomDjangoListObjectType
 
-from deep.serializers import URLCachedFileField
 
 from .models import Project
 from .filter_set import PublicProjectGqlFilterSet
@@ -37,9 +36,9 @@ class PublicProjectType(DjangoObjectType):
     @staticmethod
     def resolve_analysis_framework_preview_image(root, info, **kwargs):
         if root.preview_image:
-            return info.context.request.build_absolute_uri(
-                URLCachedFileField.name_to_representation(root.preview_image)
-            )
+            return info.context.dl.file_url.load(
+                str(root.preview_image)
+            ).then(info.context.request.build_absolute_uri)
         return None
 
 
@@ -1,12 +1,27 @@
 from django.db import models
 from django.dispatch import receiver
 
+from deep.caches import DataVersion
 from user.models import User
+from lead.models import Lead
+from entry.models import Entry, Attribute, EntryGroupLabel
+from analysis_framework.models import AnalysisFramework, Section, Widget, Exportable
+from assessment_registry.models import (
+    AssessmentRegistry,
+    AssessmentRegistryOrganization,
+    MethodologyAttribute,
+    ScoreRating,
+    ScoreAnalyticalDensity,
+)
+from geo.models import Region, AdminLevel
+from organization.models import Organization
 from project.models import (
+    Project,
     ProjectMembership,
     ProjectUserGroupMembership,
     ProjectJoinRequest,
 )
+from project.stats import ProjectStatsCounter
 
 
 @receiver(models.signals.post_save, sender=ProjectUserGroupMembership)
@@ -62,3 +77,229 @@ def on_membership_saved(sender, **kwargs):
         responded_by=instance.added_by,
         responded_at=instance.joined_at,
     )
+
+
+# -- Data version (Used by caches which depend on the project/framework data. eg: Export cache)
+def _bump_project_data_version(sender, instance, **kwargs):
+    if sender == Project:
+        project_id = instance.pk
+    elif sender in [Attribute, EntryGroupLabel]:
+        if sender.entry.is_cached(instance):
+            project_id = instance.entry.project_id
+        else:
+            # NOTE: Entry can be already deleted (cascade), which bumps the version itself
+            project_id = Entry.objects.filter(pk=instance.entry_id).values_list('project_id', flat=True).first()
+    elif sender in ASSESSMENT_REGISTRY_CHILD_MODELS:
+        # NOTE: Assessment can be already deleted (cascade), which bumps the version itself
+        project_id = AssessmentRegistry.objects.filter(
+            pk=instance.assessment_registry_id,
+        ).values_list('project_id', flat=True).first()
+    else:
+        project_id = instance.project_id
+    DataVersion.bump_on_commit(DataVersion.PROJECT, project_id)
+
+
+def _bump_analysis_framework_data_version(sender, instance, **kwargs):
+    if sender == AnalysisFramework:
+        analysis_framework_id = instance.pk
+    else:
+        analysis_framework_id = instance.analysis_framework_id
+    DataVersion.bump_on_commit(DataVersion.ANALYSIS_FRAMEWORK, analysis_framework_id)
+
+
+def _bump_region_data_version(sender, instance, **kwargs):
+    if sender == Region:
+        region_id = instance.pk
+    else:
+        region_id = instance.region_id
+    DataVersion.bump_on_commit(DataVersion.REGION, region_id)
+
+
+# Used by the assessment dashboard
+ASSESSMENT_REGISTRY_CHILD_MODELS = [
+    AssessmentRegistryOrganization,
+    MethodologyAttribute,
+    ScoreRating,
+    ScoreAnalyticalDensity,
+]
+
+for _model in [
+    Project, ProjectMembership, Lead, Entry, Attribute, EntryGroupLabel,
+    AssessmentRegistry, *ASSESSMENT_REGISTRY_CHILD_MODELS,
+]:
+    models.signals.post_save.connect(_bump_project_data_version, sender=_model)
+    models.signals.post_delete.connect(_bump_project_data_version, sender=_model)
+
+
+@receiver(models.signals.m2m_changed, sender=Entry.verified_by.through)
+def entry_verified_by_data_version(sender, instance, action, reverse, pk_set=None, **kwargs):
+    if action not in ['post_add', 'post_remove', 'post_clear']:
+        return
+    if not reverse:
+        DataVersion.bump_on_commit(DataVersion.PROJECT, instance.project_id)
+        return
+    # User's verifications are changed
+    entry_qs = Entry.objects.filter(pk__in=pk_set) if pk_set else Entry.objects.none()
+    for project_id in entry_qs.values_list('project_id', flat=True).distinct():
+        DataVersion.bump_on_commit(DataVersion.PROJECT, project_id)
+
+
+@receiver(models.signals.m2m_changed, sender=Project.regions.through)
+def project_regions_data_version(sender, instance, action, reverse, pk_set=None, **kwargs):
+    if action not in ['post_add', 'post_remove', 'post_clear']:
+        return
+    if not reverse:
+        DataVersion.bump_on_commit(DataVersion.PROJECT, instance.pk)
+        return
+    # Region's projects are changed
+    for project_id in (pk_set or []):
+        DataVersion.bump_on_commit(DataVersion.PROJECT, project_id)
+
+
+# Organization fields used by the leads (authors/source) in exports and lists
+ORGANIZATION_DATA_VERSION_FIELDS = ('title', 'short_name', 'long_name', 'parent', 'organization_type')
+
+
+def _get_organization_project_ids(organization_id):
+    # Leads show the parent organization too
+    organization_ids = models.Q(pk=organization_id) | models.Q(parent=organization_id)
+    organization_qs = Organization.objects.filter(organization_ids).values('id')
+    return set(
+        Lead.objects.filter(
+            models.Q(source__in=organization_qs) | models.Q(authors__in=organization_qs)
+        ).order_by().values_list('project_id', flat=True).distinct()
+    )
+
+
+@receiver(models.signals.pre_save, sender=Organization)
+def organization_data_version_pre_save(sender, instance, update_fields=None, **kwargs):
+    instance._data_version_changed = False
+    if instance.pk is None or (
+        update_fields is not None and not set(ORGANIZATION_DATA_VERSION_FIELDS) & set(update_fields)
+    ):
+        return
+    instance._data_version_changed = not Organization.objects.filter(
+        pk=instance.pk,
+        title=instance.title,
+        short_name=instance.short_name,
+        long_name=instance.long_name,
+        parent=instance.parent_id,
+        organization_type=instance.organization_type_id,
+    ).exists()
+
+
+@receiver(models.signals.post_save, sender=Organization)
+def organization_data_version_post_save(sender, instance, **kwargs):
+    if getattr(instance, '_data_version_changed', False):
+        for project_id in _get_organization_project_ids(instance.pk):
+            DataVersion.bump_on_commit(DataVersion.PROJECT, project_id)
+
+
+@receiver(models.signals.pre_delete, sender=Organization)
+def organization_data_version_pre_delete(sender, instance, **kwargs):
+    # NOTE: Leads are updated (SET_NULL/m2m) after this
+    for project_id in _get_organization_project_ids(instance.pk):
+        DataVersion.bump_on_commit(DataVersion.PROJECT, project_id)
+
+
+for _model in [AnalysisFramework, Section, Widget, Exportable]:
+    models.signals.post_save.connect(_bump_analysis_framework_data_version, sender=_model)
+    models.signals.post_delete.connect(_bump_analysis_framework_data_version, sender=_model)
+
+# NOTE: GeoArea changes are followed by Region.calc_cache, which saves the region
+for _model in [Region, AdminLevel]:
+    models.signals.post_save.connect(_bump_region_data_version, sender=_model)
+    models.signals.post_delete.connect(_bump_region_data_version, sender=_model)
+
+
+# -- Project stats_cache counters (See project.stats.ProjectStatsCounter)
+@receiver(models.signals.pre_save, sender=Lead)
+def lead_stats_pre_save(sender, instance, update_fields=None, **kwargs):
+    instance._stats_previous_state = None
+    if instance._state.adding or (update_fields is not None and not {'project', 'status'} & set(update_fields)):
+        return
+    instance._stats_previous_state = Lead.objects.filter(pk=instance.pk).values_list('project_id', 'status').first()
+
+
+@receiver(models.signals.post_save, sender=Lead)
+def lead_stats_post_save(sender, instance, created, **kwargs):
+    previous_state = None if created else getattr(instance, '_stats_previous_state', None)
+    current_state = (instance.project_id, instance.status)
+    if not created and previous_state in [None, current_state]:
+        return
+    if previous_state is not None:
+        ProjectStatsCounter.add_on_commit(previous_state[0], ProjectStatsCounter.get_lead_counters(previous_state[1]), -1)
+    ProjectStatsCounter.add_on_commit(instance.project_id, ProjectStatsCounter.get_lead_counters(instance.status), 1)
+
+
+@receiver(models.signals.post_delete, sender=Lead)
+def lead_stats_post_delete(sender, instance, **kwargs):
+    ProjectStatsCounter.add_on_commit(instance.project_id, ProjectStatsCounter.get_lead_counters(instance.status), -1)
+
+
+@receiver(models.signals.pre_save, sender=Entry)
+def entry_stats_pre_save(sender, instance, update_fields=None, **kwargs):
+    instance._stats_previous_state = None
+    if instance._state.adding or (
+        update_fields is not None and not {'project', 'analysis_framework', 'controlled'} & set(update_fields)
+    ):
+        return
+    instance._stats_previous_state = Entry.objects.filter(pk=instance.pk).values_list(
+        'project_id', 'analysis_framework_id', 'controlled',
+    ).first()
+
+
+@receiver(models.signals.post_save, sender=Entry)
+def entry_stats_post_save(sender, instance, created, **kwargs):
+    previous_state = None if created else getattr(instance, '_stats_previous_state', None)
+    current_state = (instance.project_id, instance.analysis_framework_id, bool(instance.controlled))
+    if not created and previous_state is not None:
+        previous_state = (*previous_state[:2], bool(previous_state[2]))
+    if not created and previous_state in [None, current_state]:
+        return
+    if previous_state is not None:
+        project_id, analysis_framework_id, controlled = previous_state
+        ProjectStatsCounter.add_on_commit(
+            project_id, ProjectStatsCounter.get_entry_counters(controlled), -1,
+            analysis_framework_id=analysis_framework_id,
+        )
+    ProjectStatsCounter.add_on_commit(
+        instance.project_id, ProjectStatsCounter.get_entry_counters(instance.controlled), 1,
+        analysis_framework_id=instance.analysis_framework_id,
+    )
+
+
+@receiver(models.signals.post_delete, sender=Entry)
+def entry_stats_post_delete(sender, instance, **kwargs):
+    ProjectStatsCounter.add_on_commit(
+        instance.project_id, ProjectStatsCounter.get_entry_counters(instance.controlled), -1,
+        analysis_framework_id=instance.analysis_framework_id,
+    )
+
+
+@receiver(models.signals.m2m_changed, sender=Entry.verified_by.through)
+def entry_verified_by_stats(sender, instance, action, reverse, **kwargs):
+    # Verified count is recalculated for the active projects
+    if action in ['post_add', 'post_remove', 'post_clear'] and not reverse:
+        ProjectStatsCounter.add_on_commit(instance.project_id)
+
+
+@receiver(models.signals.post_save, sender=ProjectMembership)
+def membership_stats_post_save(sender, instance, created, **kwargs):
+    if created:
+        ProjectStatsCounter.add_on_commit(instance.project_id, [ProjectStatsCounter.NUMBER_OF_USERS], 1)
+
+
+@receiver(models.signals.post_delete, sender=ProjectMembership)
+def membership_stats_post_delete(sender, instance, **kwargs):
+    ProjectStatsCounter.add_on_commit(instance.project_id, [ProjectStatsCounter.NUMBER_OF_USERS], -1)
+
+
+@receiver(models.signals.pre_save, sender=Project)
+def project_stats_pre_save(sender, instance, update_fields=None, **kwargs):
+    if instance._state.adding or (update_fields is not None and 'analysis_framework' not in update_fields):
+        return
+    previous_af_id = Project.objects.filter(pk=instance.pk).values_list('analysis_framework_id', flat=True).first()
+    if previous_af_id != instance.analysis_framework_id:
+        # Entries counters depend on the project's AF
+        ProjectStatsCounter.mark_stale_on_commit(instance.pk)
@@ -0,0 +1,166 @@
+import logging
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from django.db import transaction
+from redis_store import redis
+
+logger = logging.getLogger(__name__)
+
+# (counter, analysis_framework_id, delta)
+CounterDelta = Tuple[str, Optional[int], int]
+
+
+class ProjectStatsCounter:
+    """
+    Redis buffered changes for Project.stats_cache, flushed in bulk by project.tasks.flush_project_stats_cache
+
+    - Counter deltas: Emitted by the lead/entry/membership changes (See project.receivers)
+        Entry deltas are tagged with the entry's AF, which are only applied if it's same as the project's AF
+    - Active projects: Projects with any activity, derived stats (activities, verified, ...) are recalculated for these
+    - Stale projects: Projects which needs full recalculation (eg: Analysis framework change)
+    - Reconcile projects: Projects with any activity since their last full recalculation, used by the daily
+        reconciliation (See project.tasks.generate_project_stats_cache) to correct the drift of the deltas
+    """
+    DELTAS_KEY_FORMAT = 'project-stats-cache-deltas-{}'  # Hash: {<counter>:<af_id>: delta}
+    ACTIVE_PROJECTS_KEY = 'project-stats-cache-active-projects'
+    STALE_PROJECTS_KEY = 'project-stats-cache-stale-projects'
+    RECONCILE_PROJECTS_KEY = 'project-stats-cache-reconcile-projects'
+    # Last project id of the reconciliation rolling sweep
+    SWEEP_CURSOR_KEY = 'project-stats-cache-sweep-cursor'
+
+    # Counters maintained using deltas
+    NUMBER_OF_USERS = 'number_of_users'
+    NUMBER_OF_LEADS = 'number_of_leads'
+    NUMBER_OF_LEADS_NOT_TAGGED = 'number_of_leads_not_tagged'
+    NUMBER_OF_LEADS_IN_PROGRESS = 'number_of_leads_in_progress'
+    NUMBER_OF_LEADS_TAGGED = 'number_of_leads_tagged'
+    NUMBER_OF_ENTRIES = 'number_of_entries'
+    NUMBER_OF_ENTRIES_CONTROLLED = 'number_of_entries_controlled'
+
+    COUNTERS = [
+        NUMBER_OF_USERS,
+        NUMBER_OF_LEADS,
+        NUMBER_OF_LEADS_NOT_TAGGED,
+        NUMBER_OF_LEADS_IN_PROGRESS,
+        NUMBER_OF_LEADS_TAGGED,
+        NUMBER_OF_ENTRIES,
+        NUMBER_OF_ENTRIES_CONTROLLED,
+    ]
+
+    @staticmethod
+    def get_lead_counters(status) -> List[str]:
+        # XXX: Circular dependency
+        from lead.models import Lead
+        status_counter = {
+            Lead.Status.NOT_TAGGED: ProjectStatsCounter.NUMBER_OF_LEADS_NOT_TAGGED,
+            Lead.Status.IN_PROGRESS: ProjectStatsCounter.NUMBER_OF_LEADS_IN_PROGRESS,
+            Lead.Status.TAGGED: ProjectStatsCounter.NUMBER_OF_LEADS_TAGGED,
+        }.get(status)
+        return [
+            ProjectStatsCounter.NUMBER_OF_LEADS,
+            *([status_counter] if status_counter else []),
+        ]
+
+    @staticmethod
+    def get_entry_counters(controlled) -> List[str]:
+        return [
+            ProjectStatsCounter.NUMBER_OF_ENTRIES,
+            *([ProjectStatsCounter.NUMBER_OF_ENTRIES_CONTROLLED] if controlled else []),
+        ]
+
+    @classmethod
+    def _add(cls, project_id, counters, delta, analysis_framework_id, stale):
+        try:
+            pipe = redis.get_connection().pipeline()
+            for counter in counters:
+                pipe.hincrby(cls.DELTAS_KEY_FORMAT.format(project_id), f'{counter}:{analysis_framework_id or ""}', delta)
+            pipe.sadd(cls.ACTIVE_PROJECTS_KEY, project_id)
+            pipe.sadd(cls.RECONCILE_PROJECTS_KEY, project_id)
+            if stale:
+                pipe.sadd(cls.STALE_PROJECTS_KEY, project_id)
+            pipe.execute()
+        except Exception:
+            # NOTE: Drift is corrected by project.tasks.generate_project_stats_cache
+            logger.warning('Failed to buffer project stats changes', exc_info=True)
+
+    @classmethod
+    def add_on_commit(cls, project_id, counters: Iterable[str] = (), delta=1, analysis_framework_id=None):
+        """
+        Add delta to the counters, project is marked as active even without counters
+        eg: ProjectStatsCounter.add_on_commit(project_id, ProjectStatsCounter.get_lead_counters(status), -1)
+        """
+        if project_id is None:
+            return
+        counters = list(counters)
+        transaction.on_commit(lambda: cls._add(project_id, counters, delta, analysis_framework_id, False))
+
+    @classmethod
+    def mark_stale_on_commit(cls, project_id):
+        if project_id is None:
+            return
+        transaction.on_commit(lambda: cls._add(project_id, [], 0, None, True))
+
+    @classmethod
+    def pop(cls) -> Tuple[Set[int], Set[int], Dict[int, List[CounterDelta]]]:
+        """
+        Returns active project ids, stale project ids and counter deltas, buffer is cleared
+        """
+        client = redis.get_connection()
+        pipe = client.pipeline(transaction=True)
+        pipe.smembers(cls.ACTIVE_PROJECTS_KEY)
+        pipe.smembers(cls.STALE_PROJECTS_KEY)
+        pipe.delete(cls.ACTIVE_PROJECTS_KEY, cls.STALE_PROJECTS_KEY)
+        raw_active_project_ids, raw_stale_project_ids, _ = pipe.execute()
+        active_project_ids = {int(project_id) for project_id in raw_active_project_ids}
+        stale_project_ids = {int(project_id) for project_id in raw_stale_project_ids}
+
+        # NOTE: Changes after this are flagged as active again and picked by the next flush
+        pipe = client.pipeline(transaction=True)
+        project_ids = sorted(active_project_ids)
+        for project_id in project_ids:
+            pipe.hgetall(cls.DELTAS_KEY_FORMAT.format(project_id))
+        if project_ids:
+            pipe.delete(*[cls.DELTAS_KEY_FORMAT.format(project_id) for project_id in project_ids])
+        deltas = defaultdict(list)
+        for project_id, raw_deltas in zip(project_ids, pipe.execute()):
+            for key, delta in raw_deltas.items():
+                counter, analysis_framework_id = key.decode().split(':', 1)
+                deltas[project_id].append(
+                    (counter, int(analysis_framework_id) if analysis_framework_id else None, int(delta))
+                )
+        return active_project_ids, stale_project_ids, dict(deltas)
+
+    @classmethod
+    def clear(cls, project_ids: Iterable[int]):
+        """
+        Clear buffered changes of the projects (Used before full recalculation)
+        NOTE: Clear before counting, changes committed after this are buffered again and applied by the next flush
+        """
+        project_ids = list(project_ids)
+        if not project_ids:
+            return
+        pipe = redis.get_connection().pipeline(transaction=True)
+        pipe.delete(*[cls.DELTAS_KEY_FORMAT.format(project_id) for project_id in project_ids])
+        pipe.srem(cls.ACTIVE_PROJECTS_KEY, *project_ids)
+        pipe.srem(cls.STALE_PROJECTS_KEY, *project_ids)
+        pipe.srem(cls.RECONCILE_PROJECTS_KEY, *project_ids)
+        pipe.execute()
+
+    @classmethod
+    def get_reconcile_project_ids(cls) -> Set[int]:
+        """
+        Projects with activity since their last full recalculation (Removed from the set by clear)
+        """
+        return {
+            int(project_id)
+            for project_id in redis.get_connection().smembers(cls.RECONCILE_PROJECTS_KEY)
+        }
+
+    @classmethod
+    def get_sweep_cursor(cls) -> int:
+        return int(redis.get_connection().get(cls.SWEEP_CURSOR_KEY) or 0)
+
+    @classmethod
+    def set_sweep_cursor(cls, project_id: int):
+        redis.get_connection().set(cls.SWEEP_CURSOR_KEY, project_id)
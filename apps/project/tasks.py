@@ -1,15 +1,24 @@
+import json
 import logging
 from collections import defaultdict
 from datetime import timedelta
+from typing import Dict
 
 from celery import shared_task
+from graphene.utils.str_converters import to_camel_case
+from django.core.cache import cache
 from django.core.files.base import ContentFile
+from django.core.serializers.json import DjangoJSONEncoder
 from django.utils import timezone
-from django.db import models
+from django.db import connection, models
+from django.db.models.fields.json import KeyTransform
+from django.db.models.functions import Cast, JSONObject
+from psycopg2.extras import execute_values
 from redis_store import redis
-from djangorestframework_camel_case.render import CamelCaseJSONRenderer
 from django.conf import settings
 
+from deep.caches import CacheKey, CacheHelper, DataVersion
+from utils.common import batched
 from utils.files import generate_json_file_for_upload
 from ary.stats import get_project_ary_entry_stats
 from lead.models import Lead
@@ -23,12 +32,28 @@ from .models import (
     ProjectStats,
     ProjectMembership,
 )
+from .stats import ProjectStatsCounter
 
 logger = logging.getLogger(__name__)
 
 VIZ_STATS_WAIT_LOCK_KEY = 'generate_project_viz_stats__wait_lock__{0}'
-STATS_WAIT_LOCK_KEY = 'generate_project_stats__wait_lock'
+# NOTE: Shared by the flush and the reconciliation, else the flush can add deltas already counted by the reconciliation
+STATS_CACHE_LOCK_KEY = 'project_stats_cache__lock'
+STATS_CACHE_LOCK_TIMEOUT = 60 * 60
+# Time the reconciliation waits for a running flush
+STATS_CACHE_LOCK_WAIT_TIMEOUT = 60 * 5
 STATS_WAIT_TIMEOUT = ProjectStats.THRESHOLD_SECONDS
+STATS_CACHE_BATCH_SIZE = 500
+# Number of projects recalculated per daily reconciliation by the rolling sweep
+STATS_CACHE_SWEEP_SIZE = 1000
+GEO_CACHE_LOCK_KEY = 'generate_project_geo_cache__lock__{0}'
+GEO_CACHE_LOCK_TIMEOUT = 60 * 10
+# Format of the project geo cache file: {<region_id>: {region, regionTitle, adminLevels, ids, titles, ...}}
+# NOTE: Change this if the format is changed (Sent with the file url, See geo.views.GeoOptionsView)
+PROJECT_GEO_CACHE_FORMAT = 'columnar-v1'
+# Files generated before the format was added (geo_cache_hash is reset by geo 0044 migration)
+PROJECT_GEO_CACHE_LEGACY_FORMAT = 'legacy'
+GEO_OPTIONS_KEYS = ('region', 'region_title', 'admin_levels', 'ids', 'titles', 'parents', 'admin_level_indexes')
 
 
 def _generate_project_viz_stats(project_id):
@@ -55,24 +80,41 @@ def _generate_project_viz_stats(project_id):
         project_stats.save()
 
 
-def get_project_stats(project, info, filters):
+def _get_project_stats(project, info, filters):
     # XXX: Circular dependency
     from lead.schema import get_lead_qs
     from entry.schema import get_entry_qs
 
-    def _count_by_project(qs):
-        return qs\
-            .filter(project=project)\
-            .order_by().values('project')\
-            .aggregate(count=models.Count('id', distinct=True))['count']
-
     if info.context.active_project:
         lead_qs = get_lead_qs(info)
         entry_qs = get_entry_qs(info)
     else:
         lead_qs = Lead.objects.filter(project=project)
         entry_qs = Entry.objects.filter(project=project, analysis_framework=project.analysis_framework_id)
-    filters_counts = {}
+    lead_qs = lead_qs.filter(project=project).order_by()
+    entry_qs = entry_qs.filter(project=project).order_by()
+
+    lead_status_filters = dict(
+        number_of_leads=models.Q(),
+        number_of_leads_not_tagged=models.Q(status=Lead.Status.NOT_TAGGED),
+        number_of_leads_in_progress=models.Q(status=Lead.Status.IN_PROGRESS),
+        number_of_leads_tagged=models.Q(status=Lead.Status.TAGGED),
+    )
+    entry_filters = dict(
+        number_of_entries=models.Q(),
+        number_of_entries_verified=models.Q(
+            models.Exists(Entry.verified_by.through.objects.filter(entry=models.OuterRef('pk')))
+        ),
+        number_of_entries_controlled=models.Q(controlled=True),
+    )
+    lead_aggregates = {
+        key: models.Count('id', filter=_filter)
+        for key, _filter in lead_status_filters.items()
+    }
+    entry_aggregates = {
+        key: models.Count('id', filter=_filter)
+        for key, _filter in entry_filters.items()
+    }
     if filters:
         entry_filter_data = filters.get('entries_filter_data') or {}
         filtered_lead_qs = LeadGQFilterSet(request=info.context.request, queryset=lead_qs, data=filters).qs
@@ -81,36 +123,71 @@ def get_project_stats(project, info, filters):
             queryset=entry_qs.filter(lead__in=filtered_lead_qs),
             data=entry_filter_data,
         ).qs
-        filters_counts = dict(
-            filtered_number_of_leads=_count_by_project(filtered_lead_qs),
-            filtered_number_of_leads_not_tagged=_count_by_project(filtered_lead_qs.filter(status=Lead.Status.NOT_TAGGED)),
-            filtered_number_of_leads_in_progress=_count_by_project(filtered_lead_qs.filter(status=Lead.Status.IN_PROGRESS)),
-            filtered_number_of_leads_tagged=_count_by_project(filtered_lead_qs.filter(status=Lead.Status.TAGGED)),
-            filtered_number_of_entries=_count_by_project(filtered_entry_qs),
-            filtered_number_of_entries_verified=_count_by_project(filtered_entry_qs.filter(verified_by__isnull=False)),
-            filtered_number_of_entries_controlled=_count_by_project(filtered_entry_qs.filter(controlled=True)),
-        )
-    counts = dict(
-        number_of_users=_count_by_project(ProjectMembership.objects),
-        number_of_leads=_count_by_project(lead_qs),
-        number_of_leads_not_tagged=_count_by_project(lead_qs.filter(status=Lead.Status.NOT_TAGGED)),
-        number_of_leads_in_progress=_count_by_project(lead_qs.filter(status=Lead.Status.IN_PROGRESS)),
-        number_of_leads_tagged=_count_by_project(lead_qs.filter(status=Lead.Status.TAGGED)),
-        number_of_entries=_count_by_project(entry_qs),
-        number_of_entries_verified=_count_by_project(entry_qs.filter(verified_by__isnull=False)),
-        number_of_entries_controlled=_count_by_project(entry_qs.filter(controlled=True)),
-        **filters_counts,
+        # Filtered counts are calculated in the same query
+        filtered_lead_filter = models.Q(pk__in=filtered_lead_qs.order_by().values('pk'))
+        filtered_entry_filter = models.Q(pk__in=filtered_entry_qs.order_by().values('pk'))
+        lead_aggregates.update({
+            f'filtered_{key}': models.Count('id', filter=filtered_lead_filter & _filter)
+            for key, _filter in lead_status_filters.items()
+        })
+        entry_aggregates.update({
+            f'filtered_{key}': models.Count('id', filter=filtered_entry_filter & _filter)
+            for key, _filter in entry_filters.items()
+        })
+
+    return dict(
+        number_of_users=ProjectMembership.objects.filter(project=project).count(),
+        **lead_qs.aggregate(**lead_aggregates),
+        **entry_qs.aggregate(**entry_aggregates),
     )
+
+
+def get_project_stats(project, info, filters):
+    """
+    Memoized per request and per (project, filters, user's permissions, project data version) in cache
+    """
+    if info.context.active_project:
+        permissions_key = sorted(str(permission) for permission in info.context.project_permissions)
+    else:
+        permissions_key = None
+    try:
+        cache_key = CacheKey.PROJECT_STATS_KEY_FORMAT.format(
+            CacheHelper.generate_hash({
+                'project': project.pk,
+                'analysis_framework': project.analysis_framework_id,
+                'filters': filters,
+                'permissions': permissions_key,
+                'data_version': DataVersion.get(DataVersion.PROJECT, project.pk),
+            })
+        )
+    except TypeError:  # Not JSON serializable filters
+        cache_key = None
+
+    request_cache = info.context.request_cache
+    counts = request_cache.get(cache_key) if cache_key else None
+    if counts is None and cache_key:
+        counts = cache.get(cache_key)
+    if counts is None:
+        counts = _get_project_stats(project, info, filters)
+        if cache_key:
+            cache.set(cache_key, counts, settings.PROJECT_STATS_CACHE_TIMEOUT)
+    if cache_key:
+        request_cache[cache_key] = counts
+
     for key, value in counts.items():
         setattr(project, key, value)
     return project
 
 
-def _generate_project_stats_cache():
+def _get_project_stats_cache(project_ids, only_derived=False) -> Dict[int, dict]:
+    """
+    Calculate stats_cache for the given projects
+    only_derived: Skip the counters which are maintained using deltas (See ProjectStatsCounter)
+    """
     def _count_by_project_qs(qs):
         return {
             project: count
-            for project, count in qs.order_by().values('project').annotate(
+            for project, count in qs.filter(project__in=project_ids).order_by().values('project').annotate(
                 count=models.Count('id', distinct=True)
             ).values_list('project', 'count')
         }
@@ -119,6 +196,7 @@ def _generate_project_stats_cache():
         data = defaultdict(list)
         for project, count, date in (
             qs
+                .filter(project__in=project_ids)
                 .order_by('project', 'created_at__date')
                 .values('project', 'created_at__date')
                 .annotate(count=models.Count('id', distinct=True))
@@ -130,6 +208,7 @@ def _generate_project_stats_cache():
             })
         return data
 
+    project_ids = list(project_ids)
     current_time = timezone.now()
     threshold = ProjectStats.get_activity_timeframe(current_time)
 
@@ -139,7 +218,6 @@ def _generate_project_stats_cache():
     recent_entries = all_entries_qs.filter(created_at__gte=threshold)
 
     # Calculate
-    leads_count_map = _count_by_project_qs(Lead.objects.all())
     leads_tagged_and_controlled_count_map = _count_by_project_qs(
         Lead.objects.filter(status=Lead.Status.TAGGED).annotate(
             entries_count=models.Subquery(
@@ -157,15 +235,7 @@ def _generate_project_stats_cache():
             ),
         ).filter(entries_count__gt=0, entries_count=models.F('entries_controlled_count'))
     )
-    leads_not_tagged_count_map = _count_by_project_qs(Lead.objects.filter(status=Lead.Status.NOT_TAGGED))
-    leads_in_progress_count_map = _count_by_project_qs(Lead.objects.filter(status=Lead.Status.IN_PROGRESS))
-    leads_tagged_count_map = _count_by_project_qs(Lead.objects.filter(status=Lead.Status.TAGGED))
-
-    entries_count_map = _count_by_project_qs(all_entries_qs)
     entries_verified_count_map = _count_by_project_qs(all_entries_qs.filter(verified_by__isnull=False))
-    entries_controlled_count_map = _count_by_project_qs(all_entries_qs.filter(controlled=True))
-
-    members_count_map = _count_by_project_qs(ProjectMembership.objects.all())
 
     # Recent lead/entry stats
     leads_activity_count_map = _count_by_project_qs(recent_leads)
@@ -174,26 +244,157 @@ def _generate_project_stats_cache():
     leads_activity_map = _count_by_project_date_qs(recent_leads)
     entries_activity_map = _count_by_project_date_qs(recent_entries)
 
-    # Store
-    for project in Project.objects.iterator():
-        pk = project.pk
-        project.stats_cache = dict(
+    stats_cache_map = {
+        pk: dict(
             calculated_at=current_time.timestamp(),
-            number_of_users=members_count_map.get(pk, 0),
-            number_of_leads=leads_count_map.get(pk, 0),
-            number_of_leads_tagged=leads_tagged_count_map.get(pk, 0),
             number_of_leads_tagged_and_controlled=leads_tagged_and_controlled_count_map.get(pk, 0),
-            number_of_leads_not_tagged=leads_not_tagged_count_map.get(pk, 0),
-            number_of_leads_in_progress=leads_in_progress_count_map.get(pk, 0),
-            number_of_entries=entries_count_map.get(pk, 0),
             number_of_entries_verified=entries_verified_count_map.get(pk, 0),
-            number_of_entries_controlled=entries_controlled_count_map.get(pk, 0),
             leads_activity=leads_activity_count_map.get(pk, 0),
             entries_activity=entries_activity_count_map.get(pk, 0),
             leads_activities=leads_activity_map.get(pk, []),
             entries_activities=entries_activity_map.get(pk, []),
         )
-        project.save(update_fields=['stats_cache'])
+        for pk in project_ids
+    }
+    if only_derived:
+        return stats_cache_map
+
+    members_count_map = _count_by_project_qs(ProjectMembership.objects.all())
+    # Single scan for the leads/entries counters
+    leads_count_map = {
+        project: counts
+        for project, *counts in Lead.objects.filter(project__in=project_ids).order_by().values('project').annotate(
+            total=models.Count('id'),
+            not_tagged=models.Count('id', filter=models.Q(status=Lead.Status.NOT_TAGGED)),
+            in_progress=models.Count('id', filter=models.Q(status=Lead.Status.IN_PROGRESS)),
+            tagged=models.Count('id', filter=models.Q(status=Lead.Status.TAGGED)),
+        ).values_list('project', 'total', 'not_tagged', 'in_progress', 'tagged')
+    }
+    entries_count_map = {
+        project: counts
+        for project, *counts in all_entries_qs.filter(project__in=project_ids).order_by().values('project').annotate(
+            total=models.Count('id'),
+            controlled=models.Count('id', filter=models.Q(controlled=True)),
+        ).values_list('project', 'total', 'controlled')
+    }
+    for pk, stats_cache in stats_cache_map.items():
+        leads_count = leads_count_map.get(pk, [0, 0, 0, 0])
+        entries_count = entries_count_map.get(pk, [0, 0])
+        stats_cache.update(
+            number_of_users=members_count_map.get(pk, 0),
+            number_of_leads=leads_count[0],
+            number_of_leads_not_tagged=leads_count[1],
+            number_of_leads_in_progress=leads_count[2],
+            number_of_leads_tagged=leads_count[3],
+            number_of_entries=entries_count[0],
+            number_of_entries_controlled=entries_count[1],
+        )
+    return stats_cache_map
+
+
+def _generate_project_stats_cache(project_ids=None):
+    """
+    Recalculate stats_cache of the projects (All projects if project_ids is not provided), per batch of projects
+    """
+    if project_ids is None:
+        project_ids = Project.objects.order_by('id').values_list('id', flat=True).iterator()
+    for batch_project_ids in batched(project_ids, batch_size=STATS_CACHE_BATCH_SIZE):
+        # Buffered changes are included in the recalculation. Cleared before the recalculation so that changes
+        # committed in between aren't lost, they can be counted twice instead (recalculation + next flush) which is
+        # corrected by the next reconciliation as these projects are flagged again.
+        ProjectStatsCounter.clear(batch_project_ids)
+        stats_cache_map = _get_project_stats_cache(batch_project_ids)
+        Project.objects.bulk_update(
+            [
+                Project(pk=pk, stats_cache=stats_cache)
+                for pk, stats_cache in stats_cache_map.items()
+            ],
+            ['stats_cache'],
+        )
+
+
+def _flush_project_stats_cache():
+    """
+    Apply the buffered changes (ProjectStatsCounter) to the stats_cache of the projects with activity
+    """
+    active_project_ids, stale_project_ids, deltas = ProjectStatsCounter.pop()
+    if stale_project_ids:
+        _generate_project_stats_cache(sorted(stale_project_ids))
+    project_ids = sorted(active_project_ids - stale_project_ids)
+    counters = ProjectStatsCounter.COUNTERS
+    for batch_project_ids in batched(project_ids, batch_size=STATS_CACHE_BATCH_SIZE):
+        stats_cache_map = _get_project_stats_cache(batch_project_ids, only_derived=True)
+        project_af_map = dict(
+            Project.objects.filter(pk__in=batch_project_ids).values_list('id', 'analysis_framework_id')
+        )
+        project_deltas_map = defaultdict(lambda: defaultdict(int))
+        for pk in batch_project_ids:
+            for counter, analysis_framework_id, delta in deltas.get(pk, []):
+                # Entries are only counted if they have the same AF as the project's AF
+                if analysis_framework_id is None or analysis_framework_id == project_af_map.get(pk):
+                    project_deltas_map[pk][counter] += delta
+        counters_sql = ', '.join(
+            f"'{counter}', GREATEST(COALESCE((project.stats_cache->>'{counter}')::int, 0) + data.{counter}, 0)"
+            for counter in counters
+        )
+        with connection.cursor() as cursor:
+            execute_values(
+                cursor,
+                f'''
+                    UPDATE {Project._meta.db_table} AS project SET
+                        stats_cache = COALESCE(project.stats_cache, '{{}}'::jsonb) || data.stats_cache
+                            || jsonb_build_object({counters_sql})
+                    FROM (VALUES %s) AS data (id, stats_cache, {', '.join(counters)})
+                    WHERE project.id = data.id
+                ''',
+                [
+                    (
+                        pk,
+                        json.dumps(stats_cache, cls=DjangoJSONEncoder),
+                        *[project_deltas_map[pk][counter] for counter in counters],
+                    )
+                    for pk, stats_cache in stats_cache_map.items()
+                ],
+                template=f"(%s, %s::jsonb, {', '.join(['%s::int'] * len(counters))})",
+                page_size=STATS_CACHE_BATCH_SIZE,
+            )
+    return len(project_ids) + len(stale_project_ids)
+
+
+def _get_project_stats_sweep_ids():
+    """
+    Next projects of the rolling sweep (Drift correction for the projects without any activity), wraps around
+    """
+    project_ids = list(
+        Project.objects.filter(
+            pk__gt=ProjectStatsCounter.get_sweep_cursor(),
+        ).order_by('id').values_list('id', flat=True)[:STATS_CACHE_SWEEP_SIZE]
+    )
+    if len(project_ids) < STATS_CACHE_SWEEP_SIZE:
+        ProjectStatsCounter.set_sweep_cursor(0)
+    else:
+        ProjectStatsCounter.set_sweep_cursor(project_ids[-1])
+    return project_ids
+
+
+def _reconcile_project_stats_cache():
+    """
+    Recalculate stats_cache of the projects which can have drifted:
+    - Projects with activity since their last recalculation (ProjectStatsCounter)
+    - Projects with activity in the activity timeframe (Recent activity stats changes without any activity)
+    - Next projects of the rolling sweep
+    """
+    project_ids = ProjectStatsCounter.get_reconcile_project_ids()
+    project_ids.update(
+        Project.objects.filter(
+            models.Q(stats_cache__leads_activity__gt=0) |
+            models.Q(stats_cache__entries_activity__gt=0)
+        ).values_list('id', flat=True)
+    )
+    project_ids.update(_get_project_stats_sweep_ids())
+    project_ids = sorted(project_ids)
+    _generate_project_stats_cache(project_ids)
+    return len(project_ids)
 
 
 @shared_task
@@ -215,41 +416,116 @@ def generate_viz_stats(project_id, force=False):
 
 
 @shared_task
-def generate_project_stats_cache(force=False):
+def flush_project_stats_cache():
     """
-    Generate stats data for Home
+    Update stats data for Home (Only for the projects with activity)
     """
-    key = STATS_WAIT_LOCK_KEY
-    lock = redis.get_lock(key, STATS_WAIT_TIMEOUT)
-    have_lock = lock.acquire(blocking=False)
-    if not have_lock and not force:
+    key = STATS_CACHE_LOCK_KEY
+    lock = redis.get_lock(key, STATS_CACHE_LOCK_TIMEOUT)
+    if not lock.acquire(blocking=False):
+        logger.warning(f'FLUSH_PROJECT_STATS:: Already running {key}')
+        return False
+    try:
+        count = _flush_project_stats_cache()
+        logger.info(f'FLUSH_PROJECT_STATS:: Updated {count} projects')
+    finally:
+        lock.release()
+    return True
+
+
+@shared_task
+def generate_project_stats_cache(force=False, all_projects=False):
+    """
+    Generate stats data for Home (Reconciliation, See _reconcile_project_stats_cache)
+    force: Wait for the running flush/reconciliation without timeout
+    all_projects: Recalculate all projects
+    """
+    key = STATS_CACHE_LOCK_KEY
+    lock = redis.get_lock(key, STATS_CACHE_LOCK_TIMEOUT)
+    have_lock = lock.acquire(blocking_timeout=None if force else STATS_CACHE_LOCK_WAIT_TIMEOUT)
+    if not have_lock:
         logger.warning(f'GENERATE_PROJECT_STATS:: Waiting for timeout {key}')
         return False
 
     logger.info(f'GENERATE_PROJECT_STATS:: Processing for {key}')
-    _generate_project_stats_cache()
-    lock.release()
+    try:
+        if all_projects:
+            _generate_project_stats_cache()
+        else:
+            count = _reconcile_project_stats_cache()
+            logger.info(f'GENERATE_PROJECT_STATS:: Reconciled {count} projects')
+    finally:
+        lock.release()
     return True
 
 
-def generate_project_geo_region_cache(project):
-    region_qs = project.regions.defer('geo_options', 'centroid')
+def get_project_geo_cache_hash(project):
+    return str(hash(tuple(project.regions.order_by('id').values_list('cache_index', flat=True))))
 
-    geo_options = {}
-    for region in region_qs:
-        if region.geo_options is None:
-            region.calc_cache()
-        geo_options[region.pk] = region.geo_options
 
+def generate_project_geo_region_cache(project):
+    """
+    Region geo_options (rendered as text by the database) are concatenated without re-serialization
+    Keys are camelCased by the database (Served to the clients as it is, See PROJECT_GEO_CACHE_FORMAT)
+    """
+    region_qs = project.regions.order_by('id')
+    for region in region_qs.filter(geo_options__isnull=True).defer('centroid'):
+        region.calc_cache()
+
+    regions_data = list(
+        region_qs.annotate(
+            geo_options_json=Cast(
+                JSONObject(**{
+                    to_camel_case(key): KeyTransform(key, 'geo_options')
+                    for key in GEO_OPTIONS_KEYS
+                }),
+                models.TextField(),
+            ),
+        ).values_list('id', 'cache_index', 'geo_options_json')
+    )
+    content = '{' + ', '.join(
+        f'"{region_id}": {geo_options_json}'
+        for region_id, _, geo_options_json in regions_data
+    ) + '}'
     project.geo_cache_file.save(
         f'project-geo-cache-{project.pk}.json',
-        ContentFile(CamelCaseJSONRenderer().render(geo_options)),
+        ContentFile(content.encode('utf-8')),
         save=False,
     )
-    project.geo_cache_hash = hash(tuple(region_qs.order_by('id').values_list('cache_index', flat=True)))
+    project.geo_cache_hash = str(hash(tuple(cache_index for _, cache_index, _ in regions_data)))
     project.save(update_fields=('geo_cache_hash', 'geo_cache_file'))
 
 
+def generate_missing_project_geo_region_cache(project):
+    """
+    Generate project geo cache file inline if there is nothing to serve yet
+    Concurrent requests wait for the one generating the file
+    """
+    with redis.get_lock(GEO_CACHE_LOCK_KEY.format(project.pk), GEO_CACHE_LOCK_TIMEOUT):
+        project.refresh_from_db(fields=('geo_cache_hash', 'geo_cache_file'))
+        if not project.geo_cache_file:
+            generate_project_geo_region_cache(project)
+
+
+@shared_task
+def generate_project_geo_cache(project_id):
+    """
+    Re-generate project geo cache file if the regions are changed (Stale file is served till then)
+    """
+    key = GEO_CACHE_LOCK_KEY.format(project_id)
+    lock = redis.get_lock(key, GEO_CACHE_LOCK_TIMEOUT)
+    if not lock.acquire(blocking=False):
+        logger.warning(f'GENERATE_PROJECT_GEO_CACHE:: Already running {key}')
+        return False
+    try:
+        project = Project.objects.filter(pk=project_id).first()
+        if project is not None and project.geo_cache_hash != get_project_geo_cache_hash(project):
+            generate_project_geo_region_cache(project)
+    finally:
+        lock.release()
+    return True
+
+
 @shared_task
 def permanently_delete_projects():
     # check every project if there `is_deleted` is set True
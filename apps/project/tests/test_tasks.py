@@ -0,0 +1,182 @@
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from deep.caches import DataVersion
+from deep.filter_set import get_dummy_request
+from deep.tests import TestCase
+
+from analysis_framework.factories import AnalysisFrameworkFactory
+from entry.factories import EntryFactory
+from lead.factories import LeadFactory
+from lead.models import Lead
+from project.factories import ProjectFactory
+from project.models import Project
+from project.stats import ProjectStatsCounter
+from project.tasks import (
+    STATS_CACHE_LOCK_KEY,
+    _flush_project_stats_cache,
+    _generate_project_stats_cache,
+    _get_project_stats_cache,
+    _reconcile_project_stats_cache,
+    flush_project_stats_cache,
+    generate_project_stats_cache,
+    get_project_stats,
+)
+from redis_store import redis
+from user.factories import UserFactory
+
+
+class TestProjectStatsCache(TestCase):
+    def test_flush_project_stats_cache(self):
+        af1, af2 = AnalysisFrameworkFactory.create_batch(2)
+        project = ProjectFactory.create(analysis_framework=af1)
+        another_project = ProjectFactory.create(analysis_framework=af1)
+        ProjectStatsCounter.pop()  # Clear changes from other tests
+        _generate_project_stats_cache()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            project.add_member(UserFactory.create())
+            lead1, lead2, lead3 = LeadFactory.create_batch(3, project=project)
+            EntryFactory.create_batch(2, lead=lead1)
+            EntryFactory.create(lead=lead2, controlled=True)
+            # Entry with different AF than project's AF
+            EntryFactory.create(lead=lead2, analysis_framework=af2)
+            lead2.status = Lead.Status.TAGGED
+            lead2.save(update_fields=('status',))
+            lead3.delete()
+            EntryFactory.create(lead=LeadFactory.create(project=another_project))
+
+        assert _flush_project_stats_cache() == 2
+        flushed_stats_cache_map = dict(Project.objects.values_list('id', 'stats_cache'))
+
+        # Same as the full recalculation
+        _generate_project_stats_cache()
+        stats_cache_map = dict(Project.objects.values_list('id', 'stats_cache'))
+        for project_id, stats_cache in stats_cache_map.items():
+            stats_cache.pop('calculated_at')
+            flushed_stats_cache_map[project_id].pop('calculated_at')
+            assert flushed_stats_cache_map[project_id] == stats_cache
+        assert stats_cache_map[project.pk]['number_of_leads'] == 2
+        assert stats_cache_map[project.pk]['number_of_leads_in_progress'] == 1
+        assert stats_cache_map[project.pk]['number_of_leads_tagged'] == 1
+        assert stats_cache_map[project.pk]['number_of_entries'] == 3
+        assert stats_cache_map[project.pk]['number_of_entries_controlled'] == 1
+
+        # No activity
+        assert _flush_project_stats_cache() == 0
+
+    def test_generate_project_stats_cache_keeps_concurrent_changes(self):
+        project = ProjectFactory.create()
+        ProjectStatsCounter.pop()  # Clear changes from other tests
+
+        def _get_stats_cache_with_concurrent_change(*args, **kwargs):
+            # Lead created (and committed) while counting
+            ProjectStatsCounter._add(project.pk, [ProjectStatsCounter.NUMBER_OF_LEADS], 1, None, False)
+            return _get_project_stats_cache(*args, **kwargs)
+
+        with patch('project.tasks._get_project_stats_cache', side_effect=_get_stats_cache_with_concurrent_change):
+            _generate_project_stats_cache([project.pk])
+        active_project_ids, _, deltas = ProjectStatsCounter.pop()
+        assert active_project_ids == {project.pk}
+        assert deltas[project.pk] == [(ProjectStatsCounter.NUMBER_OF_LEADS, None, 1)]
+
+    def test_reconcile_project_stats_cache(self):
+        project, another_project, third_project = ProjectFactory.create_batch(3)
+        # Clear changes from other tests
+        ProjectStatsCounter.pop()
+        ProjectStatsCounter.clear(ProjectStatsCounter.get_reconcile_project_ids())
+        _generate_project_stats_cache()
+        # Drifted counters
+        Project.objects.update(stats_cache={'number_of_leads': 10})
+        with self.captureOnCommitCallbacks(execute=True):
+            LeadFactory.create(project=project)
+        _flush_project_stats_cache()
+
+        ProjectStatsCounter.set_sweep_cursor(project.pk)
+        with patch('project.tasks.STATS_CACHE_SWEEP_SIZE', 1):
+            # Flagged project + next project of the rolling sweep
+            assert _reconcile_project_stats_cache() == 2
+            stats_cache_map = dict(Project.objects.values_list('id', 'stats_cache__number_of_leads'))
+            assert stats_cache_map == {project.pk: 1, another_project.pk: 0, third_project.pk: 10}
+            assert ProjectStatsCounter.get_reconcile_project_ids() == set()
+
+            # Project with recent activity + next project of the rolling sweep
+            assert _reconcile_project_stats_cache() == 2
+            stats_cache_map = dict(Project.objects.values_list('id', 'stats_cache__number_of_leads'))
+            assert stats_cache_map == {project.pk: 1, another_project.pk: 0, third_project.pk: 0}
+
+    def test_flush_and_reconciliation_use_same_lock(self):
+        lock = redis.get_lock(STATS_CACHE_LOCK_KEY, 60)
+        assert lock.acquire(blocking=False)
+        try:
+            # Flush is skipped while the reconciliation (or another flush) is running
+            assert flush_project_stats_cache() is False
+            with patch('project.tasks.STATS_CACHE_LOCK_WAIT_TIMEOUT', 0.1):
+                assert generate_project_stats_cache() is False
+        finally:
+            lock.release()
+        assert flush_project_stats_cache() is True
+        assert generate_project_stats_cache() is True
+
+
+class TestProjectStats(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.project = ProjectFactory.create(analysis_framework=AnalysisFrameworkFactory.create())
+        self.project.add_member(UserFactory.create())
+        self.lead1, lead2 = LeadFactory.create_batch(2, project=self.project)
+        EntryFactory.create_batch(2, lead=self.lead1, controlled=True)
+        EntryFactory.create(lead=lead2)
+
+    def _get_info(self):
+        # New request
+        return SimpleNamespace(
+            context=SimpleNamespace(
+                active_project=None,
+                request=get_dummy_request(active_project=self.project),
+                request_cache={},
+            ),
+        )
+
+    def _get_stats(self, info, filters=None):
+        return get_project_stats(self.project, info, filters)
+
+    def test_single_pass_aggregation(self):
+        DataVersion.bump(DataVersion.PROJECT, self.project.pk)
+        # Members, leads and entries
+        with self.assertNumQueries(3):
+            project = self._get_stats(self._get_info())
+        assert project.number_of_users == 1
+        assert project.number_of_leads == 2
+        assert project.number_of_entries == 3
+        assert project.number_of_entries_controlled == 2
+
+        # Filtered counts are calculated in the same queries
+        with self.assertNumQueries(3):
+            project = self._get_stats(
+                self._get_info(),
+                {'ids': [str(self.lead1.pk)], 'entries_filter_data': {'controlled': True}},
+            )
+        assert project.filtered_number_of_leads == 1
+        assert project.filtered_number_of_entries == 2
+        assert project.filtered_number_of_entries_controlled == 2
+
+    def test_memoization(self):
+        DataVersion.bump(DataVersion.PROJECT, self.project.pk)
+        info = self._get_info()
+        with self.assertNumQueries(3):
+            self._get_stats(info)
+        # Same request
+        with patch('project.tasks.cache') as cache:
+            with self.assertNumQueries(0):
+                assert self._get_stats(info).number_of_leads == 2
+            cache.get.assert_not_called()
+        # Another request
+        with self.assertNumQueries(0):
+            assert self._get_stats(self._get_info()).number_of_leads == 2
+
+        # Project data changed
+        LeadFactory.create(project=self.project)
+        DataVersion.bump(DataVersion.PROJECT, self.project.pk)
+        with self.assertNumQueries(3):
+            assert self._get_stats(self._get_info()).number_of_leads == 3
@@ -45,22 +45,16 @@ def extract(book):
         # Create a new iterator with already extracted first row if no_headers
         rows_iterator = chain(iter([first_row]), reader)
 
-        fields_data = {}
+        fields_values = {field.id: [] for field in fields}
         for _row in rows_iterator:
             try:
                 for index, field in enumerate(fields):
-                    field_data = fields_data.get(field.id, [])
-                    field_data.append({
-                        'value': _row[index],
-                        'invalid': False,
-                        'empty': False,
-                    })
-                    fields_data[field.id] = field_data
+                    fields_values[field.id].append(_row[index])
             except Exception:
                 pass
 
         for field in sheet.field_set.all():
-            field.data = fields_data.get(field.id, [])
+            field.data = {'values': fields_values.get(field.id, [])}
             block_name = 'Field Save csv extract {}'.format(field.title)
             with LogTime(block_name=block_name):
                 field.save()
@@ -1,10 +1,9 @@
 import random
-import os
-import re
 import string
 from django.conf import settings
 from subprocess import call
 
+from utils import libreoffice
 from utils.common import LogTime
 
 from .xlsx import extract as xlsx_extract
@@ -20,15 +19,7 @@ def extract(book):
         tmpxls.write(book.file.file.read())
         tmpxls.flush()
 
-    call([
-        'libreoffice', '--headless', '--convert-to', 'xlsx',
-        tmp_filepath, '--outdir', settings.TEMP_DIR,
-    ])
-
-    xlsx_filename = os.path.join(
-        settings.TEMP_DIR,
-        re.sub(r'xls$', 'xlsx', os.path.basename(tmp_filepath))
-    )
+    xlsx_filename = libreoffice.convert(tmp_filepath, settings.TEMP_DIR, 'xlsx')
 
     response = xlsx_extract(book, filename=xlsx_filename)
 
@@ -79,28 +79,23 @@ def extract(book, filename=None):
 
             if no_headers:
                 fields = [
-                    Field(title=f'Column {x}', sheet=sheet, ordering=x, data=[])
+                    Field(title=f'Column {x}', sheet=sheet, ordering=x, data={'values': []})
                     for x in range(max_col_length)
                 ]
             else:
                 fields = []
                 for x in range(max_col_length):
                     row_len = len(sheet_rows[0])
-                    title_val = sheet_rows[0][x]['value'] if row_len > x else None
+                    title_val = sheet_rows[0][x] if row_len > x else None
                     title = title_val or f'Column {x}'
-                    fields.append(Field(title=title, sheet=sheet, ordering=x, data=[]))
-
-            empty_value = {
-                'value': None,
-                'invalid': False,
-                'empty': True
-            }
-            # Now append data to fields
-            for row in sheet_rows:
-                row_len = len(row)
-                for x in range(max_col_length):
-                    cell_data = row[x] if x < row_len else {**empty_value}
-                    fields[x].data.append(cell_data)
+                    fields.append(Field(title=title, sheet=sheet, ordering=x, data={'values': []}))
+
+            # Now append data to fields (as columns)
+            for x, field in enumerate(fields):
+                field.data['values'] = [
+                    row[x] if x < len(row) else None
+                    for row in sheet_rows
+                ]
 
             # Bulk save fields
             Field.objects.bulk_create(fields)
@@ -119,12 +114,7 @@ def get_row_data(row):
     for cell in row:
         if cell.value is not None:
             max_data_col = curr_col
-        value = get_excel_value(cell)
-        data.append({
-            'value': value,
-            'empty': value is None,
-            'invalid': False
-        })
+        data.append(get_excel_value(cell))
         curr_col += 1
     # Now clip the data beyond which there is nothing
     return data[:max_data_col + 1]
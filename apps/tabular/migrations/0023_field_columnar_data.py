@@ -0,0 +1,53 @@
+import base64
+
+from django.db import migrations, models
+
+
+# NOTE: Same as tabular.utils.pack_bitmap (numpy.packbits), copied to not depend on the live app code
+def pack_bitmap(mask) -> str:
+    """
+    Bool array -> base64 encoded bits (Most significant bit first, last byte is padded with 0)
+    """
+    packed = bytearray((len(mask) + 7) // 8)
+    for index, value in enumerate(mask):
+        if value:
+            packed[index // 8] |= 0x80 >> (index % 8)
+    return base64.b64encode(bytes(packed)).decode('ascii')
+
+
+def rows_to_columns(rows):
+    data = {
+        'values': [row.get('value') for row in rows],
+        'empty': pack_bitmap([bool(row.get('empty')) for row in rows]),
+        'invalid': pack_bitmap([bool(row.get('invalid')) for row in rows]),
+    }
+    if any('processed_value' in row for row in rows):
+        data['processed_values'] = [row.get('processed_value') for row in rows]
+    return data
+
+
+def migrate_field_data(apps, schema_editor):
+    Field = apps.get_model('tabular', 'Field')
+    for field in Field.objects.only('id', 'data').iterator(chunk_size=100):
+        if isinstance(field.data, list):
+            field.data = rows_to_columns(field.data)
+            field.save(update_fields=('data',))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tabular', '0022_auto_20210503_0431'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='field',
+            name='data',
+            field=models.JSONField(default=dict),
+        ),
+        migrations.RunPython(
+            migrate_field_data,
+            reverse_code=migrations.RunPython.noop,
+        ),
+    ]
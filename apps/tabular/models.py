@@ -1,12 +1,13 @@
 import time
 
+import numpy as np
 from django.db import models, transaction
 from user_resource.models import UserResource
 from gallery.models import File
 from project.models import Project
 from utils.common import get_file_from_url
 
-from tabular.utils import get_cast_function
+from tabular.utils import get_cast_function, pack_bitmap, unpack_bitmap
 
 
 class Book(UserResource):
@@ -128,7 +129,7 @@ class Sheet(models.Model):
                 field.cache['time'] = time.time()
                 # Update the field title
                 if self.data_row_index > 0:
-                    field.title = str(field.data[self.data_row_index - 1]['value'])
+                    field.title = str(field.raw_values[self.data_row_index - 1])
                 field.save()
             field_ids = self.field_set.values_list('id', flat=True)
             transaction.on_commit(
@@ -172,12 +173,70 @@ class Field(models.Model):
     options = models.JSONField(default=None, blank=True, null=True)
     cache = models.JSONField(default=dict, blank=True, null=True)
     ordering = models.IntegerField(default=1)
-    data = models.JSONField(default=list)
+    # Columnar data (including the header rows)
+    # {
+    #   values: [] Raw cell values
+    #   processed_values: [] Casted values, None for empty/invalid cells (Not available for string field)
+    #   empty, invalid: Bitmaps (See tabular.utils.pack_bitmap)
+    # }
+    data = models.JSONField(default=dict)
+
+    @property
+    def raw_values(self):
+        return (self.data or {}).get('values') or []
+
+    def get_data_columns(self, start=0):
+        """
+        Returns (values, processed_values, empty, invalid) from the start row
+        processed_values is None for string field, empty/invalid are numpy bool arrays
+        """
+        data = self.data or {}
+        values = self.raw_values
+        length = len(values)
+        processed_values = data.get('processed_values')
+        return (
+            values[start:],
+            processed_values and processed_values[start:],
+            unpack_bitmap(data.get('empty'), length)[start:],
+            unpack_bitmap(data.get('invalid'), length)[start:],
+        )
+
+    def get_rows(self, start=0):
+        """
+        Per cell dicts {value, processed_value, empty, invalid} (Legacy format, used by the API)
+        """
+        values, processed_values, empty, invalid = self.get_data_columns(start=start)
+        rows = []
+        for index, value in enumerate(values):
+            row = {
+                'value': value,
+                'empty': bool(empty[index]),
+                'invalid': bool(invalid[index]),
+            }
+            if processed_values and processed_values[index] is not None:
+                row['processed_value'] = processed_values[index]
+            rows.append(row)
+        return rows
+
+    @property
+    def rows(self):
+        return self.get_rows()
 
     @property
     def actual_data(self):
-        row_index = self.sheet.data_row_index
-        return self.data[row_index:]
+        return self.get_rows(start=self.sheet.data_row_index)
+
+    def get_export_values(self):
+        """
+        Processed value (or raw value) of the data rows
+        """
+        values, processed_values, *_ = self.get_data_columns(start=self.sheet.data_row_index)
+        if not processed_values:
+            return values
+        return [
+            processed_value or value
+            for value, processed_value in zip(values, processed_values)
+        ]
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -189,47 +248,59 @@ class Field(models.Model):
 
     def cast_data(self, geos_names={}, geos_codes={}):
         """
-        Returns processed, invalid and empty values corresponding to the fields
-        after trying to cast
+        Returns data with processed values and empty/invalid bitmaps after trying to cast
+        NOTE: Each unique value is casted only once
         """
         type = self.type
         options = self.options
 
         cast_func = get_cast_function(type, geos_names, geos_codes)
 
-        values = self.data
+        values = self.raw_values
         regions = {}
+        casted_values = {}  # (value type, value) -> (invalid, processed_value)
 
-        # Now iterate through every item to find empty/invalid values
-        for i, value in enumerate(values):
-            val = value['value']
-
-            value.pop('invalid', None)
-            value.pop('empty', None)
-            value.pop('processed_value', None)
-
+        processed_values = []
+        empty = np.zeros(len(values), dtype=bool)
+        invalid = np.zeros(len(values), dtype=bool)
+        for i, val in enumerate(values):
             if val is None or val == '':
-                value['empty'] = True
+                empty[i] = True
+                processed_values.append(None)
                 continue
-            casted = cast_func(val, **self.options)
-
-            if casted is None:
-                value['invalid'] = True
-            elif type == Field.GEO:
-                value['processed_value'] = casted['id']
-                regions[casted['region']] = casted['region_title']
-            elif type == Field.NUMBER:
-                value['processed_value'] = casted[0]  # (number, separator)
-            elif type == Field.DATETIME:
-                value['processed_value'] = casted.isoformat()  # (parsed_date)
+
+            key = (val.__class__, val)
+            if key not in casted_values:
+                casted = cast_func(val, **self.options)
+                processed_value = None
+                if casted is None:
+                    pass
+                elif type == Field.GEO:
+                    processed_value = casted['id']
+                    regions[casted['region']] = casted['region_title']
+                elif type == Field.NUMBER:
+                    processed_value = casted[0]  # (number, separator)
+                elif type == Field.DATETIME:
+                    processed_value = casted.isoformat()  # (parsed_date)
+                casted_values[key] = (casted is None, processed_value)
+
+            invalid[i], processed_value = casted_values[key]
+            processed_values.append(processed_value)
 
         if type == Field.GEO and regions:
             options['regions'] = [
                 {'id': k, 'title': v} for k, v in regions.items()
             ]
 
-        return {
+        data = {
             'values': values,
+            'empty': pack_bitmap(empty),
+            'invalid': pack_bitmap(invalid),
+        }
+        if type != Field.STRING:
+            data['processed_values'] = processed_values
+        return {
+            'data': data,
             'options': options
         }
 
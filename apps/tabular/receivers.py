@@ -25,7 +25,7 @@ def on_field_saved(sender, **kwargs):
         geos_codes = get_geos_codes_from_geos_names(geos_names)
     cast_info = field.cast_data(geos_names, geos_codes)
 
-    field.data = cast_info['values']
+    field.data = cast_info['data']
 
     field.options = cast_info['options']
     # But don't save here, will cause recursion
@@ -52,12 +52,17 @@ class FieldSerializer(
         serializers.ModelSerializer
 ):
     geodata = serializers.SerializerMethodField()
+    data = serializers.SerializerMethodField()
 
     class Meta:
         model = Field
         ref_name = 'TabularFieldSerializer'
         exclude = ('sheet', 'cache',)
 
+    def get_data(self, obj):
+        # NOTE: Stored as columns, per cell dicts are only created for the response
+        return obj.rows
+
     def get_geodata(self, obj):
         if obj.type == Field.GEO and hasattr(obj, 'geodata'):
             return GeodataSerializer(obj.geodata).data
@@ -74,6 +79,7 @@ class FieldSerializer(
 
 class FieldMetaSerializer(FieldSerializer):
     geodata = None
+    data = None
 
     class Meta:
         model = Field
@@ -81,6 +87,8 @@ class FieldMetaSerializer(FieldSerializer):
 
 
 class FieldProcessedOnlySerializer(FieldSerializer):
+    data = None
+
     class Meta:
         model = Field
         exclude = ('data',)
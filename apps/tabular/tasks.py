@@ -48,9 +48,6 @@ def auto_detect_and_update_fields(book):
     geos_names = get_geos_dict(book.project)
     geos_codes = get_geos_codes_from_geos_names(geos_names)
 
-    def isValueNotEmpty(v):
-        return v.get('value')
-
     generate_column_columns = []
 
     with transaction.atomic():
@@ -60,8 +57,7 @@ def auto_detect_and_update_fields(book):
             row_index = sheet.data_row_index
 
             for field in fields:
-                data = field.data[row_index:]
-                emptyFiltered = list(filter(isValueNotEmpty, data))
+                emptyFiltered = [value for value in field.raw_values[row_index:] if value]
                 detected_info = sample_and_detect_type_and_options(
                     emptyFiltered, geos_names, geos_codes
                 )
@@ -69,7 +65,7 @@ def auto_detect_and_update_fields(book):
                 field.options = detected_info['options']
 
                 cast_info = field.cast_data(geos_names, geos_codes)
-                field.data = cast_info['values']
+                field.data = cast_info['data']
                 field.options = cast_info['options']
 
                 field.cache = {
@@ -100,9 +96,8 @@ def _tabular_meta_extract_geo(geodata):
             admin_level__level=admin_level
         )
 
-    for row in geodata.field.sheet.data:
+    for query in field.raw_values[field.sheet.data_row_index:]:
         similar_areas = []
-        query = row.get(str(field.pk))
 
         if is_code:
             geoareas = project_geoareas.filter(code=query).annotate(
@@ -17,6 +17,8 @@ from tabular.utils import (
     parse_dot_separated,
     parse_space_separated,
     auto_detect_datetime,
+    pack_bitmap,
+    unpack_bitmap,
 )
 
 consistent_csv_data = '''id,age,name,date,place
@@ -113,12 +115,15 @@ class TestTabularExtraction(TestCase):
         # now validate auto detected fields
         for field in Field.objects.filter(sheet=sheet):
             assert len(field.actual_data) == 10
+            # Same format as the legacy per cell dicts
+            for datum in field.actual_data:
+                assert isinstance(datum['empty'], bool) and isinstance(datum['invalid'], bool)
 
             if field.title == 'id':
                 assert field.type == Field.NUMBER, 'id is number'
                 assert 'separator' in field.options
                 assert field.options['separator'] == 'none'
-                self.validate_number_field(field.data)
+                self.validate_number_field(field.rows)
                 # Check invalid values
                 check_invalid(8, field.actual_data)
                 check_invalid(9, field.actual_data)
@@ -126,14 +131,14 @@ class TestTabularExtraction(TestCase):
                 assert field.type == Field.NUMBER, 'age is number'
                 assert 'separator' in field.options
                 assert field.options['separator'] == 'none'
-                self.validate_number_field(field.data)
+                self.validate_number_field(field.rows)
             elif field.title == 'name':
                 assert field.type == Field.STRING, 'name is string'
             elif field.title == 'date':
                 assert field.type == Field.DATETIME, 'date is datetime'
                 assert field.options is not None
                 assert 'date_format' in field.options
-                for datum in field.data:
+                for datum in field.rows:
                     assert datum.get('invalid') is not None or \
                         datum.get('empty') is not None or \
                         'processed_value' in datum
@@ -163,14 +168,14 @@ class TestTabularExtraction(TestCase):
 
         # now validate auto detected fields
         for field in Field.objects.filter(sheet=sheet):
-            for v in field.data:
+            for v in field.rows:
                 assert isinstance(v, dict)
 
             if field.title == 'id':
                 assert field.type == Field.STRING, \
                     'id is string as it is inconsistent'
                 # Verify that being string, no value is invalid
-                for v in field.data:
+                for v in field.rows:
                     assert not v.get('invalid'), \
                         "Since string, shouldn't be invalid"
             elif field.title == 'age':
@@ -215,7 +220,7 @@ class TestTabularExtraction(TestCase):
 
         kathmandu_geo = GeoArea.objects.filter(code='KAT')[0]
 
-        for v in geofield.data:
+        for v in geofield.rows:
             assert v.get('invalid') or v.get('empty') or 'processed_value' in v
             assert 'value' in v
             assert v.get('empty') \
@@ -255,7 +260,7 @@ class TestTabularExtraction(TestCase):
 
         kathmandu_geo = GeoArea.objects.filter(code='KAT')[0]
 
-        for v in geofield.data:
+        for v in geofield.rows:
             assert v.get('invalid') or v.get('empty') or 'processed_value' in v
             assert 'value' in v
             assert v.get('empty') \
@@ -283,7 +288,7 @@ class TestTabularExtraction(TestCase):
         field.save()
 
         # no vlaue should be invalid
-        for v in field.data:
+        for v in field.rows:
             assert not v.get('invalid', None)
 
     def test_sheet_data_change_on_string_change_to_geo(self):
@@ -311,7 +316,7 @@ class TestTabularExtraction(TestCase):
         field.save()
 
         # no value should be invalid
-        for v in field.data:
+        for v in field.rows:
             assert not v.get('invalid')
         # Now change type to Geo
         field.type = Field.GEO
@@ -354,8 +359,8 @@ class TestTabularExtraction(TestCase):
 
         for field in sheet.field_set.all():
             # Also check field title
-            assert field.title == field.data[sheet.data_row_index - 1]['value']
-            assert len(field.data) == 11, "Data includes the column names as well"
+            assert field.title == field.raw_values[sheet.data_row_index - 1]
+            assert len(field.raw_values) == 11, "Data includes the column names as well"
             assert len(field.actual_data) == 10
 
         # now update sheet option
@@ -364,10 +369,10 @@ class TestTabularExtraction(TestCase):
 
         # check if field actual_data changed or not
         for field in sheet.field_set.all():
-            assert field.title == field.data[sheet.data_row_index - 1]['value']
+            assert field.title == field.raw_values[sheet.data_row_index - 1]
             # check if Re-triggered or not
             assert field.cache['status'] == Field.CACHE_PENDING
-            assert len(field.data) == 11, "Data includes the column names as well"
+            assert len(field.raw_values) == 11, "Data includes the column names as well"
             assert len(field.actual_data) == 9
 
     def initialize_data_and_basic_test(self, csv_data):
@@ -409,19 +414,14 @@ class TestTabularExtraction(TestCase):
         # check structure of data in sheet
         for sheet in book.sheet_set.all():
             fields = sheet.field_set.all()
-            size = len(fields[0].data)
-            assert all([len(x.data) == size for x in fields]), \
+            size = len(fields[0].raw_values)
+            assert all([len(x.raw_values) == size for x in fields]), \
                 "All columns should have same size"
 
             for field in fields:
-                v = field.data
-                assert isinstance(v, list)
-                for x in v:
+                assert isinstance(field.data['values'], list)
+                for x in field.rows:
                     assert 'value' in x
-                    assert 'empty' in x
-                    assert isinstance(x['empty'], bool)
-                    assert 'invalid' in x
-                    assert isinstance(x['invalid'], bool)
         return book
 
     def validate_number_field(self, items):
@@ -510,3 +510,9 @@ def test_parse_date():
 
     assert auto_detect_datetime('2019-December-15') is not None
     assert auto_detect_datetime('2019 October 15') is not None
+
+
+def test_bitmap():
+    mask = [True, False, False, True, True, False, False, False, True, True]
+    assert unpack_bitmap(pack_bitmap(mask), len(mask)).tolist() == mask
+    assert unpack_bitmap(None, 3).tolist() == [False, False, False]
@@ -1,6 +1,9 @@
 import re
+import base64
 import random
 from datetime import datetime
+
+import numpy as np
 from geo.models import GeoArea
 
 from utils.common import calculate_sample_size, get_max_occurence_and_count
@@ -210,8 +213,7 @@ def sample_and_detect_type_and_options(values, geos_names={}, geos_codes={}):
     date_options = []
     number_options = []
 
-    for sample in samples:
-        value = sample['value']
+    for value in samples:
         number_parsed = parse_number(value)
         if number_parsed:
             types.append(Field.NUMBER)
@@ -290,6 +292,25 @@ def get_geo_options(geo_options):
     }
 
 
+def pack_bitmap(mask) -> str:
+    """
+    Bool array -> base64 encoded bits
+    """
+    return base64.b64encode(np.packbits(np.asarray(mask, dtype=bool)).tobytes()).decode('ascii')
+
+
+def unpack_bitmap(value, length) -> np.ndarray:
+    """
+    base64 encoded bits -> Bool array of the given length
+    """
+    if not value:
+        return np.zeros(length, dtype=bool)
+    return np.unpackbits(
+        np.frombuffer(base64.b64decode(value), dtype=np.uint8),
+        count=length,
+    ).astype(bool)
+
+
 def get_geos_codes_from_geos_names(geos_names):
     return {
         level: {
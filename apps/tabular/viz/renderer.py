@@ -59,33 +59,32 @@ def get_val_column(field):
     return 'value'
 
 
-def clean_real_data(data, val_column):
+def clean_real_data(field):
     """
     Return clean_dataframe, original_dataframe
+    NOTE: Created from the field data columns (from the data row index)
     """
-    # NOTE: The folloing loop adds the keys empty and invalid if not present
-    # TODO: Handle the following case from pandas itself
-    formatted_data = []
-    for datum in data:
-        formatted_data.append({
-            **datum,
-            'empty': datum.get('empty', False),
-            'invalid': datum.get('invalid', False),
-        })
-
-    df = pd.DataFrame(formatted_data)
+    values, processed_values, empty, invalid = field.get_data_columns(start=field.sheet.data_row_index)
+    columns = {
+        'value': values,
+        'empty': empty,
+        'invalid': invalid,
+    }
+    if processed_values is not None:
+        columns['processed_value'] = processed_values
+    df = pd.DataFrame(columns)
 
     if df.empty:
         return df, df
 
-    filterd_df = df[~(df['empty'] == True) & ~(df['invalid'] == True)]  # noqa
+    filterd_df = df[~df['empty'] & ~df['invalid']]
     return filterd_df, df
 
 
 def calc_data(field):
     val_column = get_val_column(field)
 
-    data, df = clean_real_data(field.actual_data, val_column)
+    data, df = clean_real_data(field)
 
     if data.empty:
         logger.warning('Empty DataFrame: no numeric data to calculate for field ({})'.format(field.pk))
@@ -100,8 +99,8 @@ def calc_data(field):
 
     data['value'] = data.index
     health_stats = {
-        'empty': int(df[df['empty'] == True]['empty'].count()), # noqa
-        'invalid': int(df[df['invalid'] == True]['invalid'].count()), # noqa
+        'empty': int(df['empty'].sum()),
+        'invalid': int(df['invalid'].sum()),
         'total': len(df.index),
     }
     return data.to_dict(orient='records'), health_stats
@@ -144,7 +143,7 @@ def generate_chart(field, chart_type, images_format=['svg']):
 
     else:
         val_column = get_val_column(field)
-        df, _ = clean_real_data(field.actual_data, val_column)
+        df, _ = clean_real_data(field)
         if chart_type == HISTOGRAM:
             params['data'] = pd.to_numeric(df[val_column])
         elif chart_type == WORDCLOUD:
@@ -12,7 +12,6 @@ from django.db import models
 from utils.graphene.types import CustomDjangoListObjectType
 from utils.graphene.fields import DjangoPaginatedListObjectField
 from jwt_auth.token import AccessToken
-from deep.serializers import URLCachedFileField
 
 from project.models import (
     Project,
@@ -77,9 +76,9 @@ class UserProfileType(graphene.ObjectType):
     @staticmethod
     def resolve_display_picture_url(root, info, **kwargs) -> Union[str, None]:
         if root.display_picture:
-            return info.context.request.build_absolute_uri(
-                URLCachedFileField().to_representation(root.display_picture.file)
-            )
+            return info.context.dl.file_url.load(
+                str(root.display_picture.file)
+            ).then(info.context.request.build_absolute_uri)
 
 
 class UserType(DjangoObjectType):
@@ -146,11 +145,9 @@ class UserMeType(DjangoObjectType):
     @only_me
     def resolve_display_picture_url(root, info, **kwargs) -> Union[str, None]:
         if root.profile.display_picture:
-            return info.context.request.build_absolute_uri(
-                URLCachedFileField().to_representation(
-                    root.profile.display_picture.file,
-                )
-            )
+            return info.context.dl.file_url.load(
+                str(root.profile.display_picture.file)
+            ).then(info.context.request.build_absolute_uri)
 
     @staticmethod
     @only_me
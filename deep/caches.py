@@ -1,19 +1,26 @@
 import json
+import time
 import hashlib
+from collections import defaultdict
 from typing import Union
 
+from django.conf import settings
 from django.core.cache import cache, caches
+from django.db import transaction
 from django.core.serializers.json import DjangoJSONEncoder
 
 
 local_cache = caches['local-memory']
 
+_CACHE_MISS = object()
+
 
 def clear_cache(prefix):
+    """
+    Invalidate the caches using the namespace (See CacheHelper.gql_cache), old values are left for the TTL to clean up
+    """
     try:
-        cache.delete_many(
-            cache.keys(prefix + '*')
-        )
+        DataVersion.bump(DataVersion.NAMESPACE, prefix)
         return True
     except Exception:
         pass
@@ -27,6 +34,14 @@ class CacheKey:
     GENERIC_EXPORT_TASK_CACHE_KEY_FORMAT = 'GENERIC-EXPORT-{}-TASK-ID'
     PROJECT_EXPLORE_STATS_LOADER_KEY = 'project-explore-stats-loader'
     RECENT_ACTIVITIES_KEY_FORMAT = 'user-recent-activities-{}'
+    DATA_VERSION_KEY_FORMAT = 'data-version-{}-{}'
+    GQL_LIST_COUNT_KEY_FORMAT = 'gql-list-count-{}'
+    PROJECT_STATS_KEY_FORMAT = 'project-stats-{}'
+    GQL_CACHE_LOCK_KEY_FORMAT = 'gql-cache-lock-{}'
+    GEO_AREA_HIERARCHY_KEY_FORMAT = 'geo-area-hierarchy-{}-{}'
+    GEO_ADMIN_LEVEL_TILE_KEY_FORMAT = 'geo-admin-level-tile-{}-{}-{}-{}-{}'
+    GEO_ADMIN_LEVEL_CACHE_SCHEDULED_KEY_FORMAT = 'geo-admin-level-cache-scheduled-{}'
+    PROJECT_GEO_CACHE_SCHEDULED_KEY_FORMAT = 'project-geo-cache-scheduled-{}-{}'
 
     # Local (RAM) Cache
     TEMP_CLIENT_ID_KEY_FORMAT = 'client-id-mixin-{request_hash}-{instance_type}-{instance_id}'
@@ -62,6 +77,16 @@ class CacheKey:
         LAST_PROJECT_READ_ACCESS_DATETIME = BASE + 'LAST-PROJECT-READ-ACCESS-DATETIME-'
         LAST_PROJECT_WRITE_ACCESS_DATETIME = BASE + 'LAST-PROJECT-WRITE-ACCESS-DATETIME-'
         LAST_USER_ACTIVE_DATETIME = BASE + 'LAST-USER-ACTIVE-DATETIME-'
+        # Static
+        LEGACY_DATA_MIGRATED = BASE + 'LEGACY-DATA-MIGRATED'
+
+    class LibreOfficeConversion:
+        BASE = 'LIBREOFFICE-CONVERSION-'
+        # Conversions waiting for an idle worker
+        QUEUE_DEPTH = BASE + 'QUEUE-DEPTH'
+        # Reset when pushed as metric (See deep.tasks.put_celery_query_metric)
+        COUNT = BASE + 'COUNT'
+        DURATION_MS = BASE + 'DURATION-MS'
 
     class AssessmentDashboard:
         BASE = 'ASSESSMENT-DASHBOARD-'
@@ -116,6 +141,59 @@ class CacheKey:
             return clear_cache(cls.BASE)
 
 
+class DataVersion:
+    """
+    Monotonic data version counters per object, bumped when the data of the object changes.
+    Include them in cache keys so that values cached for an older version are never used again.
+    """
+    PROJECT = 'project'
+    ANALYSIS_FRAMEWORK = 'analysis-framework'
+    REGION = 'region'
+    # Group of cache keys, bumped using clear_cache(<namespace>)
+    NAMESPACE = 'namespace'
+
+    @staticmethod
+    def get_key(scope, pk):
+        return CacheKey.DATA_VERSION_KEY_FORMAT.format(scope, pk)
+
+    @classmethod
+    def _initialize(cls, key):
+        # Start from the current time so that the version keeps increasing even if the counter was evicted
+        cache.add(key, time.time_ns(), None)
+        return cache.get(key)
+
+    @classmethod
+    def get(cls, scope, pk) -> int:
+        key = cls.get_key(scope, pk)
+        version = cache.get(key)
+        if version is None:
+            version = cls._initialize(key)
+        return version
+
+    @classmethod
+    def bump(cls, scope, pk) -> int:
+        key = cls.get_key(scope, pk)
+        try:
+            return cache.incr(key)
+        except ValueError:
+            # Counter doesn't exist, a new one is always greater than the previous ones
+            return cls._initialize(key)
+
+    @classmethod
+    def bump_on_commit(cls, scope, pk):
+        if pk is None:
+            return
+        transaction.on_commit(lambda: cls.bump(scope, pk))
+
+    @classmethod
+    def bump_many_on_commit(cls, scope, pks):
+        # NOTE: Used by the bulk writes, which skip the model signals
+        pks = {pk for pk in pks if pk is not None}
+        if not pks:
+            return
+        transaction.on_commit(lambda: [cls.bump(scope, pk) for pk in pks])
+
+
 class CacheHelper:
     @staticmethod
     def calculate_md5_str(string):
@@ -141,21 +219,83 @@ class CacheHelper:
             raise Exception(f'Unknown Type: {type(item)}')
         return cls.calculate_md5_str(hashable)
 
+    # {<namespace>: [<cache_key>, ...]}, used to prefetch the sibling nodes of the namespace
+    _gql_cache_keys = defaultdict(list)
+
     @staticmethod
-    def gql_cache(cache_key, cache_key_gen=None, timeout=60):
+    def _gql_single_flight(cache_key, func):
+        """
+        Calculate the value only once for the concurrent misses, others wait for the value
+        """
+        lock_key = CacheKey.GQL_CACHE_LOCK_KEY_FORMAT.format(cache_key)
+        wait_timeout = settings.GQL_CACHE_SINGLE_FLIGHT_TIMEOUT
+        if not cache.add(lock_key, 1, wait_timeout):
+            wait_till = time.monotonic() + wait_timeout
+            while time.monotonic() < wait_till:
+                time.sleep(0.1)
+                value = cache.get(cache_key, _CACHE_MISS)
+                if value is not _CACHE_MISS:
+                    return value, False
+                if cache.add(lock_key, 1, wait_timeout):
+                    break
+            else:
+                # Lock holder is taking too long, calculate without the lock
+                return func(), True
+        try:
+            return func(), True
+        finally:
+            cache.delete(lock_key)
+
+    @classmethod
+    def gql_cache(cls, cache_key, cache_key_gen=None, timeout=60, namespace=None):
+        """
+        Two-tier cache: Per worker LRU (gql-local-memory) in front of the default cache.
+        With namespace, the sibling nodes of the namespace are fetched with a single get_many
+        """
+        if namespace:
+            cls._gql_cache_keys[namespace].append(cache_key)
+
         def _dec(func):
             def _caller(*args, **kwargs):
-                if cache_key_gen:
-                    _cache_key = cache_key.format(
-                        cache_key_gen(*args, **kwargs)
-                    )
+                key_gen_value = cache_key_gen(*args, **kwargs) if cache_key_gen else None
+
+                def _get_cache_key(key):
+                    if cache_key_gen:
+                        key = key.format(key_gen_value)
+                    if namespace:
+                        key = f'{key}-v{namespace_version}'
+                    return key
+
+                namespace_version = namespace and DataVersion.get(DataVersion.NAMESPACE, namespace)
+                _cache_key = _get_cache_key(cache_key)
+                gql_local_cache = caches['gql-local-memory']
+                local_cache_timeout = min(timeout, gql_local_cache.default_timeout)
+
+                # -- Local
+                value = gql_local_cache.get(_cache_key, _CACHE_MISS)
+                if value is not _CACHE_MISS:
+                    return value
+
+                # -- Default
+                prefetch_marker_key = f'{namespace}-{key_gen_value}-v{namespace_version}-prefetched'
+                if namespace and gql_local_cache.add(prefetch_marker_key, True, local_cache_timeout):
+                    # First miss of the namespace, fetch the siblings as well
+                    values = cache.get_many(list({
+                        _get_cache_key(key): None
+                        for key in cls._gql_cache_keys[namespace]
+                    }))
+                    gql_local_cache.set_many(values, local_cache_timeout)
+                    value = values.get(_cache_key, _CACHE_MISS)
                 else:
-                    _cache_key = cache_key
-                return cache.get_or_set(
-                    _cache_key,
-                    lambda: func(*args, **kwargs),
-                    timeout,
-                )
+                    value = cache.get(_cache_key, _CACHE_MISS)
+
+                # -- Calculate
+                if value is _CACHE_MISS:
+                    value, is_calculated = cls._gql_single_flight(_cache_key, lambda: func(*args, **kwargs))
+                    if is_calculated:
+                        cache.set(_cache_key, value, timeout)
+                gql_local_cache.set(_cache_key, value, local_cache_timeout)
+                return value
             _caller.__name__ = func.__name__
             _caller.__module__ = func.__module__
             return _caller
@@ -1,6 +1,8 @@
+from promise import Promise
 from django.utils.functional import cached_property
 
-from utils.graphene.dataloaders import WithContextMixin
+from utils.graphene.dataloaders import DataLoaderWithContext, WithContextMixin
+from deep.serializers import URLCachedFileField
 
 from project.dataloaders import DataLoaders as ProjectDataLoaders
 from user.dataloaders import DataLoaders as UserDataLoaders
@@ -19,7 +21,18 @@ from assisted_tagging.dataloaders import DataLoaders as AssistedTaggingLoaders
 from notification.dataloaders import DataLoaders as AssignmentLoaders
 
 
+class FileUrlLoader(DataLoaderWithContext):
+    def batch_load_fn(self, keys):
+        # Signed urls using file names (See URLCachedFileField.names_to_representation)
+        urls = URLCachedFileField.names_to_representation(keys)
+        return Promise.resolve([urls[str(key)] for key in keys])
+
+
 class GlobalDataLoaders(WithContextMixin):
+    @cached_property
+    def file_url(self):
+        return FileUrlLoader(context=self.context)
+
     @cached_property
     def user_group(self):
         return UserGroupDataLoaders(context=self.context)
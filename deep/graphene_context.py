@@ -20,6 +20,8 @@ class GQLContext:
         # UserGroup
         self.active_ug = self.request.active_ug = None
         self.ug_permissions = []
+        # Memoized values for the current request
+        self.request_cache = {}
 
     def set_active_project(self, project):
         self.active_project = self.request.active_project = project
@@ -1,12 +1,15 @@
 import json
+from typing import Dict, Iterable, Optional
 
+from django.db import models
+from django.core.exceptions import ObjectDoesNotExist
 from django.utils.functional import cached_property
 from django.core.files.storage import FileSystemStorage, get_storage_class, default_storage
 from django.core.serializers.json import DjangoJSONEncoder
 from django.core.cache import cache
 from rest_framework import serializers
 
-from deep.caches import local_cache, CacheKey
+from deep.caches import local_cache, CacheKey, CacheHelper
 from deep.middleware import get_s3_signed_url_ttl
 
 StorageClass = get_storage_class()
@@ -53,7 +56,8 @@ class RecursiveSerializer(serializers.Serializer):
 class URLCachedFileField(serializers.FileField):
     @classmethod
     def get_cache_key(cls, filename):
-        return CacheKey.URL_CACHED_FILE_FIELD_KEY_FORMAT.format(hash(filename))
+        # NOTE: Using md5 as hash() is randomized per process
+        return CacheKey.URL_CACHED_FILE_FIELD_KEY_FORMAT.format(CacheHelper.calculate_md5_str(filename.encode()))
 
     @staticmethod
     def generate_url(name, parameters=None):
@@ -63,29 +67,94 @@ class URLCachedFileField(serializers.FileField):
         return default_storage.url(str(name), parameters=parameters)
 
     @classmethod
-    def name_to_representation(cls, name):
+    def names_to_representation(cls, names: Iterable) -> Dict[str, Optional[str]]:
         """
-        Caching signed url server-side
+        Caching signed url server-side (Batch)
+        Cached urls are fetched using a single get_many, misses are signed locally and saved using a single set_many
         NOTE: Using storage_class.url directly
         Assumptions:
             - Single storage is used (accessable by get_storage_class)
             - Either FileSystemStorage(local/default) or S3Boto3Storage(prod/deep.s3_storages.MediaStorage) is used.
         """
-        name = str(name)
+        names = set(str(name) for name in names)
 
         if StorageClass == FileSystemStorage:
-            return default_storage.url(name)
+            return {
+                name: default_storage.url(name)
+                for name in names
+            }
 
         # Cache for S3Boto3Storage
-        if not name:
-            return None
-        key = URLCachedFileField.get_cache_key(name)
-        url = cache.get(key)
-        if url:
-            return url
-        url = default_storage.url(name)
-        cache.set(key, url, get_s3_signed_url_ttl())
-        return url
+        urls = {
+            name: None
+            for name in names
+            if not name
+        }
+        name_by_key = {
+            cls.get_cache_key(name): name
+            for name in names
+            if name
+        }
+        if not name_by_key:
+            return urls
+        cached_urls = cache.get_many(list(name_by_key))
+        signed_urls = {}
+        for key, name in name_by_key.items():
+            url = cached_urls.get(key)
+            if not url:
+                url = signed_urls[key] = default_storage.url(name)
+            urls[name] = url
+        if signed_urls:
+            cache.set_many(signed_urls, get_s3_signed_url_ttl())
+        return urls
+
+    @classmethod
+    def name_to_representation(cls, name):
+        """
+        Caching signed url server-side (See names_to_representation)
+        """
+        name = str(name)
+        return cls.names_to_representation([name])[name]
+
+    def _get_serializer_urls(self) -> Dict[str, Optional[str]]:
+        """
+        Urls for the current serialization.
+        For list serializer, urls of this field for all the items are resolved with the first item.
+        """
+        root = self.root
+        # NOTE: Root serializer is created per response
+        urls = root.__dict__.setdefault('_url_cached_file_field_urls', {})
+        prefetched_fields = root.__dict__.setdefault('_url_cached_file_field_prefetched_fields', set())
+        if (
+            id(self) in prefetched_fields or
+            not isinstance(root, serializers.ListSerializer) or
+            root.instance is None
+        ):
+            return urls
+        prefetched_fields.add(id(self))
+
+        # Source path from the list item to this field
+        source_attrs = []
+        field = self
+        while field is not root.child:
+            if field is None or isinstance(field, serializers.ListSerializer):
+                return urls
+            source_attrs = field.source_attrs + source_attrs
+            field = field.parent
+
+        instances = root.instance
+        if isinstance(instances, models.Manager):
+            instances = instances.all()
+        names = []
+        for instance in instances:
+            try:
+                file = serializers.get_attribute(instance, source_attrs)
+            except (AttributeError, KeyError, ObjectDoesNotExist):
+                continue
+            if file:
+                names.append(file.name)
+        urls.update(self.names_to_representation(names))
+        return urls
 
     # obj is django models.FileField
     def to_representation(self, obj):
@@ -102,13 +171,10 @@ class URLCachedFileField(serializers.FileField):
         # Cache for S3Boto3Storage
         if not obj:
             return None
-        key = URLCachedFileField.get_cache_key(obj.name)
-        url = cache.get(key)
-        if url:
-            return url
-        url = super().to_representation(obj)
-        cache.set(key, url, get_s3_signed_url_ttl())
-        return url
+        urls = self._get_serializer_urls()
+        if obj.name not in urls:
+            urls.update(self.names_to_representation([obj.name]))
+        return urls[obj.name]
 
 
 # required=False List Integer Field
@@ -101,6 +101,7 @@ env = environ.Env(
     UNHCR_PORTAL_API_KEY=(str, None),
     # Misc
     ALLOW_DUMMY_DATA_GENERATION=(bool, False),
+    GEO_AREA_IMPORT_WORKERS=(int, 4),
 )
 
 # Quick-start development settings - unsuitable for production
@@ -491,10 +492,16 @@ CELERY_BEAT_SCHEDULE = {
         # Every 6 hour
         'schedule': crontab(minute=0, hour='*/6'),
     },
+    'project_flush_stats': {
+        'task': 'project.tasks.flush_project_stats_cache',
+        # Every minute (Only projects with activity)
+        'schedule': crontab(minute="*/1"),
+    },
     'project_generate_stats': {
+        # Reconciliation (Counters drift and activity timeframe)
         'task': 'project.tasks.generate_project_stats_cache',
-        # Every 5 min
-        'schedule': crontab(minute="*/5"),
+        # Every day at 00:05
+        'schedule': crontab(minute=5, hour=0),
     },
     # UNIFIED CONNECTORS
     'schedule_trigger_quick_unified_connectors': {
@@ -548,6 +555,12 @@ CELERY_BEAT_SCHEDULE = {
         # Every day at 01:00
         'schedule': crontab(minute=0, hour=1),
     },
+    # Export
+    'evict_export_cache': {
+        'task': 'export.tasks.evict_export_cache_task',
+        # Every hour
+        'schedule': crontab(minute=30),
+    },
     'schedule_tracker_data_handler': {
         'task': 'deep.trackers.schedule_tracker_data_handler',
         # Every 6 hours
@@ -576,7 +589,16 @@ CACHES = {
     },
     'local-memory': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+    },
+    # Per worker LRU in front of the default cache (See deep.caches.CacheHelper.gql_cache)
+    'gql-local-memory': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'gql-local-memory',
+        'TIMEOUT': 60,
+        'OPTIONS': {
+            'MAX_ENTRIES': 2000,
+        },
+    },
 }
 
 # RELIEF WEB
@@ -839,6 +861,24 @@ OPEN_API_DOCS_TIMEOUT = 86400  # 24 Hours
 
 ANALYTICAL_STATEMENT_COUNT = 30  # max no of analytical statement that can be created
 ANALYTICAL_ENTRIES_COUNT = 50  # max no of entries that can be created in analytical_statement
+# Entries exports are split into shards processed in parallel above this number of entries (Excel/JSON)
+EXPORT_ENTRIES_SHARD_THRESHOLD = 20000
+EXPORT_ENTRIES_SHARDS_COUNT = 4
+# Identical entries exports reuse the previous export file (See export.models.ExportCache)
+EXPORT_CACHE_TIMEOUT_DAYS = 7
+EXPORT_CACHE_MAX_SIZE = 10 * 1024 * 1024 * 1024  # 10GB (Least recently used are evicted first)
+# Report export images are downscaled and cached in local disk (See export.formats.images.ImagePrefetcher)
+EXPORT_IMAGE_CACHE_DIR = os.path.join(TEMP_DIR, 'export-image-cache')
+EXPORT_IMAGE_CACHE_MAX_SIZE = 1024 * 1024 * 1024  # 1GB
+EXPORT_IMAGE_MAX_WIDTH = 1600  # px
+EXPORT_IMAGE_DOWNLOAD_WORKERS = 8
+# LibreOffice conversions (See utils.libreoffice), pool size is per process
+LIBREOFFICE_BIN = 'libreoffice'
+LIBREOFFICE_UNOSERVER_BIN = 'unoserver'
+LIBREOFFICE_POOL_SIZE = 1
+LIBREOFFICE_CONVERSION_TIMEOUT = 300  # seconds
+LIBREOFFICE_WORKER_STARTUP_TIMEOUT = 30  # seconds
+LIBREOFFICE_WORKER_MAX_CONVERSIONS = 50  # Restart worker after this many conversions
 DEFAULT_AUTO_FIELD = 'django.db.models.AutoField'
 
 # DEBUG TOOLBAR CONFIGURATION
@@ -972,6 +1012,20 @@ GRAPHENE_DJANGO_EXTRAS = {
     'DEFAULT_PAGE_SIZE': 20,
     'MAX_PAGE_SIZE': 50,
 }
+# Total count of the opt-in list types (See utils.graphene.pagination.ListCountStrategy)
+GRAPHENE_LIST_ESTIMATED_COUNT_THRESHOLD = 100000  # Planner estimate is used above this
+GRAPHENE_LIST_CACHED_COUNT_THRESHOLD = 1000  # Exact count is cached (per project data version) above this
+GRAPHENE_LIST_COUNT_CACHE_TIMEOUT = 60 * 60  # seconds
+# Project dashboard stats (See project.tasks.get_project_stats)
+PROJECT_STATS_CACHE_TIMEOUT = 60 * 60  # seconds
+# Concurrent misses of CacheHelper.gql_cache wait for the first one to calculate the value
+GQL_CACHE_SINGLE_FLIGHT_TIMEOUT = 30  # seconds
+# Region geo area hierarchy, cached per region cache_index (See geo.hierarchy.GeoAreaHierarchy)
+GEO_AREA_HIERARCHY_CACHE_TIMEOUT = 60 * 60 * 24  # seconds
+# Processes used to simplify the geometries while importing the geo areas (See geo.tasks._import_geo_areas)
+GEO_AREA_IMPORT_WORKERS = env('GEO_AREA_IMPORT_WORKERS')
+# Admin level vector tiles, cached per region data version (See geo.geojson.get_admin_level_tile)
+GEO_ADMIN_LEVEL_TILE_CACHE_TIMEOUT = 60 * 60 * 24  # seconds
 
 UNHCR_PORTAL_API_KEY = env('UNHCR_PORTAL_API_KEY')
 
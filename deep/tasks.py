@@ -3,8 +3,10 @@ from collections import defaultdict
 
 import boto3
 from django.conf import settings
+from django.core.cache import cache
 from celery import shared_task
 
+from deep.caches import CacheKey
 from deep.celery import app as celery_app, CeleryQueue
 
 
@@ -56,10 +58,48 @@ def _get_celery_queue_length_metric():
         }
 
 
+def _get_libreoffice_conversion_metric():
+    LibreOfficeConversion = CacheKey.LibreOfficeConversion
+    values = cache.get_many([
+        LibreOfficeConversion.QUEUE_DEPTH,
+        LibreOfficeConversion.COUNT,
+        LibreOfficeConversion.DURATION_MS,
+    ])
+    # Count/Duration are since the last push
+    cache.delete_many([
+        LibreOfficeConversion.COUNT,
+        LibreOfficeConversion.DURATION_MS,
+    ])
+    count = values.get(LibreOfficeConversion.COUNT) or 0
+    current_timestamp = int(datetime.datetime.now().timestamp())
+    dimensions = [
+        {
+            'Name': 'Environment',
+            'Value': settings.DEEP_ENVIRONMENT,
+        },
+    ]
+    yield {
+        'MetricName': 'libreoffice-conversion-queue-depth',
+        'Value': max(values.get(LibreOfficeConversion.QUEUE_DEPTH) or 0, 0),
+        'Unit': 'Count',
+        'Timestamp': current_timestamp,
+        'Dimensions': dimensions,
+    }
+    if count:
+        yield {
+            'MetricName': 'libreoffice-conversion-latency',
+            'Value': (values.get(LibreOfficeConversion.DURATION_MS) or 0) / count,
+            'Unit': 'Milliseconds',
+            'Timestamp': current_timestamp,
+            'Dimensions': dimensions,
+        }
+
+
 @shared_task
 def put_celery_query_metric():
     metrics = [
         *_get_celery_queue_length_metric(),
+        *_get_libreoffice_conversion_metric(),
     ]
 
     cloudwatch = boto3.client('cloudwatch')
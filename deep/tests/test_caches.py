@@ -0,0 +1,81 @@
+from django.core.cache import cache
+
+from deep.tests import TestCase
+from deep.caches import CacheHelper, DataVersion, clear_cache
+
+
+class CacheHelperTests(TestCase):
+    NAMESPACE = 'TEST-GQL-CACHE-'
+
+    def test_gql_cache(self):
+        calls = []
+
+        def _get_resolver(key):
+            @CacheHelper.gql_cache(
+                self.NAMESPACE + key + '-{}',
+                cache_key_gen=lambda root, *_: root,
+                namespace=self.NAMESPACE,
+            )
+            def _resolver(root, info):
+                calls.append(key)
+                return f'{key}-{root}'
+            return _resolver
+
+        resolve_a, resolve_b = _get_resolver('a'), _get_resolver('b')
+        # Old values from the previous runs
+        clear_cache(self.NAMESPACE)
+
+        assert resolve_a('x', None) == 'a-x'
+        assert resolve_a('x', None) == 'a-x'
+        assert calls == ['a']
+        assert resolve_b('x', None) == 'b-x'
+        assert resolve_a('y', None) == 'a-y'
+        assert calls == ['a', 'b', 'a']
+
+        # Values are fetched from the default cache
+        assert resolve_b('x', None) == 'b-x'
+        assert calls == ['a', 'b', 'a']
+
+        # Invalidated using the namespace
+        clear_cache(self.NAMESPACE)
+        assert resolve_a('x', None) == 'a-x'
+        assert calls == ['a', 'b', 'a', 'a']
+
+
+class DataVersionTests(TestCase):
+    def test_bump(self):
+        key = DataVersion.get_key(DataVersion.PROJECT, 'test-data-version')
+        cache.delete(key)
+        version = DataVersion.get(DataVersion.PROJECT, 'test-data-version')
+        assert DataVersion.get(DataVersion.PROJECT, 'test-data-version') == version
+        # Other objects have their own version
+        assert DataVersion.get_key(DataVersion.REGION, 'test-data-version') != key
+
+        assert DataVersion.bump(DataVersion.PROJECT, 'test-data-version') > version
+        bumped_version = DataVersion.get(DataVersion.PROJECT, 'test-data-version')
+        assert bumped_version > version
+
+        # Evicted counter, the new version is still greater than the previous ones
+        cache.delete(key)
+        assert DataVersion.bump(DataVersion.PROJECT, 'test-data-version') > bumped_version
+
+    def test_cache_key_uses_version(self):
+        calls = []
+
+        @CacheHelper.gql_cache(
+            'TEST-DATA-VERSION-{}',
+            cache_key_gen=lambda root, *_: f'{root}-{DataVersion.get(DataVersion.PROJECT, root)}',
+        )
+        def _resolver(root, info):
+            calls.append(root)
+            return root
+
+        cache.delete(DataVersion.get_key(DataVersion.PROJECT, 'test-version-key'))
+        _resolver('test-version-key', None)
+        _resolver('test-version-key', None)
+        assert len(calls) == 1
+        with self.captureOnCommitCallbacks(execute=True):
+            DataVersion.bump_on_commit(DataVersion.PROJECT, 'test-version-key')
+        # Moved to a new key
+        _resolver('test-version-key', None)
+        assert len(calls) == 2
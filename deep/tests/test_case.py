@@ -39,7 +39,11 @@ TEST_CACHES = {
     },
     'local-memory': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+    },
+    # Shared between the tests, which can return values of previous tests
+    'gql-local-memory': {
+        'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+    },
 }
 
 DUMMY_TEST_CACHES = {
@@ -67,6 +71,8 @@ def clean_up_test_media_files(path):
     CACHES=TEST_CACHES,
     CELERY_TASK_ALWAYS_EAGER=True,
     DEEPL_SERVER_CALLBACK_DOMAIN='http://testserver',
+    # Region cache_index is not updated when the geo areas are created using the factories
+    GEO_AREA_HIERARCHY_CACHE_TIMEOUT=0,
 )
 class TestCase(test.APITestCase):
     def setUp(self):
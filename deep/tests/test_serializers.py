@@ -0,0 +1,93 @@
+from types import SimpleNamespace
+from unittest.mock import patch, Mock
+
+from django.core.cache import cache
+from promise import Promise
+from rest_framework import serializers
+
+from deep.tests import TestCase
+from deep.dataloaders import FileUrlLoader
+from deep.serializers import URLCachedFileField
+
+
+class FileAttachmentSerializer(serializers.Serializer):
+    file = URLCachedFileField()
+
+
+class DottedSourceSerializer(serializers.Serializer):
+    file = URLCachedFileField(source='attachment.file')
+
+
+class NestedSerializer(serializers.Serializer):
+    attachment = FileAttachmentSerializer()
+
+
+class URLCachedFileFieldTests(TestCase):
+    def setUp(self):
+        super().setUp()
+        # Signed urls are only cached for S3 storage
+        self.storage_class_patch = patch('deep.serializers.StorageClass', object)
+        self.storage_patch = patch('deep.serializers.default_storage')
+        self.cache_patch = patch('deep.serializers.cache', Mock(wraps=cache))
+        self.storage_class_patch.start()
+        self.storage = self.storage_patch.start()
+        self.storage.url.side_effect = lambda name: f'https://signed/{name}'
+        self.cache = self.cache_patch.start()
+
+    def tearDown(self):
+        self.cache_patch.stop()
+        self.storage_patch.stop()
+        self.storage_class_patch.stop()
+        super().tearDown()
+
+    def _get_items(self, prefix, count):
+        names = [f'{prefix}/file-{i}.pdf' for i in range(count)]
+        cache.delete_many([URLCachedFileField.get_cache_key(name) for name in names])
+        items = [
+            SimpleNamespace(attachment=SimpleNamespace(file=SimpleNamespace(name=name)))
+            for name in names
+        ]
+        # Items without a file
+        items.append(SimpleNamespace(attachment=SimpleNamespace(file=None)))
+        return names, items
+
+    def _serialize(self, serializer_class, items):
+        self.cache.reset_mock()
+        self.storage.url.reset_mock()
+        return serializer_class(items, many=True).data
+
+    def _assert_batched(self, get_many_count, set_many_count, signed_count):
+        assert self.cache.get_many.call_count == get_many_count
+        assert self.cache.set_many.call_count == set_many_count
+        assert self.cache.get.call_count == 0
+        assert self.cache.set.call_count == 0
+        assert self.storage.url.call_count == signed_count
+
+    def test_list_with_dotted_source(self):
+        names, items = self._get_items('dotted-source', 5)
+        data = self._serialize(DottedSourceSerializer, items)
+        assert [item['file'] for item in data] == [*[f'https://signed/{name}' for name in names], None]
+        self._assert_batched(1, 1, 5)
+
+        # Cached urls are used
+        assert self._serialize(DottedSourceSerializer, items) == data
+        self._assert_batched(1, 0, 0)
+
+    def test_list_with_nested_serializer(self):
+        names, items = self._get_items('nested-serializer', 5)
+        data = self._serialize(NestedSerializer, items)
+        assert [item['attachment']['file'] for item in data] == [*[f'https://signed/{name}' for name in names], None]
+        self._assert_batched(1, 1, 5)
+
+    def test_single_item(self):
+        names, items = self._get_items('single-item', 1)
+        assert DottedSourceSerializer(items[0]).data['file'] == f'https://signed/{names[0]}'
+        assert DottedSourceSerializer(items[-1]).data['file'] is None
+
+    def test_file_url_loader(self):
+        names, _ = self._get_items('file-url-loader', 3)
+        loader = FileUrlLoader(context=None)
+        urls = Promise.all([loader.load(name) for name in [*names, names[0]]]).get()
+        assert urls == [*[f'https://signed/{name}' for name in names], f'https://signed/{names[0]}']
+        # Single batch for all the urls of the request
+        self._assert_batched(1, 1, 3)
@@ -0,0 +1,104 @@
+import datetime
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.utils import timezone
+from django_redis import get_redis_connection
+
+from deep.tests import TestCase
+from deep.caches import CacheKey
+from deep.trackers import (
+    TrackerAction,
+    track_project,
+    track_user,
+    update_entity_data_in_bulk,
+    schedule_tracker_data_handler,
+)
+from project.factories import ProjectFactory
+from project.models import Project
+from user.factories import UserFactory
+
+
+class TrackerTests(TestCase):
+    TRACKER_KEYS = [
+        CacheKey.Tracker.LAST_PROJECT_READ_ACCESS_DATETIME,
+        CacheKey.Tracker.LAST_PROJECT_WRITE_ACCESS_DATETIME,
+        CacheKey.Tracker.LAST_USER_ACTIVE_DATETIME,
+    ]
+
+    def setUp(self):
+        super().setUp()
+        self.redis = get_redis_connection()
+        self.redis.delete(*[cache.make_key(key) for key in self.TRACKER_KEYS])
+        self.now = timezone.now().replace(microsecond=0)
+
+    def _get_tracked_data(self, tracker_key):
+        return {
+            int(pk): value.decode()
+            for pk, value in self.redis.hgetall(cache.make_key(tracker_key)).items()
+        }
+
+    def _track_project_at(self, project, datetime_value, **kwargs):
+        with patch('deep.trackers.timezone.now', return_value=datetime_value):
+            track_project(project, **kwargs)
+
+    def test_track_and_update_in_bulk(self):
+        project1, project2 = ProjectFactory.create_batch(2)
+        profile = UserFactory.create().profile
+        self._track_project_at(project1, self.now)
+        self._track_project_at(project2, self.now)
+        self._track_project_at(project2, self.now, action=TrackerAction.Project.WRITE)
+        track_user(profile)
+
+        # Stored in a hash per tracker
+        read_key = CacheKey.Tracker.LAST_PROJECT_READ_ACCESS_DATETIME
+        assert self._get_tracked_data(read_key) == {
+            project1.pk: self.now.isoformat(),
+            project2.pk: self.now.isoformat(),
+        }
+        assert list(self._get_tracked_data(CacheKey.Tracker.LAST_PROJECT_WRITE_ACCESS_DATETIME)) == [project2.pk]
+        assert list(self._get_tracked_data(CacheKey.Tracker.LAST_USER_ACTIVE_DATETIME)) == [profile.pk]
+
+        new_datetime = self.now + datetime.timedelta(minutes=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            update_entity_data_in_bulk(Project, read_key, 'last_read_access')
+            # Tracked again after the data is read
+            self._track_project_at(project2, new_datetime)
+
+        project1.refresh_from_db()
+        project2.refresh_from_db()
+        assert project1.last_read_access == self.now
+        assert project2.last_read_access == self.now
+        # Only the unchanged fields are removed
+        assert self._get_tracked_data(read_key) == {project2.pk: new_datetime.isoformat()}
+
+        with self.captureOnCommitCallbacks(execute=True):
+            schedule_tracker_data_handler()
+        project2.refresh_from_db()
+        profile.refresh_from_db()
+        assert project2.last_read_access == new_datetime
+        assert project2.last_write_access == self.now
+        assert profile.last_active is not None
+        for tracker_key in self.TRACKER_KEYS:
+            assert self._get_tracked_data(tracker_key) == {}
+
+    def test_legacy_tracker_data(self):
+        project = ProjectFactory.create()
+        read_key = CacheKey.Tracker.LAST_PROJECT_READ_ACCESS_DATETIME
+        cache.delete(CacheKey.Tracker.LEGACY_DATA_MIGRATED)
+        # Stored as a key per entity before
+        cache.set(f'{read_key}{project.pk}', self.now, None)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            schedule_tracker_data_handler()
+        project.refresh_from_db()
+        assert project.last_read_access == self.now
+        assert cache.get(f'{read_key}{project.pk}') is None
+        assert self._get_tracked_data(read_key) == {}
+
+        # Migrated only once
+        cache.set(f'{read_key}{project.pk}', self.now, None)
+        with self.captureOnCommitCallbacks(execute=True):
+            schedule_tracker_data_handler()
+        assert cache.get(f'{read_key}{project.pk}') == self.now
+        cache.delete(f'{read_key}{project.pk}')
@@ -3,9 +3,11 @@ from enum import Enum, auto, unique
 
 from django.core.cache import cache
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from django.db import transaction, models
 from celery import shared_task
 from dateutil.relativedelta import relativedelta
+from django_redis import get_redis_connection
 
 from deep.caches import CacheKey
 
@@ -20,23 +22,30 @@ class TrackerAction:
         WRITE = auto()
 
 
+# NOTE: Tracker data are stored in a redis hash per tracker ({<entity id>: <datetime>}), so no KEYS scan is required
+def _track_entity(tracker_key, pk):
+    get_redis_connection().hset(cache.make_key(tracker_key), pk, timezone.now().isoformat())
+
+
 def track_project(project: Project, action: TrackerAction.Project = TrackerAction.Project.READ):
     cache_key = CacheKey.Tracker.LAST_PROJECT_READ_ACCESS_DATETIME
     if action == TrackerAction.Project.WRITE:
         cache_key = CacheKey.Tracker.LAST_PROJECT_WRITE_ACCESS_DATETIME
-    cache.set(
-        cache_key + str(project.pk),
-        timezone.now(),
-        None,  # Cache value forever until manually removed
-    )
+    _track_entity(cache_key, project.pk)
 
 
 def track_user(user_profile: Profile):
-    cache.set(
-        CacheKey.Tracker.LAST_USER_ACTIVE_DATETIME + str(user_profile.pk),
-        timezone.now(),
-        None,  # Cache value forever until manually removed
-    )
+    _track_entity(CacheKey.Tracker.LAST_USER_ACTIVE_DATETIME, user_profile.pk)
+
+
+# Remove the hash fields only if they are not updated after read
+HDEL_IF_UNCHANGED_SCRIPT = """
+for i = 1, #ARGV, 2 do
+    if redis.call('HGET', KEYS[1], ARGV[i]) == ARGV[i + 1] then
+        redis.call('HDEL', KEYS[1], ARGV[i])
+    end
+end
+"""
 
 
 @transaction.atomic
@@ -45,20 +54,51 @@ def update_entity_data_in_bulk(
     cache_key_prefix: str,
     field: str,
 ):
-    cache_keys = cache.keys(cache_key_prefix + '*')
-    entities_update = []
-    for key, value in cache.get_many(cache_keys).items():
-        entities_update.append(
-            Model(**{
-                'id': key.split(cache_key_prefix)[1],
-                field: value,
-            })
-        )
+    client = get_redis_connection()
+    tracker_key = cache.make_key(cache_key_prefix)
+    tracked_data = client.hgetall(tracker_key)
+    entities_update = [
+        Model(**{
+            'id': int(pk),
+            field: parse_datetime(value.decode()),
+        })
+        for pk, value in tracked_data.items()
+    ]
     if entities_update:
         Model.objects.bulk_update(entities_update, fields=[field], batch_size=200)
-    transaction.on_commit(
-        lambda: cache.delete_many(cache_keys)
-    )
+        transaction.on_commit(
+            lambda: client.eval(
+                HDEL_IF_UNCHANGED_SCRIPT,
+                1,
+                tracker_key,
+                *[item for pk_value in tracked_data.items() for item in pk_value],
+            )
+        )
+
+
+def migrate_legacy_tracker_data():
+    """
+    Move the tracker data stored as one cache key per entity (<prefix><entity id>) into the tracker hash.
+    Runs once (SCAN of the legacy keys), newer values already in the hash are kept.
+    """
+    if cache.get(CacheKey.Tracker.LEGACY_DATA_MIGRATED):
+        return
+    client = get_redis_connection()
+    for cache_key_prefix in [
+        CacheKey.Tracker.LAST_PROJECT_READ_ACCESS_DATETIME,
+        CacheKey.Tracker.LAST_PROJECT_WRITE_ACCESS_DATETIME,
+        CacheKey.Tracker.LAST_USER_ACTIVE_DATETIME,
+    ]:
+        tracker_key = cache.make_key(cache_key_prefix)
+        legacy_keys = [
+            key
+            for key in cache.iter_keys(cache_key_prefix + '*')
+            if key[len(cache_key_prefix):].isdigit()
+        ]
+        for key, value in cache.get_many(legacy_keys).items():
+            client.hsetnx(tracker_key, key[len(cache_key_prefix):], value.isoformat())
+        cache.delete_many(legacy_keys)
+    cache.set(CacheKey.Tracker.LEGACY_DATA_MIGRATED, True, None)
 
 
 def update_project_data_in_bulk():
@@ -123,5 +163,6 @@ def schedule_tracker_data_handler():
     """
     Read tracker data from cache and update respective DB data
     """
+    migrate_legacy_tracker_data()
     update_project_data_in_bulk()
     update_user_data_in_bulk()
@@ -65,6 +65,7 @@ from geo.views import (
     GeoAreasLoadTriggerView,
     GeoJsonView,
     GeoBoundsView,
+    GeoTileView,
     GeoOptionsView,
     GeoAreaView
 )
@@ -546,6 +547,8 @@ urlpatterns = [
             GeoJsonView.as_view()),
     re_path(get_api_path(r'admin-levels/(?P<admin_level_id>\d+)/geojson/bounds/$'),
             GeoBoundsView.as_view()),
+    re_path(get_api_path(r'admin-levels/(?P<admin_level_id>\d+)/tiles/(?P<z>\d+)/(?P<x>\d+)/(?P<y>\d+)\.mvt$'),
+            GeoTileView.as_view()),
     re_path(get_api_path(r'geo-options/$'),
             GeoOptionsView.as_view()),
 
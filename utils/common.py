@@ -608,3 +608,18 @@ def render_string_for_graphql(text):
     if text == '':
         return None
     return text
+
+
+def get_save_update_fields(instance, exclude_fields):
+    """
+    Fields saved by Model.save without update_fields (all loaded fields) without the exclude_fields.
+    Used for the fields managed using SQL, so that a save doesn't overwrite them with the stale instance values.
+    """
+    deferred_fields = instance.get_deferred_fields()
+    return [
+        field.name
+        for field in instance._meta.concrete_fields
+        if not field.primary_key and
+        field.name not in exclude_fields and
+        field.attname not in deferred_fields
+    ]
@@ -1,4 +1,4 @@
-from django.db.models import Func, Transform, BooleanField
+from django.db.models import Func, Transform, BooleanField, FloatField, Value
 from django.contrib.gis.db.models.fields import BaseSpatialField
 from django.contrib.gis.db.models.functions import GeoFuncMixin
 
@@ -21,3 +21,15 @@ class IsEmpty(GeoFuncMixin, Transform):
     # Remove this after Upgrade to Django 4
     lookup_name = "isempty"
     output_field = BooleanField()
+
+
+class TrigramWordSimilarity(Func):
+    # From https://github.com/django/django/blob/4.0/django/contrib/postgres/search.py
+    # Remove this after Upgrade to Django 4
+    function = 'WORD_SIMILARITY'
+    output_field = FloatField()
+
+    def __init__(self, string, expression, **extra):
+        if not hasattr(string, 'resolve_expression'):
+            string = Value(string)
+        super().__init__(string, expression, **extra)
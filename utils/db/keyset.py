@@ -0,0 +1,101 @@
+import datetime
+from typing import List, Optional, Tuple
+
+from django.core.exceptions import FieldDoesNotExist
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.db.models.constants import LOOKUP_SEP
+
+
+class KeysetJSONEncoder(DjangoJSONEncoder):
+    """
+    DjangoJSONEncoder truncates datetime/time to milliseconds.
+    Rows in the same millisecond as the keyset values would be skipped by the keyset filter.
+    """
+    def default(self, o):
+        if isinstance(o, (datetime.datetime, datetime.time)):
+            return o.isoformat()
+        return super().default(o)
+
+
+def _is_keyset_ordering_field(qs, field):
+    """
+    Fields compared using their own value. Not relations ordered by the related model ordering or multi-valued.
+    """
+    field_path = field.lstrip('-').split(LOOKUP_SEP)
+    if field_path[0] in qs.query.annotations:
+        return len(field_path) == 1
+    opts = qs.model._meta
+    model_field = None
+    for name in field_path:
+        try:
+            model_field = opts.pk if name == 'pk' else opts.get_field(name)
+        except FieldDoesNotExist:
+            return False
+        if model_field.is_relation:
+            if model_field.many_to_many or model_field.one_to_many or model_field.related_model is None:
+                return False
+            opts = model_field.related_model._meta
+    return not (model_field.is_relation and opts.ordering and name != model_field.attname)
+
+
+def get_keyset_ordering(qs) -> Optional[List[str]]:
+    """
+    Ordering of the queryset (order_by or model ordering) + pk as tie breaker.
+    Returns None if the ordering can't be used for keyset filters (expressions/random/related model ordering)
+    """
+    query = qs.query
+    ordering = list(query.order_by or (query.get_meta().ordering if query.default_ordering else []))
+    if any(
+        not isinstance(field, str) or field == '?' or not _is_keyset_ordering_field(qs, field)
+        for field in ordering
+    ):
+        return None
+    if not any(field.lstrip('-') in ('pk', qs.model._meta.pk.name) for field in ordering):
+        ordering.append('-pk' if ordering and ordering[-1].startswith('-') else 'pk')
+    return ordering
+
+
+def _get_keyset_filters(ordering, values) -> Tuple[Q, Q]:
+    keyset_filter = Q(pk__in=[])
+    equal_filter = Q()
+    for field, value in zip(ordering, values):
+        field_name = field.lstrip('-')
+        descending = field.startswith('-')
+        if value is None:
+            after_filter = Q(**{f'{field_name}__isnull': False}) if descending else Q(pk__in=[])
+            current_equal_filter = Q(**{f'{field_name}__isnull': True})
+        else:
+            if descending:
+                after_filter = Q(**{f'{field_name}__lt': value})
+            else:
+                after_filter = Q(**{f'{field_name}__gt': value}) | Q(**{f'{field_name}__isnull': True})
+            current_equal_filter = Q(**{field_name: value})
+        keyset_filter |= equal_filter & after_filter
+        equal_filter &= current_equal_filter
+    return keyset_filter, equal_filter
+
+
+def get_keyset_filter(ordering, values) -> Q:
+    """
+    Rows after the given values for the ordering: (f1 > v1) OR (f1 = v1 AND f2 > v2) OR ...
+    NOTE: PostgreSQL sorts NULL as the largest value (Last for ASC and first for DESC)
+    """
+    keyset_filter, _ = _get_keyset_filters(ordering, values)
+    return keyset_filter
+
+
+def get_keyset_range_filter(ordering, after_values=None, last_values=None) -> Q:
+    """
+    Rows after after_values up to last_values (inclusive) for the ordering. None for no bound.
+    """
+    range_filter = Q()
+    if after_values is not None:
+        range_filter &= get_keyset_filter(ordering, after_values)
+    if last_values is not None:
+        # Rows before last_values are the rows after it using the reversed ordering
+        reversed_ordering = [field[1:] if field.startswith('-') else f'-{field}' for field in ordering]
+        before_filter, _ = _get_keyset_filters(reversed_ordering, last_values)
+        _, equal_filter = _get_keyset_filters(ordering, last_values)
+        range_filter &= before_filter | equal_filter
+    return range_filter
@@ -13,6 +13,8 @@ import string
 from subprocess import call
 import logging
 
+from utils import libreoffice
+
 logger = logging.getLogger(__name__)
 
 """
@@ -165,15 +167,7 @@ def msword_process(doc, img_dir=None):
         tmpdoc.write(doc.read())
         tmpdoc.flush()
 
-    call([
-        'libreoffice', '--headless', '--convert-to', 'docx',
-        tmp_filepath, '--outdir', settings.TEMP_DIR,
-    ])
-
-    doc_filename = os.path.join(
-        settings.TEMP_DIR,
-        re.sub(r'doc$', 'docx', os.path.basename(tmp_filepath))
-    )
+    doc_filename = libreoffice.convert(tmp_filepath, settings.TEMP_DIR, 'docx')
     # docx = open(doc_filename)
 
     response = process(doc_filename)
@@ -20,16 +20,32 @@ from graphene_django_extras.utils import get_extra_filters
 from graphene_django.rest_framework.serializer_converter import get_graphene_type_from_serializer_field
 from rest_framework import serializers
 
-from utils.graphene.pagination import OrderingOnlyArgumentPagination, NoOrderingPageGraphqlPagination
+from utils.graphene.pagination import (
+    OrderingOnlyArgumentPagination,
+    NoOrderingPageGraphqlPagination,
+    CursorPaginationMixin,
+    ListCountStrategy,
+    get_list_count,
+)
 
 
 class CustomDjangoListObjectBase(DjangoListObjectBase):
-    def __init__(self, results, count, page, pageSize, results_field_name="results"):
+    def __init__(self, results, count, page, pageSize, results_field_name="results", nextCursor=None):
+        """
+        count: Can be a callable, which is only called if the count is requested
+        """
         self.results = results
-        self.count = count
+        self._count = count
         self.results_field_name = results_field_name
         self.page = page
         self.pageSize = pageSize
+        self.nextCursor = nextCursor
+
+    @property
+    def count(self):
+        if callable(self._count):
+            self._count = self._count()
+        return self._count
 
     def to_dict(self):
         return {
@@ -116,7 +132,7 @@ class CustomPaginatedListObjectField(DjangoFilterPaginateListField):
         if hasattr(qs, 'all'):
             qs = qs.all()
         qs = filterset_class(data=filter_kwargs, queryset=qs, request=info.context).qs
-        count = qs.count()
+        count = qs.count
 
         if getattr(self, "pagination", None):
             ordering = kwargs.pop(self.pagination.ordering_param, None) or self.pagination.ordering
@@ -215,9 +231,20 @@ class DjangoPaginatedListObjectField(DjangoFilterPaginateListField):
             if root and is_valid_django_model(root._meta.model):
                 extra_filters = get_extra_filters(root, manager.model)
                 qs = qs.filter(**extra_filters)
-        # TODO: Duplicate count (self.pagination.paginate_queryset also calls count)
-        count = qs.count()
+        count = partial(
+            get_list_count,
+            qs,
+            getattr(self.type._meta, 'count_strategy', ListCountStrategy.EXACT),
+            cache_key_data=dict(
+                list_type=self.type._meta.name,
+                filters=filter_kwargs,
+                root=root and getattr(root, 'pk', None),
+                user=info.context.user.pk,
+            ),
+            project_id=info.context.active_project and info.context.active_project.pk,
+        )
 
+        next_cursor = None
         if getattr(self, "pagination", None):
             ordering = kwargs.pop(self.pagination.ordering_param, None) or self.pagination.ordering
             if isinstance(self.pagination, NoOrderingPageGraphqlPagination):
@@ -227,7 +254,10 @@ class DjangoPaginatedListObjectField(DjangoFilterPaginateListField):
                 ordering = ','.join([to_snake_case(each) for each in ordering.strip(',').replace(' ', '').split(',')])
                 kwargs[self.pagination.ordering_param] = ordering
             'pageSize' in kwargs and kwargs['pageSize'] is None and kwargs.pop('pageSize')
-            qs = self.pagination.paginate_queryset(qs, **kwargs)
+            if isinstance(self.pagination, CursorPaginationMixin):
+                qs, next_cursor = self.pagination.paginate_queryset_with_cursor(qs, **kwargs)
+            else:
+                qs = self.pagination.paginate_queryset(qs, **kwargs)
 
         return CustomDjangoListObjectBase(
             count=count,
@@ -237,7 +267,8 @@ class DjangoPaginatedListObjectField(DjangoFilterPaginateListField):
             pageSize=kwargs.get(  # TODO: Need to add cutoff to send max page size instead of requested
                 'pageSize',
                 graphql_api_settings.DEFAULT_PAGE_SIZE
-            ) if hasattr(self.pagination, 'page_size_query_param') else None
+            ) if hasattr(self.pagination, 'page_size_query_param') else None,
+            nextCursor=next_cursor,
         )
 
 
@@ -1,7 +1,20 @@
+import json
+import base64
+from typing import Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist
+from django.db import connections
+from django.db.models.constants import LOOKUP_SEP
 from graphene import String
+from graphql import GraphQLError
 from graphene_django_extras.paginations.pagination import BaseDjangoGraphqlPagination
 from graphene_django_extras import PageGraphqlPagination
 
+from deep.caches import CacheKey, CacheHelper, DataVersion
+from utils.db.keyset import KeysetJSONEncoder, get_keyset_ordering, get_keyset_filter
+
 
 class NoOrderingPageGraphqlPagination(PageGraphqlPagination):
     """
@@ -61,3 +74,204 @@ class OrderingOnlyArgumentPagination(BaseDjangoGraphqlPagination):
             else:
                 qs = qs.order_by(order)
         return qs
+
+
+class CursorPaginationMixin:
+    """
+    Adds keyset (cursor) pagination to the page paginations.
+    `nextCursor` of a page can be passed as `cursor` to get the next page without OFFSET.
+    Ordering is taken from the queryset (ordering argument/filterset/model ordering) + pk as tie breaker.
+    NOTE: Falls back to offset for ordering using expressions (eg: search similarity)
+    """
+    cursor_query_param = 'cursor'
+
+    def to_graphql_fields(self):
+        fields = super().to_graphql_fields()
+        fields[self.cursor_query_param] = String(
+            description='nextCursor of the previous page. (page is ignored if provided)',
+        )
+        return fields
+
+    def get_page_size(self, kwargs):
+        page_size = self.page_size
+        if self.page_size_query_param:
+            page_size = kwargs.get(self.page_size_query_param) or page_size
+        return max(1, min(page_size, self.max_page_size))
+
+    @staticmethod
+    def encode_cursor(data):
+        return base64.urlsafe_b64encode(
+            json.dumps(data, cls=KeysetJSONEncoder).encode('utf-8')
+        ).decode('ascii')
+
+    @staticmethod
+    def decode_cursor(cursor):
+        try:
+            data = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        except (ValueError, UnicodeError):
+            data = None
+        if not isinstance(data, dict):
+            raise GraphQLError('Invalid cursor')
+        return data
+
+    def apply_ordering(self, qs, kwargs):
+        order = kwargs.pop(self.ordering_param, None) or self.ordering
+        if order:
+            qs = qs.order_by(*order.strip(',').replace(' ', '').split(','))
+        return qs
+
+    @staticmethod
+    def get_item_value(item, field):
+        """
+        Value of the ordering field using the loaded item.
+        Raises LookupError if the value isn't available without a query (eg: Relation not selected)
+        """
+        value = item
+        *relations, field_name = field.split(LOOKUP_SEP)
+        for relation in relations:
+            try:
+                relation_field = value._meta.get_field(relation)
+            except FieldDoesNotExist:
+                raise LookupError(field)
+            # Only loaded (select_related) forward relations
+            if not relation_field.is_relation or not relation_field.concrete or not relation_field.is_cached(value):
+                raise LookupError(field)
+            value = getattr(value, relation)
+            if value is None:
+                return None
+        try:
+            model_field = value._meta.get_field(field_name)
+        except FieldDoesNotExist:
+            # pk or annotation
+            model_field = None
+        if model_field is not None:
+            if not model_field.concrete or model_field.many_to_many:
+                raise LookupError(field)
+            # Foreign keys are ordered using the id
+            field_name = model_field.attname
+        if field_name in value.get_deferred_fields() or not hasattr(value, field_name):
+            raise LookupError(field)
+        return getattr(value, field_name)
+
+    def _get_next_cursor(self, qs, ordering, last_item):
+        fields = [field.lstrip('-') for field in ordering]
+        try:
+            values = [self.get_item_value(last_item, field) for field in fields]
+        except LookupError:
+            values = qs.filter(pk=last_item.pk).values_list(*fields).first()
+        return self.encode_cursor({'values': values})
+
+    def paginate_queryset_with_cursor(self, qs, **kwargs) -> Tuple[list, Optional[str]]:
+        """
+        Returns results and cursor for the next page (None for the last page)
+        """
+        page_size = self.get_page_size(kwargs)
+        cursor = kwargs.pop(self.cursor_query_param, None)
+        qs = self.apply_ordering(qs, kwargs)
+        ordering = get_keyset_ordering(qs)
+
+        if not cursor:
+            # Page pagination, but also provide cursor for the next page
+            page = kwargs.get(self.page_query_param) or 1
+            if ordering is not None:
+                qs = qs.order_by(*ordering)
+            if page < 0:
+                # Pages from the end require the count
+                results = list(super().paginate_queryset(qs, **kwargs))
+            else:
+                offset = page_size * (page - 1)
+                results = list(qs[offset: offset + page_size])
+            if len(results) < page_size or page < 0:
+                return results, None
+            if ordering is None:
+                return results, self.encode_cursor({'offset': page_size * page})
+            return results, self._get_next_cursor(qs, ordering, results[-1])
+
+        cursor_data = self.decode_cursor(cursor)
+        if ordering is None:
+            offset = cursor_data.get('offset')
+            if not isinstance(offset, int) or offset < 0:
+                raise GraphQLError('Invalid cursor')
+            results = list(qs[offset: offset + page_size + 1])
+            next_cursor = self.encode_cursor({'offset': offset + page_size})
+        else:
+            values = cursor_data.get('values')
+            if not isinstance(values, list) or len(values) != len(ordering):
+                raise GraphQLError('Invalid cursor')
+            qs = qs.order_by(*ordering)
+            results = list(qs.filter(get_keyset_filter(ordering, values))[:page_size + 1])
+            next_cursor = None
+            if len(results) > page_size:
+                next_cursor = self._get_next_cursor(qs, ordering, results[page_size - 1])
+        if len(results) <= page_size:
+            return results, None
+        return results[:page_size], next_cursor
+
+
+class CursorPageGraphqlPagination(CursorPaginationMixin, PageGraphqlPagination):
+    pass
+
+
+class NoOrderingCursorPageGraphqlPagination(CursorPaginationMixin, NoOrderingPageGraphqlPagination):
+    """
+    Ordering is handled in filterset
+    """
+    pass
+
+
+class ListCountStrategy:
+    """
+    How the total count is calculated for a list type (Set using count_strategy in the list type's Meta)
+    NOTE: The count is only calculated if totalCount is requested.
+    """
+    # SELECT COUNT(*)
+    EXACT = 'exact'
+    # Planner estimate above GRAPHENE_LIST_ESTIMATED_COUNT_THRESHOLD, else exact count
+    # (cached per filters and project data version above GRAPHENE_LIST_CACHED_COUNT_THRESHOLD)
+    ESTIMATED = 'estimated'
+
+
+def get_estimated_count(qs) -> int:
+    """
+    Row count estimate from the query planner (No rows are scanned)
+    """
+    sql, params = qs.query.sql_with_params()
+    with connections[qs.db].cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def get_list_count(qs, strategy, cache_key_data=None, project_id=None) -> int:
+    """
+    cache_key_data: Data which identify the queryset (filters, user, etc)
+    """
+    if strategy != ListCountStrategy.ESTIMATED:
+        return qs.count()
+
+    estimated_count = get_estimated_count(qs)
+    if estimated_count >= settings.GRAPHENE_LIST_ESTIMATED_COUNT_THRESHOLD:
+        return estimated_count
+    if (
+        estimated_count < settings.GRAPHENE_LIST_CACHED_COUNT_THRESHOLD or
+        cache_key_data is None or
+        project_id is None
+    ):
+        return qs.count()
+
+    try:
+        cache_key = CacheKey.GQL_LIST_COUNT_KEY_FORMAT.format(
+            CacheHelper.generate_hash({
+                'data': cache_key_data,
+                'project_data_version': DataVersion.get(DataVersion.PROJECT, project_id),
+            })
+        )
+    except TypeError:  # Not JSON serializable
+        return qs.count()
+    return cache.get_or_set(
+        cache_key,
+        qs.count,
+        settings.GRAPHENE_LIST_COUNT_CACHE_TIMEOUT,
+    )
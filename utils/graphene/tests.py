@@ -47,6 +47,13 @@ if settings.PYTEST_XDIST_WORKER:
     AUTH_PASSWORD_VALIDATORS=TEST_AUTH_PASSWORD_VALIDATORS,
     CELERY_TASK_ALWAYS_EAGER=True,
     DEEPL_SERVER_CALLBACK_DOMAIN='http://testserver',
+    # Planner estimates are not stable for the test database, always use exact count
+    GRAPHENE_LIST_ESTIMATED_COUNT_THRESHOLD=float('inf'),
+    GRAPHENE_LIST_CACHED_COUNT_THRESHOLD=float('inf'),
+    # Data versions are bumped on commit, which doesn't happen in the tests
+    PROJECT_STATS_CACHE_TIMEOUT=0,
+    # Region cache_index is not updated when the geo areas are created using the factories
+    GEO_AREA_HIERARCHY_CACHE_TIMEOUT=0,
 )
 class GraphQLTestCase(BaseGraphQLTestCase):
     """
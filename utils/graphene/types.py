@@ -15,8 +15,8 @@ from graphene_django_extras.types import DjangoObjectOptions
 
 from deep.serializers import TempClientIdMixin
 from deep.caches import local_cache
-from deep.serializers import URLCachedFileField
 from utils.graphene.fields import CustomDjangoListField
+from utils.graphene.pagination import ListCountStrategy
 from utils.graphene.options import CustomObjectTypeOptions
 
 
@@ -123,8 +123,14 @@ class CustomDjangoListObjectType(DjangoListObjectType):
         filter_fields=None,
         queryset=None,
         filterset_class=None,
+        count_strategy=ListCountStrategy.EXACT,
+        with_next_cursor=False,
         **options,
     ):
+        """
+        count_strategy: How totalCount is calculated (See ListCountStrategy)
+        with_next_cursor: Add nextCursor field (Use with CursorPaginationMixin paginations)
+        """
 
         assert is_valid_django_model(model), (
             'You need to pass a valid Django Model in {}.Meta, received "{}".'
@@ -173,6 +179,7 @@ class CustomDjangoListObjectType(DjangoListObjectType):
         _meta.exclude_fields = exclude_fields
         _meta.only_fields = only_fields
         _meta.filterset_class = filterset_class
+        _meta.count_strategy = count_strategy
         _meta.fields = OrderedDict(
             [
                 (results_field_name, result_container),
@@ -202,6 +209,12 @@ class CustomDjangoListObjectType(DjangoListObjectType):
                 )
             ]
         )
+        if with_next_cursor:
+            _meta.fields["nextCursor"] = Field(
+                graphene.String,
+                name="nextCursor",
+                description="Cursor for the next page (null for the last page)",
+            )
 
         super(DjangoListObjectType, cls).__init_subclass_with_meta__(
             _meta=_meta, **options
@@ -219,9 +232,7 @@ class FileFieldType(graphene.ObjectType):
         return root.name
 
     def resolve_url(root, info, **kwargs) -> Union[str, None]:
-        return info.context.request.build_absolute_uri(
-            URLCachedFileField.name_to_representation(root)
-        )
+        return info.context.dl.file_url.load(str(root)).then(info.context.request.build_absolute_uri)
 
 
 class DateCountType(graphene.ObjectType):
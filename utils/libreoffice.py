@@ -0,0 +1,266 @@
+"""
+Document conversion using a pool of long-lived headless LibreOffice processes.
+
+Each worker has it's own LibreOffice profile, so that conversions can run concurrently.
+If unoserver is available, workers are long-lived unoserver processes (No LibreOffice cold start per conversion),
+conversions are sent using XML-RPC. Otherwise each conversion runs `libreoffice --convert-to` using the worker profile.
+"""
+import os
+import time
+import queue
+import shutil
+import signal
+import socket
+import logging
+import threading
+import subprocess
+import xmlrpc.client
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+from deep.caches import CacheKey
+
+logger = logging.getLogger(__name__)
+
+
+class ConversionError(Exception):
+    pass
+
+
+def _set_parent_death_signal():
+    # Make sure the worker processes are terminated with the celery process (Linux only)
+    try:
+        import ctypes
+        PR_SET_PDEATHSIG = 1
+        ctypes.CDLL('libc.so.6').prctl(PR_SET_PDEATHSIG, signal.SIGTERM)
+    except Exception:
+        pass
+
+
+def _get_free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class _TimeoutTransport(xmlrpc.client.Transport):
+    def __init__(self, timeout, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.timeout = timeout
+
+    def make_connection(self, host):
+        connection = super().make_connection(host)
+        connection.timeout = self.timeout
+        return connection
+
+
+class LibreOfficeWorker:
+    """
+    Runs conversions using `libreoffice --convert-to` with a dedicated profile.
+    """
+    def __init__(self, index):
+        self.index = index
+        self.conversions = 0
+        self.profile_dir = os.path.join(settings.TEMP_DIR, f'libreoffice-profile-{os.getpid()}-{index}')
+
+    @property
+    def profile_url(self):
+        return f'file://{self.profile_dir}'
+
+    def is_alive(self):
+        return True
+
+    def start(self):
+        self.conversions = 0
+
+    def stop(self):
+        self.conversions = 0
+
+    def convert(self, input_path, output_dir, convert_to, timeout):
+        subprocess.run(
+            [
+                settings.LIBREOFFICE_BIN, '--headless', '--norestore',
+                f'-env:UserInstallation={self.profile_url}',
+                '--convert-to', convert_to,
+                input_path, '--outdir', output_dir,
+            ],
+            check=True,
+            timeout=timeout,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+
+
+class UnoServerWorker(LibreOfficeWorker):
+    """
+    Long-lived unoserver process (LibreOffice listening on an UNO socket) with a dedicated profile.
+    """
+    def __init__(self, index):
+        super().__init__(index)
+        self.process = None
+        self.port = None
+
+    def is_alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def _get_proxy(self, timeout):
+        return xmlrpc.client.ServerProxy(
+            f'http://127.0.0.1:{self.port}',
+            transport=_TimeoutTransport(timeout),
+            allow_none=True,
+        )
+
+    def start(self):
+        self.stop()
+        self.port = _get_free_port()
+        self.process = subprocess.Popen(
+            [
+                settings.LIBREOFFICE_UNOSERVER_BIN,
+                '--interface', '127.0.0.1',
+                '--port', str(self.port),
+                '--uno-interface', '127.0.0.1',
+                '--uno-port', str(_get_free_port()),
+                '--user-installation', self.profile_url,
+            ],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            preexec_fn=_set_parent_death_signal,
+        )
+        # Wait until the server is ready
+        timeout_at = time.monotonic() + settings.LIBREOFFICE_WORKER_STARTUP_TIMEOUT
+        while time.monotonic() < timeout_at:
+            if not self.is_alive():
+                break
+            try:
+                self._get_proxy(timeout=1).info()
+                return
+            except (OSError, xmlrpc.client.Error):
+                time.sleep(0.2)
+        self.stop()
+        raise ConversionError(f'LibreOffice worker {self.index} failed to start')
+
+    def stop(self):
+        super().stop()
+        if self.process is None:
+            return
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+        self.process = None
+
+    def convert(self, input_path, output_dir, convert_to, timeout):
+        filename, _ = os.path.splitext(os.path.basename(input_path))
+        self._get_proxy(timeout).convert(
+            input_path,  # inpath
+            None,  # indata
+            os.path.join(output_dir, f'{filename}.{convert_to}'),  # outpath
+            convert_to,
+            None,  # filtername
+            [],  # filter_options
+            True,  # update_index
+            None,  # infiltername
+        )
+
+
+class ConverterPool:
+    """
+    Bounded pool of LibreOffice workers, callers wait (queue) for an idle worker.
+    Workers are started lazily and recycled after LIBREOFFICE_WORKER_MAX_CONVERSIONS or any failure.
+    """
+    def __init__(self, size, worker_class):
+        self.size = size
+        self.workers = [worker_class(index) for index in range(size)]
+        self.idle_workers = queue.LifoQueue()
+        for worker in self.workers:
+            self.idle_workers.put(worker)
+
+    @staticmethod
+    def _incr_metric(key, delta=1):
+        try:
+            try:
+                cache.incr(key, delta)
+            except ValueError:
+                cache.add(key, 0, None)
+                cache.incr(key, delta)
+        except Exception:
+            logger.warning('Failed to update LibreOffice conversion metric', exc_info=True)
+
+    def _acquire(self, timeout) -> LibreOfficeWorker:
+        self._incr_metric(CacheKey.LibreOfficeConversion.QUEUE_DEPTH)
+        try:
+            return self.idle_workers.get(timeout=timeout)
+        except queue.Empty:
+            raise ConversionError(f'No LibreOffice worker available after {timeout} seconds')
+        finally:
+            self._incr_metric(CacheKey.LibreOfficeConversion.QUEUE_DEPTH, -1)
+
+    def convert(self, input_path, output_dir, convert_to, timeout=None) -> str:
+        """
+        Returns path of the converted file (<output_dir>/<input filename>.<convert_to>)
+        """
+        timeout = timeout or settings.LIBREOFFICE_CONVERSION_TIMEOUT
+        start_time = time.perf_counter()
+        worker = self._acquire(timeout)
+        wait_duration = time.perf_counter() - start_time
+        try:
+            if worker.conversions >= settings.LIBREOFFICE_WORKER_MAX_CONVERSIONS:
+                worker.stop()
+            if not worker.is_alive():
+                worker.start()
+            worker.convert(input_path, output_dir, convert_to, timeout)
+            worker.conversions += 1
+        except Exception as e:
+            # Recycle the worker, it might be in a bad state
+            worker.stop()
+            raise ConversionError(f'LibreOffice conversion failed: {input_path} -> {convert_to}') from e
+        finally:
+            self.idle_workers.put(worker)
+
+        duration = time.perf_counter() - start_time
+        self._incr_metric(CacheKey.LibreOfficeConversion.COUNT)
+        self._incr_metric(CacheKey.LibreOfficeConversion.DURATION_MS, int(duration * 1000))
+        logger.info(
+            f'LibreOffice conversion to {convert_to} in {duration:.2f}s'
+            f' (waited {wait_duration:.2f}s) using worker {worker.index}'
+        )
+        filename, _ = os.path.splitext(os.path.basename(input_path))
+        output_path = os.path.join(output_dir, f'{filename}.{convert_to}')
+        if not os.path.exists(output_path):
+            raise ConversionError(f'LibreOffice conversion output not found: {output_path}')
+        return output_path
+
+    def stop(self):
+        for worker in self.workers:
+            worker.stop()
+
+
+_pool: Optional[ConverterPool] = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def get_converter_pool() -> ConverterPool:
+    """
+    Pool of the current process (A forked process creates it's own pool)
+    """
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            worker_class = LibreOfficeWorker
+            if shutil.which(settings.LIBREOFFICE_UNOSERVER_BIN):
+                worker_class = UnoServerWorker
+            _pool = ConverterPool(settings.LIBREOFFICE_POOL_SIZE, worker_class)
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def convert(input_path, output_dir, convert_to, timeout=None) -> str:
+    """
+    Convert file using LibreOffice. eg: convert('/tmp/report.docx', '/tmp', 'pdf') -> '/tmp/report.pdf'
+    """
+    return get_converter_pool().convert(input_path, output_dir, convert_to, timeout=timeout)
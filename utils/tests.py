@@ -1,8 +1,13 @@
+import os
 import unittest
 import copy
+import tempfile
+
+from django.test import SimpleTestCase, override_settings
 
 from utils.data_structures import Dict
 from utils.common import remove_empty_keys_from_dict
+from utils.libreoffice import ConverterPool, ConversionError, LibreOfficeWorker
 
 
 class TestDict(unittest.TestCase):
@@ -83,3 +88,54 @@ class TestDict(unittest.TestCase):
             original_obj = copy.deepcopy(obj)
             assert remove_empty_keys_from_dict(obj) == expected_obj
             assert original_obj == obj
+
+
+class DummyLibreOfficeWorker(LibreOfficeWorker):
+    def __init__(self, index):
+        super().__init__(index)
+        self.alive = False
+        self.starts = 0
+
+    def is_alive(self):
+        return self.alive
+
+    def start(self):
+        super().start()
+        self.alive = True
+        self.starts += 1
+
+    def stop(self):
+        super().stop()
+        self.alive = False
+
+    def convert(self, input_path, output_dir, convert_to, timeout):
+        if 'invalid' in input_path:
+            raise Exception('Invalid file')
+        filename, _ = os.path.splitext(os.path.basename(input_path))
+        open(os.path.join(output_dir, f'{filename}.{convert_to}'), 'w').close()
+
+
+@override_settings(LIBREOFFICE_WORKER_MAX_CONVERSIONS=2, LIBREOFFICE_CONVERSION_TIMEOUT=1)
+class TestLibreOfficeConverterPool(SimpleTestCase):
+    def test_worker_recycle(self):
+        pool = ConverterPool(1, DummyLibreOfficeWorker)
+        worker = pool.workers[0]
+        output_dir = tempfile.mkdtemp()
+        for _ in range(5):
+            assert pool.convert('/tmp/report.docx', output_dir, 'pdf') == os.path.join(output_dir, 'report.pdf')
+        # Restarted after every 2 conversions
+        assert worker.starts == 3
+
+        # Failed worker is restarted for the next conversion
+        with self.assertRaises(ConversionError):
+            pool.convert('/tmp/invalid.docx', output_dir, 'pdf')
+        assert worker.is_alive() is False
+        pool.convert('/tmp/report.docx', output_dir, 'pdf')
+        assert worker.starts == 4
+
+    def test_no_idle_worker(self):
+        pool = ConverterPool(1, DummyLibreOfficeWorker)
+        # Worker is busy
+        pool.idle_workers.get()
+        with self.assertRaises(ConversionError):
+            pool.convert('/tmp/report.docx', tempfile.mkdtemp(), 'pdf')